@@ -6,8 +6,15 @@ Main application entry point:
 """
 from cement import App, Controller
 from cement import ex as expose
-from models.site import Site
+from models.site import Site, CrawlInterrupted
 from models.page import Page
+from models.progress import ProgressReporter
+from models.audit_profile import AuditProfile
+from models.audit_server import AuditServer
+from models.audit_worker import AuditCoordinator, AuditWorker
+from models.auth_session import AuthSession
+from models.browser_pool import BrowserPool
+from models.work_queue import WorkQueue
 
 
 class Base(Controller):
@@ -16,6 +23,24 @@ class Base(Controller):
 
     # Audit full site by templates: python app.py audit --crawl httpbin.org
     # Audit full site by pages: python app.py audit --crawl --no-templates httpbin.org
+    # Resume an interrupted site audit: python app.py audit --crawl --resume httpbin.org
+    # Print timings per audit phase: python app.py audit --profile httpbin.org
+    # Keep raw results in one compact file: python app.py audit --crawl --results binary httpbin.org
+    # Browse violations by rule and template: python app.py audit --crawl --html httpbin.org
+    # One CSV row per shared component: python app.py audit --crawl --dedupe httpbin.org
+    # Live progress while auditing: python app.py audit --crawl --progress httpbin.org
+    # Progress as JSON lines: python app.py audit --crawl --progress json httpbin.org
+    # Tune workers, browsers, rules and crawl limits: python app.py audit --crawl --profile-file
+        # profiles/example.yml httpbin.org
+    # Export violations for analytics: python app.py audit --crawl --format parquet httpbin.org
+    # Most important pages of each template first, stopping after 4 hours:
+        # python app.py audit --crawl --prioritize --time-budget 240 httpbin.org
+    # Mobile and desktop results from one page load: python app.py audit --crawl --viewports
+        # desktop,mobile httpbin.org
+    # Static checks from the crawl only, without a browser: python app.py audit --static-only
+        # httpbin.org
+    # Audit an existing url list or XML sitemap, gzipped or not, without crawling:
+        # python app.py audit --from-sitemap urls.txt.gz httpbin.org
     # Audit single page: python app.py audit httpbin.org
     # Audit page (can be modified for site using above syntax) by design errors only:
         # python appy.py audit httpbin.org --audit_type design
@@ -28,8 +53,52 @@ class Base(Controller):
             (['--audit_type'], dict(action='store',
                                     help='specify design or code for which type of report to run')),
             (['--crawl'], dict(action='store_true', help='crawl all links from target')),
+            (['--from-sitemap'], dict(action='store', metavar='FILE',
+                                      help='audit the urls in a url list or XML sitemap, '
+                                           'gzipped or not, instead of crawling')),
+            (['--prioritize'], dict(action='store_true',
+                                    help='audit the most linked-to pages of each template '
+                                         'first, rather than in sitemap order')),
+            (['--time-budget'], dict(action='store', type=float, metavar='MINUTES',
+                                     help='stop auditing new pages after this many minutes '
+                                          'and report the coverage achieved')),
             (['--no-templates'], dict(action='store_true',
-                                      help='group violations by page rather than templates'))
+                                      help='group violations by page rather than templates')),
+            (['--resume'], dict(action='store_true',
+                                help='continue an interrupted crawl and audit')),
+            (['--discover'], dict(action='store', choices=Site.DISCOVERY_MODES,
+                                  help='find pages by following links (default), from '
+                                       'robots.txt and XML sitemaps, or both')),
+            (['--no-cache'], dict(action='store_true',
+                                  help='download every page again rather than revalidating '
+                                       'pages cached by the last crawl')),
+            (['--profile'], dict(action='store_true',
+                                 help='print p50/p95/p99 timings per audit phase')),
+            (['--results'], dict(action='store', choices=Site.RESULTS_FORMATS,
+                                 help='keep raw axe results as a JSON file per page (default) '
+                                      'or in one compact binary file per run')),
+            (['--format'], dict(action='store', choices=Site.VIOLATIONS_FORMATS,
+                                help='write violations as CSV (default) or Parquet')),
+            (['--html'], dict(action='store_true',
+                              help='also write an HTML report by rule and template')),
+            (['--dedupe'], dict(action='store_true',
+                                help='store violations shared by many pages once and write '
+                                     'a CSV of unique issues')),
+            (['--profile-file'], dict(action='store',
+                                      help='YAML audit profile, e.g. profiles/example.yml')),
+            (['--viewports'], dict(action='store', metavar='VIEWPORTS',
+                                   help='run axe at each viewport on one page load, e.g. '
+                                        'desktop,mobile or 1024x768,375x667')),
+            (['--static-only'], dict(action='store_true',
+                                     help='crawl the site and report the static checks run on '
+                                          'each page\'s HTML, without a browser audit')),
+            (['--full-results'], dict(action='store_true',
+                                      help='keep all of axe\'s results, not only violations '
+                                           'and incomplete results, e.g. for debugging')),
+            (['--progress'], dict(action='store', nargs='?', const='text',
+                                  choices=ProgressReporter.MODES,
+                                  help='report crawl and audit progress on stderr as text '
+                                       '(default) or JSON lines'))
         ]
     )
     def audit(self):
@@ -39,26 +108,182 @@ class Base(Controller):
         use_templates = not self.app.pargs.no_templates
 
         site = Site.from_domain_or_url(domain_or_url, audit_type=audit_type,
-                                       templates=use_templates)
+                                       templates=use_templates, resume=self.app.pargs.resume,
+                                       discovery=self.app.pargs.discover,
+                                       http_cache=self.http_cache_option(),
+                                       results_format=self.app.pargs.results,
+                                       violations_format=self.app.pargs.format,
+                                       dedupe=self.app.pargs.dedupe,
+                                       progress=self.app.pargs.progress,
+                                       full_results=self.app.pargs.full_results,
+                                       sitemap_file=self.app.pargs.from_sitemap,
+                                       prioritize=self.app.pargs.prioritize,
+                                       static_only=self.app.pargs.static_only,
+                                       viewports=self.app.pargs.viewports,
+                                       time_budget=self.app.pargs.time_budget,
+                                       profile=self.load_profile())
 
-        if self.app.pargs.crawl:
-            audit = site.audit()
+        site_audit = self.app.pargs.crawl or self.app.pargs.from_sitemap or \
+            self.app.pargs.static_only
+        if site_audit:
+            try:
+                audit = site.audit()
+            except CrawlInterrupted as e:
+                print(e)
+                return
         else:
             audit = Page.audit(site, audit_type=audit_type)
 
-        audit.write_violations_to_csv()
+        audit.write_violations()
+        audit.write_profile()
+        if site_audit:
+            audit.write_rules_to_csv()
+            if site.group_by_templates:
+                audit.write_templates_to_csv()
         print(audit.summary)
 
+        if self.app.pargs.html or site.profile.output['html']:
+            print("HTML Report: {}".format(audit.write_html_report()))
+
+        if self.app.pargs.profile:
+            print("\nProfile ({}):\n{}".format(audit.profile_path, audit.profile_summary))
+
     # python app.py sitemap httpbin.org
+    # Continue an interrupted crawl: python app.py sitemap --resume httpbin.org
+    # Seed from robots.txt and XML sitemaps: python app.py sitemap --discover sitemaps httpbin.org
+    # Download every page again, ignoring the last crawl's cache: python app.py sitemap --no-cache
+        # httpbin.org
     @expose(
         help="Generate a sitemap for given url or domain.",
-        arguments=[(['domain_or_url'], dict(action='store', nargs=1, help='domain or url'))]
+        arguments=[
+            (['domain_or_url'], dict(action='store', nargs=1, help='domain or url')),
+            (['--resume'], dict(action='store_true', help='continue an interrupted crawl')),
+            (['--discover'], dict(action='store', choices=Site.DISCOVERY_MODES,
+                                  help='find pages by following links (default), from '
+                                       'robots.txt and XML sitemaps, or both')),
+            (['--no-cache'], dict(action='store_true',
+                                  help='download every page again rather than revalidating '
+                                       'pages cached by the last crawl')),
+            (['--profile-file'], dict(action='store',
+                                      help='YAML audit profile, e.g. profiles/example.yml'))
+        ]
     )
     def sitemap(self):
-        site = Site.from_domain_or_url(self.app.pargs.domain_or_url[0])
+        site = Site.from_domain_or_url(self.app.pargs.domain_or_url[0],
+                                       resume=self.app.pargs.resume,
+                                       discovery=self.app.pargs.discover,
+                                       http_cache=self.http_cache_option(),
+                                       profile=self.load_profile())
         sitemap_path = site.generate_sitemap()
+        if site.crawl_finished is False:
+            print("Crawl interrupted. Rerun with --resume to continue.")
         print("Generated sitemap: {}\nRuntime: {}".format(sitemap_path, site.runtime))
 
+    # Start audit daemon on port 8642: python app.py serve
+    # With 4 warm browsers on a Unix socket: python app.py serve --browsers 4 --socket /tmp/aa.sock
+    # Submit a job: curl -d '{"url": "httpbin.org"}' http://localhost:8642/audit
+    @expose(
+        help="Run an audit server that keeps browsers and the crawler warm between jobs.",
+        arguments=[
+            (['--port'], dict(action='store', type=int, default=8642, help='port to listen on')),
+            (['--socket'], dict(action='store', help='listen on a Unix socket instead of a port')),
+            (['--browsers'], dict(action='store', type=int, default=1,
+                                  help='number of warm browser sessions'))
+        ]
+    )
+    def serve(self):
+        server = AuditServer(port=self.app.pargs.port, socket_path=self.app.pargs.socket,
+                             browsers=self.app.pargs.browsers)
+        server.start()
+        print("Ann Arbor audit server listening on {}".format(server.address))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("Stopped.")
+
+    # Distributed audit. Coordinator crawls and enqueues pages, then waits for workers:
+    #   python app.py coordinate httpbin.org --queue sqlite:///shared/httpbin.db
+    # Run on each worker node:
+    #   python app.py work --queue sqlite:///shared/httpbin.db
+    @expose(
+        help="Crawl a site and enqueue its pages for audit workers, then collect results.",
+        arguments=[
+            (['domain_or_url'], dict(action='store', nargs=1, help='domain or url')),
+            (['--queue'], dict(action='store', required=True,
+                               help='work queue uri, e.g. sqlite:///path/to/queue.db')),
+            (['--from-sitemap'], dict(action='store', metavar='FILE',
+                                      help='enqueue the urls in a url list or XML sitemap, '
+                                           'gzipped or not, instead of crawling')),
+            (['--audit_type'], dict(action='store',
+                                    help='specify design or code for which type of report to run')),
+            (['--no-templates'], dict(action='store_true',
+                                      help='group violations by page rather than templates')),
+            (['--discover'], dict(action='store', choices=Site.DISCOVERY_MODES,
+                                  help='find pages by following links (default), from '
+                                       'robots.txt and XML sitemaps, or both')),
+            (['--no-cache'], dict(action='store_true',
+                                  help='download every page again rather than revalidating '
+                                       'pages cached by the last crawl')),
+            (['--format'], dict(action='store', choices=Site.VIOLATIONS_FORMATS,
+                                help='write violations as CSV (default) or Parquet')),
+            (['--dedupe'], dict(action='store_true',
+                                help='store violations shared by many pages once and write '
+                                     'a CSV of unique issues')),
+            (['--profile-file'], dict(action='store',
+                                      help='YAML audit profile, e.g. profiles/example.yml'))
+        ]
+    )
+    def coordinate(self):
+        site = Site.from_domain_or_url(self.app.pargs.domain_or_url[0],
+                                       sitemap_file=self.app.pargs.from_sitemap,
+                                       audit_type=self.app.pargs.audit_type,
+                                       templates=not self.app.pargs.no_templates,
+                                       discovery=self.app.pargs.discover,
+                                       http_cache=self.http_cache_option(),
+                                       violations_format=self.app.pargs.format,
+                                       dedupe=self.app.pargs.dedupe,
+                                       profile=self.load_profile())
+        coordinator = AuditCoordinator(site, WorkQueue.from_uri(self.app.pargs.queue))
+
+        print("Enqueued {} pages.".format(coordinator.enqueue()))
+        coordinator.wait(on_progress=lambda counts: print(
+            "pending: {pending} leased: {leased} done: {done} failed: {failed}".format(**counts)))
+
+        audit = coordinator.collect()
+        audit.write_violations()
+        audit.write_rules_to_csv()
+        if site.group_by_templates:
+            audit.write_templates_to_csv()
+        print(audit.summary)
+
+    @expose(
+        help="Audit pages from a shared work queue until it is drained.",
+        arguments=[
+            (['--queue'], dict(action='store', required=True,
+                               help='work queue uri, e.g. sqlite:///path/to/queue.db')),
+            (['--forever'], dict(action='store_true',
+                                 help='keep polling for work after the queue is drained')),
+            (['--profile-file'], dict(action='store',
+                                      help='YAML audit profile, e.g. profiles/example.yml'))
+        ]
+    )
+    def work(self):
+        profile = self.load_profile()
+        worker = AuditWorker(WorkQueue.from_uri(self.app.pargs.queue), profile=profile,
+                             browser_pool=BrowserPool.from_profile(profile),
+                             auth_session=AuthSession.from_profile(profile))
+        audited = worker.run(forever=self.app.pargs.forever)
+        print("Worker {} audited {} pages.".format(worker.worker_id, audited))
+
+    def http_cache_option(self):
+        # None leaves it to the audit profile.
+        return False if self.app.pargs.no_cache else None
+
+    def load_profile(self):
+        if self.app.pargs.profile_file:
+            return AuditProfile.from_file(self.app.pargs.profile_file)
+        return AuditProfile()
+
     @expose(
         help="Test Cement framework and CLI.",
         arguments=[
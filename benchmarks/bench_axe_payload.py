@@ -0,0 +1,109 @@
+"""
+Axe Payload Micro-Benchmark
+Compares full axe results with the trimmed results AxePageAudit requests by default
+(violations and incomplete only, each node cut to the fields Violation reads): bytes
+serialized back over WebDriver, JSON parse time and AxePageAudit.parse_report time.
+
+By default the results come from a saved full axe report (the test fixture), trimmed in Python
+the same way AxePageAudit.TRIMMED_RUN_SCRIPT trims them in the browser. With --url, both runs
+are made against a live page with Chrome.
+
+Usage:
+    python -m benchmarks.bench_axe_payload
+    python -m benchmarks.bench_axe_payload --report audits/some-site/some-page.json
+    python -m benchmarks.bench_axe_payload --url https://www.example.com
+"""
+import argparse
+import json
+from os.path import join as pathjoin, dirname, realpath
+import time
+
+from models.axe_audit import AxePageAudit
+from models.page import Page
+from models.site import Site
+
+FIXTURE_REPORT = pathjoin(dirname(dirname(realpath(__file__))), 'tests', 'fixtures', 'files',
+                          'httpbin-org-page-all-violations.json')
+RULE_FIELDS = ['id', 'impact', 'tags', 'description', 'help', 'helpUrl']
+NODE_FIELDS = ['html', 'impact', 'target', 'failureSummary']
+
+
+def trim_axe_results(results):
+    """Python mirror of AxePageAudit.TRIMMED_RUN_SCRIPT."""
+    def trim(result):
+        trimmed = dict((field, result.get(field)) for field in RULE_FIELDS)
+        trimmed['nodes'] = [dict((field, node.get(field)) for field in NODE_FIELDS)
+                            for node in result['nodes']]
+        return trimmed
+
+    return {'url': results.get('url'), 'timestamp': results.get('timestamp'),
+            'violations': [trim(result) for result in results['violations']],
+            'incomplete': [trim(result) for result in results['incomplete']]}
+
+
+def browser_results(url):
+    """Full and trimmed results for url, each from its own axe run in the same session."""
+    from axe_selenium_python import Axe
+
+    site = Site.from_domain_or_url(url)
+    audit = AxePageAudit(Page(site, url))
+    try:
+        with site.browser_pool.checkout() as driver:
+            driver.get(url)
+            axe = Axe(driver)
+            axe.inject()
+            full = axe.run()
+            trimmed = audit.run_trimmed_axe(driver, site.profile.axe_options)
+    finally:
+        site.close()
+    return full, trimmed
+
+
+def measure(name, results, repeat):
+    payload = json.dumps(results)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        json.loads(payload)
+    parse_seconds = (time.perf_counter() - started) / repeat
+
+    # parse_report reads the report as --resume would.
+    site = Site.from_domain_or_url('http://bench.example.com')
+    audit = AxePageAudit(Page(site, results.get('url') or site.url))
+    audit.read_report = lambda _: json.loads(payload)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        violations = audit.parse_report(None)
+    report_seconds = (time.perf_counter() - started) / repeat
+
+    return {'results': name, 'bytes': len(payload.encode('utf-8')),
+            'json_parse_ms': round(parse_seconds * 1000, 3),
+            'parse_report_ms': round(report_seconds * 1000, 3),
+            'violations': len(violations)}
+
+
+def run(report_path=FIXTURE_REPORT, url=None, repeat=200):
+    if url:
+        full, trimmed = browser_results(url)
+    else:
+        with open(report_path, 'r') as f:
+            full = json.load(f)
+        trimmed = trim_axe_results(full)
+
+    rows = [measure('full', full, repeat), measure('trimmed', trimmed, repeat)]
+    rows[1]['bytes_saved'] = '{:.0%}'.format(1 - rows[1]['bytes'] / rows[0]['bytes'])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--report', default=FIXTURE_REPORT, help='full axe report (JSON)')
+    parser.add_argument('--url', help='run axe against a live page with Chrome instead')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.report, args.url, args.repeat), indent=2))
+
+
+if __name__ == '__main__':
+    main()
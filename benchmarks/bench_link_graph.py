@@ -0,0 +1,132 @@
+"""
+Link Graph Micro-Benchmark
+Records a synthetic site's links with LinkGraphBuilder, as SitemapSpider does while crawling,
+sorts them into the CSR arrays and queries the graph. Reports peak Python memory (tracemalloc)
+while recording and while building, bytes on disk per link, and the peak for the same links
+held as a dict of url -> linked urls, for comparison.
+
+Pages link to a few section pages (navigation), to neighbours in their section and to random
+pages, so in-degrees are skewed the way real sites' are.
+
+Usage:
+    python -m benchmarks.bench_link_graph
+    python -m benchmarks.bench_link_graph --pages 50000 --links 20
+"""
+import argparse
+import json
+import os
+from os.path import join as pathjoin
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from models.link_graph import LinkGraph, LinkGraphBuilder
+
+SECTIONS = ['blog', 'news', 'events', 'docs', 'api', 'about', 'products', 'team']
+BASE_URL = 'http://bench.example.com'
+
+
+def page_url(n):
+    if n == 0:
+        return BASE_URL
+    return '{}/{}/{}'.format(BASE_URL, SECTIONS[n % len(SECTIONS)], n)
+
+
+def site_links(pages, links, seed=0):
+    """Yields (page url, linked urls) for each page, in crawl order."""
+    rand = random.Random(seed)
+    navigation = [BASE_URL] + ['{}/{}'.format(BASE_URL, section) for section in SECTIONS]
+    for n in range(pages):
+        linked_urls = dict.fromkeys(navigation)
+        while len(linked_urls) < links:
+            near = n + rand.randint(-50, 50)
+            target = near if rand.random() < 0.5 else rand.randrange(pages)
+            linked_urls[page_url(min(max(target, 0), pages - 1))] = True
+        yield page_url(n), linked_urls
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+
+def traced(func):
+    # Tracing slows allocations down, so timings are taken from untraced runs.
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def run(pages, links):
+    graph_dir = tempfile.mkdtemp()
+    try:
+        def record():
+            builder = LinkGraphBuilder(graph_dir)
+            edges = 0
+            for url, linked_urls in site_links(pages, links):
+                builder.add_links(url, linked_urls)
+                edges += len(linked_urls)
+            builder.flush()
+            return builder, edges
+
+        record_peak = traced(record)
+        (builder, edges), record_seconds = timed(record)
+        node_count = len(builder.ids)
+        del builder
+
+        def build():
+            return LinkGraph.build(graph_dir, node_count)
+
+        build_peak = traced(build)
+        _, build_seconds = timed(build)
+
+        graph = LinkGraph(graph_dir)
+        depths, depths_seconds = timed(lambda: graph.depths(BASE_URL))
+        linked_from, linked_from_seconds = timed(lambda: graph.linked_from(page_url(pages // 2)))
+        graph.close()
+
+        array_bytes = sum(os.path.getsize(pathjoin(graph_dir, name))
+                          for name in os.listdir(graph_dir)
+                          if name.endswith(('.offsets', '.targets')))
+
+        def adjacency():
+            return dict((url, list(linked_urls)) for url, linked_urls in site_links(pages, links))
+
+        dict_peak = traced(adjacency)
+
+        return {
+            'pages': pages,
+            'links': edges,
+            'record_seconds': round(record_seconds, 2),
+            'record_peak_mb': round(record_peak / 2 ** 20, 1),
+            'build_seconds': round(build_seconds, 2),
+            'build_peak_mb': round(build_peak / 2 ** 20, 1),
+            'build_peak_bytes_per_link': round(build_peak / edges, 1),
+            'arrays_bytes_per_link': round(array_bytes / edges, 1),
+            'dict_peak_mb': round(dict_peak / 2 ** 20, 1),
+            'depths_seconds': round(depths_seconds, 3),
+            'max_depth': max(depths),
+            'linked_from_ms': round(linked_from_seconds * 1000, 3),
+            'linked_from': len(linked_from)
+        }
+    finally:
+        shutil.rmtree(graph_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=50000)
+    parser.add_argument('--links', type=int, default=20, help='links per page')
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.pages, args.links), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Replay Audit Benchmark
+Runs the full site audit path (Site.audit -> AxeSiteAudit -> summary and CSVs) with replay
+drivers serving synthetic axe results in place of Chrome, so the time measured is the
+pipeline's own: report writing and parsing, Violation construction, rollups and CSV output.
+
+Usage:
+    python -m benchmarks.bench_replay_audit
+    python -m benchmarks.bench_replay_audit --pages 100000 --results binary --workers 4
+"""
+import argparse
+import json
+import os
+from os.path import join as pathjoin
+import shutil
+import tempfile
+import time
+
+from benchmarks.fixture_site import synthetic_axe_results
+from models.audit_profile import AuditProfile
+from models.browser_pool import BrowserPool
+from models.site import Site
+
+BASE_URL = 'http://bench.example.com'
+
+
+def page_urls(pages, templates):
+    for n in range(pages):
+        yield '{}/template-{}/page-{}.html'.format(BASE_URL, n % templates, n)
+
+
+def timed(fn):
+    started = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - started
+
+
+def rate(count, seconds):
+    return round(count / seconds) if seconds else None
+
+
+def run(pages, templates=10, density=0.2, workers=1, results_format='json'):
+    urls = list(page_urls(pages, templates))
+    recordings = dict((url, synthetic_axe_results(url, density)) for url in urls)
+
+    # The url list and audit output both live in a temp directory, never under audits/.
+    list_dir = tempfile.mkdtemp(prefix='ann-arbor-replay-')
+    url_list_path = pathjoin(list_dir, 'urls.txt')
+    with open(url_list_path, 'w') as f:
+        f.writelines('{}\n'.format(url) for url in urls)
+
+    profile = AuditProfile({'workers': workers})
+    pool = BrowserPool(size=workers, driver='replay', recordings=recordings)
+    site = Site.from_domain_or_url(BASE_URL, sitemap_file=url_list_path, browser_pool=pool,
+                                   results_format=results_format, profile=profile,
+                                   audits_dir=list_dir)
+
+    try:
+        site_audit, audit_seconds = timed(site.audit)
+        _, summary_seconds = timed(lambda: site_audit.summary)
+        _, csv_seconds = timed(site_audit.write_violations_to_csv)
+        _, rules_seconds = timed(site_audit.write_rules_to_csv)
+        _, templates_seconds = timed(site_audit.write_templates_to_csv)
+        total_seconds = (audit_seconds + summary_seconds + csv_seconds + rules_seconds +
+                         templates_seconds)
+
+        return {
+            'pages': pages,
+            'workers': workers,
+            'results_format': results_format,
+            'violations': len(site_audit.violations),
+            'audit_seconds': round(audit_seconds, 3),
+            'audit_pages_per_second': rate(pages, audit_seconds),
+            'summary_seconds': round(summary_seconds, 3),
+            'csv_seconds': round(csv_seconds, 3),
+            'csv_bytes': os.path.getsize(site_audit.violations_path),
+            'rules_seconds': round(rules_seconds, 3),
+            'templates_seconds': round(templates_seconds, 3),
+            'pages_per_second': rate(pages, total_seconds)
+        }
+    finally:
+        shutil.rmtree(list_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=10000)
+    parser.add_argument('--templates', type=int, default=10)
+    parser.add_argument('--density', type=float, default=0.2, help='violation density 0-1')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--results', choices=Site.RESULTS_FORMATS, default='json')
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.pages, args.templates, args.density, args.workers, args.results),
+                     indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Url Normalization Micro-Benchmark
+Times Site.normalize_url and Site.is_valid_internal_url over a synthetic corpus shaped like
+the links the spider extracts: relative and absolute internal links, external links, assets,
+fragments, mailto/tel links and tracking params.
+
+Usage:
+    python -m benchmarks.bench_urls
+    python -m benchmarks.bench_urls --urls 100000 --strip-tracking-params
+"""
+import argparse
+import random
+import time
+
+from models.site import Site
+
+LINK_SHAPES = [
+    '/{seg}/{seg}/{n}',
+    '{seg}/{n}/',
+    'http://bench.example.com/{seg}/{n}?page={n}',
+    'http://bench.example.com/{seg}/{n}?utm_source=mail&utm_medium={seg}',
+    '/{seg}/{n}#section-{n}',
+    '#top',
+    'https://google.com/{seg}',
+    '/static/{seg}-{n}.png',
+    '/files/{seg}-{n}.pdf',
+    'mailto:{seg}@example.com',
+    'tel:555-555-{n}',
+    '/',
+]
+SEGMENTS = ['blog', 'news', 'events', 'docs', 'api', 'about', 'Products', 'team']
+
+
+def build_corpus(size, seed=0):
+    rand = random.Random(seed)
+    return [rand.choice(LINK_SHAPES).format(seg=rand.choice(SEGMENTS), n=rand.randint(1, 9999))
+            for _ in range(size)]
+
+
+def run(size, **site_options):
+    site = Site.from_domain_or_url('http://bench.example.com', **site_options)
+    corpus = build_corpus(size)
+
+    started = time.perf_counter()
+    normalized = [site.normalize_url(link) for link in corpus]
+    normalized_at = time.perf_counter()
+    valid = [url for url in normalized if site.is_valid_internal_url(url)]
+    ended = time.perf_counter()
+
+    return {
+        'urls': size,
+        'valid': len(valid),
+        'normalize_seconds': round(normalized_at - started, 4),
+        'classify_seconds': round(ended - normalized_at, 4),
+        'urls_per_second': round(size / (ended - started)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--urls', type=int, default=1000000)
+    parser.add_argument('--strip-tracking-params', action='store_true')
+    parser.add_argument('--url-case', choices=['preserve', 'host', 'lower'])
+    parser.add_argument('--trailing-slash', choices=['preserve', 'strip', 'add'])
+    args = parser.parse_args()
+
+    result = run(args.urls, strip_tracking_params=args.strip_tracking_params,
+                 url_case=args.url_case, trailing_slash=args.trailing_slash)
+    for key, value in result.items():
+        print('{:<20}{}'.format(key + ':', value))
+
+
+if __name__ == '__main__':
+    main()
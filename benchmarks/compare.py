@@ -0,0 +1,56 @@
+"""
+Benchmark Comparison
+Prints the change in each metric between two benchmark result files.
+
+Usage:
+    python -m benchmarks.compare benchmarks/results/<before>.json benchmarks/results/<after>.json
+"""
+import argparse
+import json
+
+
+def flatten(results, prefix=''):
+    metrics = {}
+    for key, value in results.items():
+        name = '{}.{}'.format(prefix, key) if prefix else key
+        if isinstance(value, dict):
+            metrics.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = value
+    return metrics
+
+
+def compare(before, after):
+    before_metrics = flatten(before)
+    after_metrics = flatten(after)
+    rows = []
+
+    for name in sorted(set(before_metrics) & set(after_metrics)):
+        old, new = before_metrics[name], after_metrics[name]
+        change = (new - old) / old * 100 if old else None
+        rows.append((name, old, new, change))
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('before')
+    parser.add_argument('after')
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print('{} ({}) -> {} ({})'.format(args.before, before.get('commit'),
+                                      args.after, after.get('commit')))
+    for name, old, new, change in compare(before, after):
+        change_str = '{:+.1f}%'.format(change) if change is not None else 'n/a'
+        print('{:<40}{:>14}{:>14}{:>10}'.format(name, old, new, change_str))
+
+
+if __name__ == '__main__':
+    main()
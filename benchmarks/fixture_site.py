@@ -0,0 +1,172 @@
+"""
+Fixture Site Generator
+Generates a synthetic static site of N templates x M pages and serves it from a local HTTP
+server, so crawl and audit throughput can be measured without touching the network.
+
+Each template is a url path prefix (/template-3/) whose pages share markup. Violation density
+(0.0 - 1.0) controls how many of each page's images, form inputs and links are inaccessible,
+and is mirrored by synthetic_axe_results so the report pipeline sees matching violations.
+"""
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from functools import partial
+import os
+from os.path import join as pathjoin
+import random
+import threading
+
+PAGE_F = """<!DOCTYPE html>
+<html{lang}>
+<head><title>{title}</title><link rel="stylesheet" href="/static/site.css"></head>
+<body>
+<nav>{nav}</nav>
+<main>
+<h1>{title}</h1>
+{body}
+</main>
+</body>
+</html>
+"""
+
+# Elements per page that can carry a violation.
+ELEMENTS_PER_PAGE = 10
+
+
+class FixtureSite(object):
+    def __init__(self, root_dir, templates=10, pages=100, violation_density=0.2, seed=0):
+        self.root_dir = root_dir
+        self.templates = templates
+        self.pages = pages
+        self.violation_density = violation_density
+        self.seed = seed
+        self.server = None
+
+    #
+    # Properties
+    #
+    @property
+    def page_count(self):
+        return self.templates * self.pages + self.templates + 1
+
+    @property
+    def base_url(self):
+        return 'http://localhost:{}'.format(self.server.server_address[1])
+
+    #
+    # Instance Methods
+    #
+    def page_paths(self):
+        yield '/'
+        for t in range(self.templates):
+            yield '/template-{}/'.format(t)
+            for p in range(self.pages):
+                yield '/template-{}/page-{}.html'.format(t, p)
+
+    def generate(self):
+        rand = random.Random(self.seed)
+        os.makedirs(pathjoin(self.root_dir, 'static'), exist_ok=True)
+
+        template_nav = ''.join('<a href="/template-{0}/">Template {0}</a>'.format(t)
+                               for t in range(self.templates))
+        self.write_page('/', 'Home', template_nav, '<p>Fixture home</p>', rand)
+
+        for t in range(self.templates):
+            page_links = ''.join('<a href="/template-{0}/page-{1}.html">Page {1}</a>'.format(t, p)
+                                 for p in range(self.pages))
+            self.write_page('/template-{}/'.format(t), 'Template {}'.format(t), template_nav,
+                            page_links, rand)
+            for p in range(self.pages):
+                # Pages link to their neighbours so the crawl graph is more than a star.
+                neighbours = '<a href="/template-{}/page-{}.html">Next</a>'.format(
+                    t, (p + 1) % self.pages)
+                self.write_page('/template-{}/page-{}.html'.format(t, p),
+                                'Template {} Page {}'.format(t, p), template_nav,
+                                neighbours + self.template_body(t), rand)
+
+        return self.root_dir
+
+    def template_body(self, template):
+        return '<section class="template-{}"><p>{}</p></section>'.format(
+            template, 'Lorem ipsum dolor sit amet. ' * 20)
+
+    def write_page(self, path, title, nav, body, rand):
+        elements = []
+        for n in range(ELEMENTS_PER_PAGE):
+            broken = rand.random() < self.violation_density
+            kind = n % 3
+            if kind == 0:
+                alt = '' if broken else ' alt="Figure {}"'.format(n)
+                elements.append('<img src="/static/{}.png"{}>'.format(n, alt))
+            elif kind == 1:
+                label = '' if broken else '<label for="f{0}">Field {0}</label>'.format(n)
+                elements.append('{}<input id="f{}" type="text">'.format(label, n))
+            else:
+                text = '' if broken else 'Link {}'.format(n)
+                elements.append('<a href="#s{}">{}</a>'.format(n, text))
+
+        lang = '' if rand.random() < self.violation_density else ' lang="en"'
+        html = PAGE_F.format(lang=lang, title=title, nav=nav, body=body + ''.join(elements))
+
+        file_path = pathjoin(self.root_dir, path.lstrip('/'))
+        if path.endswith('/'):
+            file_path = pathjoin(file_path, 'index.html')
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w') as f:
+            f.write(html)
+
+    def write_sitemap_xml(self):
+        # Sitemap locations must be absolute, so this waits until the port is known.
+        with open(pathjoin(self.root_dir, 'sitemap.xml'), 'w') as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            f.write('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+            for path in self.page_paths():
+                f.write('<url><loc>{}{}</loc></url>\n'.format(self.base_url, path))
+            f.write('</urlset>\n')
+
+    def serve(self):
+        """Serves the site from a daemon thread on a free port."""
+        handler = partial(QuietHandler, directory=self.root_dir)
+        self.server = ThreadingHTTPServer(('localhost', 0), handler)
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.write_sitemap_xml()
+        return self.base_url
+
+    def shutdown(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def synthetic_axe_results(url, violation_density, seed=0):
+    """Axe-shaped results for url with roughly violation_density of ELEMENTS_PER_PAGE nodes
+    failing, spread over a handful of rules and impacts.
+    """
+    rand = random.Random('{}-{}'.format(seed, url))
+    rules = [('image-alt', 'critical'), ('label', 'critical'), ('link-name', 'serious'),
+             ('color-contrast', 'serious'), ('html-has-lang', 'serious')]
+    violations = []
+    incomplete = []
+
+    for n, (rule, impact) in enumerate(rules):
+        nodes = [{'impact': impact,
+                  'html': '<div class="component-{}-{}">'.format(rule, k % 3),
+                  'target': ['.component-{}'.format(k)],
+                  'failureSummary': 'Fix any of the following: {}'.format(rule)}
+                 for k in range(ELEMENTS_PER_PAGE // len(rules) * 2)
+                 if rand.random() < violation_density]
+        if not nodes:
+            continue
+        result = {'id': rule, 'impact': impact, 'tags': ['wcag2a', 'cat.{}'.format(rule)],
+                  'description': 'Ensures {} rule passes'.format(rule),
+                  'help': '{} must pass'.format(rule),
+                  'helpUrl': 'https://dequeuniversity.com/rules/axe/3.1/{}'.format(rule),
+                  'nodes': nodes}
+        (incomplete if n == 3 and rand.random() < 0.5 else violations).append(result)
+
+    return {'url': url, 'violations': violations, 'incomplete': incomplete,
+            'passes': [], 'inapplicable': []}
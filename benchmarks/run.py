@@ -0,0 +1,176 @@
+"""
+Benchmark Suite
+Generates a fixture site, serves it locally and measures the stages of a site audit:
+crawl pages/sec (SitemapSpider via Site.generate_sitemap), report pipeline pages/sec
+(AxePageAudit.parse_report over synthetic axe results), optional browser audit pages/sec,
+AxeSiteAudit summary and CSV generation time, and peak RSS. Results are saved as JSON so
+runs can be compared between commits with benchmarks.compare.
+
+Usage:
+    python -m benchmarks.run
+    python -m benchmarks.run --templates 20 --pages 500 --density 0.5
+    python -m benchmarks.run --audit 10    # also audit 10 pages with Chrome
+    python -m benchmarks.run --audit 10 --profile-file profiles/fast.yml
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import json
+import logging
+import os
+from os.path import join as pathjoin, dirname, realpath
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+
+from benchmarks.fixture_site import FixtureSite, synthetic_axe_results
+from models.audit_profile import AuditProfile
+from models.axe_audit import AxeAudit, AxePageAudit
+from models.page import Page
+from models.site import Site
+
+RESULTS_DIR = pathjoin(dirname(realpath(__file__)), 'results')
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (subprocess.CalledProcessError, OSError):
+        return 'unknown'
+
+
+def peak_rss_mb():
+    # ru_maxrss is kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    value = fn(*args)
+    return value, time.perf_counter() - started
+
+
+def rate(count, seconds):
+    return round(count / seconds, 2) if seconds else None
+
+
+def bench_crawl(site):
+    site.start_run()
+    _, seconds = timed(site.generate_sitemap)
+    urls = list(site.read_sitemap_urls(site.sitemap_path))
+    return urls, {'pages': len(urls), 'seconds': round(seconds, 4),
+                  'pages_per_second': rate(len(urls), seconds)}
+
+
+def bench_report_pipeline(site, urls, density):
+    """Writes synthetic axe reports where the browser would, then parses them with
+    AxePageAudit exactly as Site.audit does.
+    """
+    for url in urls:
+        audit = AxePageAudit(Page(site, url))
+        with open(audit.report_path, 'w') as f:
+            json.dump(synthetic_axe_results(url, density), f, indent=4)
+
+    def parse_all():
+        for url in urls:
+            page = Page(site, url)
+            audit = AxePageAudit(page, site.audit_type)
+            audit.violations = audit.parse_report(audit.report_path)
+            page.audit = audit
+            site.pages.append(page)
+
+    _, seconds = timed(parse_all)
+    return {'pages': len(urls), 'seconds': round(seconds, 4),
+            'pages_per_second': rate(len(urls), seconds)}
+
+
+def bench_browser_audit(site, urls):
+    def audit_all():
+        # As Site.audit does, with the profile's worker count.
+        with ThreadPoolExecutor(max_workers=site.profile.workers) as executor:
+            list(executor.map(site.audit_page, urls))
+
+    _, seconds = timed(audit_all)
+    return {'pages': len(urls), 'seconds': round(seconds, 4),
+            'pages_per_second': rate(len(urls), seconds)}
+
+
+def bench_outputs(site):
+    site_audit = AxeAudit.from_site(site)
+    summary, summary_seconds = timed(lambda: site_audit.summary)
+    _, csv_seconds = timed(site_audit.write_violations_to_csv)
+    return {'violations': len(site_audit.violations),
+            'summary_seconds': round(summary_seconds, 4),
+            'csv_seconds': round(csv_seconds, 4),
+            'csv_bytes': os.path.getsize(site_audit.violations_path)}
+
+
+def run(args):
+    fixture_dir = tempfile.mkdtemp(prefix='ann-arbor-fixture-')
+    # Audit output goes to a temp directory too, never over audits/ from real runs.
+    audits_dir = tempfile.mkdtemp(prefix='ann-arbor-audits-')
+    fixture = FixtureSite(fixture_dir, templates=args.templates, pages=args.pages,
+                          violation_density=args.density)
+    fixture.generate()
+    base_url = fixture.serve()
+
+    try:
+        profile = AuditProfile.from_file(args.profile_file) if args.profile_file \
+            else AuditProfile()
+        site = Site.from_domain_or_url(base_url + '/', discovery=args.discover, profile=profile,
+                                       audits_dir=audits_dir)
+        urls, crawl = bench_crawl(site)
+        results = {
+            'commit': git_commit(),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'params': {'templates': args.templates, 'pages': args.pages,
+                       'density': args.density, 'discover': args.discover,
+                       'profile': profile.name, 'profile_settings': profile.to_dict()},
+            'crawl': crawl,
+            'report_pipeline': bench_report_pipeline(site, urls, args.density),
+        }
+        if args.audit:
+            results['browser_audit'] = bench_browser_audit(site, urls[:args.audit])
+        results['outputs'] = bench_outputs(site)
+        results['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    finally:
+        fixture.shutdown()
+        shutil.rmtree(fixture_dir, ignore_errors=True)
+        shutil.rmtree(audits_dir, ignore_errors=True)
+
+    return results
+
+
+def save(results, output_dir=RESULTS_DIR):
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
+    path = pathjoin(output_dir, '{}-{}.json'.format(stamp, results['commit']))
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--templates', type=int, default=10)
+    parser.add_argument('--pages', type=int, default=100, help='pages per template')
+    parser.add_argument('--density', type=float, default=0.2, help='violation density 0-1')
+    parser.add_argument('--discover', choices=Site.DISCOVERY_MODES, default='links')
+    parser.add_argument('--audit', type=int, default=0, metavar='N',
+                        help='audit N pages with a real browser')
+    parser.add_argument('--profile-file', help='YAML audit profile to benchmark')
+    parser.add_argument('--output-dir', default=RESULTS_DIR)
+    args = parser.parse_args()
+
+    logging.getLogger('scrapy').setLevel(logging.WARNING)
+    results = run(args)
+    print(json.dumps(results, indent=2))
+    print('Saved: {}'.format(save(results, args.output_dir)))
+
+
+if __name__ == '__main__':
+    main()
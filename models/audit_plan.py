@@ -0,0 +1,148 @@
+"""
+AuditPlan
+The order a site's pages are audited in, and when to stop (python app.py audit --crawl
+--prioritize --time-budget 240 httpbin.org).
+
+Prioritized plans rank pages by importance, from the link stats and static checks the crawl
+records: pages linked from many others, few clicks from the home page and with more issues found
+by the static checks (see StaticChecker) come first. Pages are grouped by template
+(see Page.templates) and taken a round at a time, each template's most important page first,
+so the first pages audited cover as many templates as possible. Unprioritized plans keep
+sitemap order and read the sitemap lazily.
+
+A time budget, counted from the start of the run, stops the plan handing out urls once it runs
+out. Pages already being audited finish. The summary then reports the coverage achieved, and a
+later run with --resume picks up the pages left over. If the budget ran out during the crawl,
+the totals count only the pages found so far, and --resume continues the crawl too.
+
+Relationships
+- belongs_to site
+"""
+from datetime import datetime, timedelta, timezone
+
+from models.page import Page
+
+
+class AuditPlan(object):
+    def __init__(self, site, urls, prioritize=False, time_budget=None):
+        self.site = site
+        self.prioritize = prioritize
+        # Minutes, or None for no limit.
+        self.time_budget = time_budget
+        # A crawl cut short by the budget has used it all up.
+        self.budget_exhausted = site.crawl_truncated
+        self.pages_total = None
+        self.templates_total = None
+
+        if prioritize:
+            urls = self.rank(urls)
+            self.pages_total = len(urls)
+        self.urls = urls
+
+    #
+    # Static Methods
+    #
+    @staticmethod
+    def template_for(page):
+        # Subtemplates, where pages have them, tell pages of one section apart.
+        return page.subtemplate or page.template or ''
+
+    #
+    # Properties
+    #
+    @property
+    def deadline(self):
+        if self.time_budget is None:
+            return None
+        return self.site.started_at + timedelta(minutes=self.time_budget)
+
+    @property
+    def templates_audited(self):
+        return len(set(self.template_for(page) for page in self.site.pages))
+
+    #
+    # Instance Methods
+    #
+    def importance(self, page, link_stats, static_scores):
+        """Pages linked from more pages, fewer clicks from the home page, and with more
+        static check issues, rank higher. Pages the crawl did not reach by links (e.g. from XML
+        sitemaps) are assumed to be as deep as their url path.
+        """
+        depth, in_degree = link_stats.get(page.url, (len(page.templates), 0))
+        return (1 + in_degree) / (1 + depth) * (1 + static_scores.get(page.url, 0))
+
+    def rank(self, urls):
+        link_stats = self.site.read_link_stats()
+        static_scores = self.site.static_checks.scores()
+        groups = {}
+        for url in urls:
+            page = Page(self.site, url)
+            groups.setdefault(self.template_for(page), []).append(
+                (self.importance(page, link_stats, static_scores), url))
+
+        for ranked_urls in groups.values():
+            ranked_urls.sort(key=lambda iu: iu[0], reverse=True)
+        # Templates with the most important page go first in each round.
+        templates = sorted(groups.values(), key=lambda ranked: ranked[0][0], reverse=True)
+        self.templates_total = len(templates)
+
+        ranked = []
+        for n in range(max(len(ranked_urls) for ranked_urls in templates) if templates else 0):
+            ranked.extend(ranked_urls[n][1] for ranked_urls in templates if n < len(ranked_urls))
+        return ranked
+
+    def count_totals(self):
+        """Pages and templates in the sitemap, from a second pass over it."""
+        templates = set()
+        pages_total = 0
+        for url in self.site.read_page_urls():
+            templates.add(self.template_for(Page(self.site, url)))
+            pages_total += 1
+        self.pages_total = pages_total
+        self.templates_total = len(templates)
+        return self
+
+    def coverage(self):
+        if self.pages_total is None:
+            self.count_totals()
+        return {
+            'budget_exhausted': self.budget_exhausted,
+            # False when the totals are only the pages found before the crawl was cut short.
+            'crawl_finished': not self.site.crawl_truncated,
+            'pages_audited': len(self.site.pages),
+            'pages_total': self.pages_total,
+            'templates_audited': self.templates_audited,
+            'templates_total': self.templates_total
+        }
+
+    def summarize(self):
+        if self.site.crawl_truncated:
+            summary_f = ('Time budget of {} minutes ran out before the crawl finished. Audited '
+                         '{} of the {} pages found so far ({:.0%}), covering {} of {} templates '
+                         '({:.0%}). Rerun with --resume to continue the crawl and audit.')
+        else:
+            summary_f = ('Time budget of {} minutes ran out. Audited {} of {} pages ({:.0%}), '
+                         'covering {} of {} templates ({:.0%}). Rerun with --resume to '
+                         'continue.')
+        coverage = self.coverage()
+        return summary_f.format(self.time_budget,
+                                coverage['pages_audited'], coverage['pages_total'],
+                                self.share(coverage['pages_audited'], coverage['pages_total']),
+                                coverage['templates_audited'], coverage['templates_total'],
+                                self.share(coverage['templates_audited'],
+                                           coverage['templates_total']))
+
+    def share(self, part, total):
+        return part / total if total else 1
+
+    # Magic Methods
+    def __iter__(self):
+        for url in self.urls:
+            if self.time_budget is not None and datetime.now(timezone.utc) >= self.deadline:
+                self.budget_exhausted = True
+                return
+            yield url
+
+    def __repr__(self):
+        F = '<AuditPlan prioritize={} time_budget={} budget_exhausted={}>'
+        return F.format(self.prioritize, self.time_budget, self.budget_exhausted)
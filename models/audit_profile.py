@@ -0,0 +1,214 @@
+"""
+AuditProfile
+Tuning for an audit, loaded from YAML (python app.py audit --profile-file profiles/fast.yml).
+Settings left out of a profile keep their defaults, so a profile only lists what it changes.
+See profiles/example.yml for every setting.
+
+Sections
+- workers   pages audited at once
+- browser   Chrome session pool size, command line options, timeouts, blocked resources and
+            viewports; or replayed axe results instead of Chrome
+- axe       rule subsets: run only some rules or tags, or disable rules; full results
+- crawl     user agent, page and depth limits, concurrency, delay, download timeout and cache
+- output    violations format, results format, HTML report, dedupe and progress
+- auth      scripted login for sites behind one. See AuthSession.
+"""
+import copy
+import os
+
+import yaml
+
+
+class InvalidAuditProfile(Exception):
+    pass
+
+
+class AuditProfile(object):
+    DEFAULTS = {
+        'workers': 1,
+        'browser': {
+            # Defaults to one session per worker.
+            'pool_size': None,
+            'chrome_options': ['--headless'],
+            'page_load_timeout': None,
+            'script_timeout': None,
+            # Url patterns Chrome should not load, e.g. '*.png'. Wildcards allowed.
+            'block_resources': [],
+            # Run axe at each of these viewports on one page load, e.g. [desktop, mobile].
+            'viewports': [],
+            # chrome, or replay to serve recorded axe results from replay_from. See ReplayDriver.
+            'driver': 'chrome',
+            'replay_from': None
+        },
+        'axe': {
+            'rules': [],
+            'tags': [],
+            'disable_rules': [],
+            # Keep passes, inapplicable results and check details, e.g. for debugging.
+            'full_results': False
+        },
+        'crawl': {
+            'user_agent': 'Ann Arbor Spider',
+            'max_pages': None,
+            'max_depth': None,
+            'concurrent_requests': None,
+            'download_delay': None,
+            'timeout': None,
+            # Keep responses between crawls and revalidate them. See Site.crawl_settings.
+            'http_cache': True
+        },
+        'output': {
+            'format': None,
+            'results': None,
+            'html': False,
+            'dedupe': False,
+            'progress': None
+        },
+        'auth': {
+            # Log in here once, then share the session with the crawl and every browser.
+            'login_url': None,
+            'username': None,
+            # Environment variable holding the password.
+            'password_env': 'ANN_ARBOR_PASSWORD',
+            # CSS selectors for the login form.
+            'username_selector': 'input[type=email], input[name=username], input[name=email]',
+            'password_selector': 'input[type=password]',
+            'submit_selector': '[type=submit]',
+            # Seconds to wait for the login to leave the login page.
+            'timeout': 30,
+            # Log in again after this many seconds, besides when cookies expire.
+            'max_age': None,
+            # Url paths not crawled while logged in, so the crawl does not log itself out.
+            'skip_pattern': 'log-?out|sign-?out'
+        }
+    }
+
+    DRIVERS = ['chrome', 'replay']
+
+    # Crawl settings and the scrapy settings they set.
+    # https://docs.scrapy.org/en/latest/topics/settings.html
+    SCRAPY_SETTINGS = {
+        'max_pages': 'CLOSESPIDER_PAGECOUNT',
+        'max_depth': 'DEPTH_LIMIT',
+        'concurrent_requests': 'CONCURRENT_REQUESTS',
+        'download_delay': 'DOWNLOAD_DELAY',
+        'timeout': 'DOWNLOAD_TIMEOUT'
+    }
+
+    def __init__(self, settings=None, name='default'):
+        self.name = name
+        self.settings = AuditProfile.merge(AuditProfile.DEFAULTS, settings or {})
+        self.validate()
+
+    #
+    # Static Methods
+    #
+    @staticmethod
+    def from_file(path):
+        with open(path, 'r') as f:
+            settings = yaml.safe_load(f)
+
+        if settings is not None and not isinstance(settings, dict):
+            raise InvalidAuditProfile('Audit profile must be a mapping: {}'.format(path))
+
+        name, _ = os.path.splitext(os.path.basename(path))
+        return AuditProfile(settings, name=name)
+
+    @staticmethod
+    def merge(defaults, overrides, section=None):
+        merged = copy.deepcopy(defaults)
+        for key, value in overrides.items():
+            if key not in defaults:
+                setting = '{}.{}'.format(section, key) if section else key
+                error_str = 'Invalid profile setting: {}. Must be from the following: {}'.format(
+                    setting, sorted(defaults))
+                raise InvalidAuditProfile(error_str)
+
+            if isinstance(defaults[key], dict):
+                if not isinstance(value, dict):
+                    raise InvalidAuditProfile('Profile section {} must be a mapping.'.format(key))
+                merged[key] = AuditProfile.merge(defaults[key], value, key)
+            else:
+                merged[key] = value
+        return merged
+
+    #
+    # Properties
+    #
+    @property
+    def workers(self):
+        return self.settings['workers']
+
+    @property
+    def browser(self):
+        return self.settings['browser']
+
+    @property
+    def pool_size(self):
+        return self.browser['pool_size'] or self.workers
+
+    @property
+    def axe_options(self):
+        """Options for axe.run, or None to run every rule.
+        https://github.com/dequelabs/axe-core/blob/develop/doc/API.md#options-parameter
+        """
+        axe = self.settings['axe']
+        options = {}
+
+        if axe['rules']:
+            options['runOnly'] = {'type': 'rule', 'values': list(axe['rules'])}
+        elif axe['tags']:
+            options['runOnly'] = {'type': 'tag', 'values': list(axe['tags'])}
+
+        if axe['disable_rules']:
+            options['rules'] = dict((rule, {'enabled': False}) for rule in axe['disable_rules'])
+
+        return options or None
+
+    @property
+    def user_agent(self):
+        return self.settings['crawl']['user_agent']
+
+    @property
+    def crawl_settings(self):
+        crawl = self.settings['crawl']
+        settings = {}
+        for key, scrapy_setting in self.SCRAPY_SETTINGS.items():
+            if crawl[key] is not None:
+                settings[scrapy_setting] = crawl[key]
+        return settings
+
+    @property
+    def output(self):
+        return self.settings['output']
+
+    #
+    # Instance Methods
+    #
+    def validate(self):
+        for setting, value in [('workers', self.workers),
+                               ('browser.pool_size', self.pool_size)]:
+            if not isinstance(value, int) or value < 1:
+                error_str = 'Invalid profile setting: {} = {}. Must be a positive integer.'
+                raise InvalidAuditProfile(error_str.format(setting, value))
+
+        driver = self.browser['driver']
+        if driver not in self.DRIVERS:
+            error_str = ('Invalid profile setting: browser.driver = {}. Must be from the '
+                         'following: {}')
+            raise InvalidAuditProfile(error_str.format(driver, self.DRIVERS))
+        if driver == 'replay' and not self.browser['replay_from']:
+            raise InvalidAuditProfile('Profile setting browser.replay_from is required to '
+                                      'replay recorded results.')
+
+        auth = self.settings['auth']
+        if auth['login_url'] and not auth['username']:
+            raise InvalidAuditProfile('Profile setting auth.username is required to log in.')
+
+    def to_dict(self):
+        return copy.deepcopy(self.settings)
+
+    # Magic Methods
+    def __repr__(self):
+        F = '<AuditProfile name={} workers={} pool_size={}>'
+        return F.format(self.name, self.workers, self.pool_size)
@@ -0,0 +1,145 @@
+"""
+AuditServer
+Long-running audit daemon (python app.py serve). Keeps a pool of warm Chrome sessions and a
+running crawler reactor, and accepts audit jobs as JSON over HTTP on a local port or a Unix
+socket. Jobs return the same data as the CLI audit, serialized with to_dict. Crawl jobs for
+the same site share its job directory and sitemap, so they run one at a time.
+
+API
+- GET  /health   {"status": "ok", "browsers": <launched sessions>}
+- POST /audit    {"url": <domain or url>, "audit_type": null|design|code, "crawl": false,
+                  "templates": true, "discover": links|sitemaps|both}
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import socketserver
+import threading
+
+from models.axe_audit import InvalidAuditType
+from models.browser_pool import BrowserPool
+from models.page import Page
+from models.site import Site, CrawlInterrupted, InvalidDiscoveryMode
+from spiders.crawler_service import CrawlerService
+
+
+class InvalidJob(Exception):
+    pass
+
+
+class AuditServer(object):
+    def __init__(self, **options):
+        self.host = options.get('host', 'localhost')
+        self.port = options.get('port', 8642)
+        self.socket_path = options.get('socket_path')
+        self.browser_pool = BrowserPool(size=options.get('browsers', 1))
+        self.crawler_service = CrawlerService()
+        self.http_server = None
+        # Audit directory -> lock held by the site's running crawl job.
+        self.site_locks = {}
+        self.lock = threading.Lock()
+
+    #
+    # Properties
+    #
+    @property
+    def address(self):
+        if self.socket_path:
+            return 'unix:{}'.format(self.socket_path)
+        return 'http://{}:{}'.format(self.host, self.http_server.server_address[1])
+
+    #
+    # Instance Methods
+    #
+    def start(self):
+        self.crawler_service.start()
+        self.browser_pool.warm_up()
+
+        if self.socket_path:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            self.http_server = ThreadingUnixHTTPServer(self.socket_path, AuditRequestHandler)
+        else:
+            self.http_server = ThreadingHTTPServer((self.host, self.port), AuditRequestHandler)
+
+        self.http_server.audit_server = self
+        return self
+
+    def serve_forever(self):
+        try:
+            self.http_server.serve_forever()
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.http_server.server_close()
+        self.browser_pool.close()
+        self.crawler_service.stop()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def run_job(self, job):
+        if not job.get('url'):
+            raise InvalidJob('Job must specify a url.')
+
+        audit_type = job.get('audit_type')
+        site = Site.from_domain_or_url(job['url'], audit_type=audit_type,
+                                       templates=job.get('templates', True),
+                                       discovery=job.get('discover'),
+                                       browser_pool=self.browser_pool,
+                                       crawler_service=self.crawler_service)
+
+        if job.get('crawl'):
+            with self.site_lock(site):
+                audit = site.audit()
+        else:
+            audit = Page.audit(site, audit_type=audit_type)
+
+        return audit.to_dict()
+
+    def site_lock(self, site):
+        with self.lock:
+            return self.site_locks.setdefault(site.audit_dir, threading.Lock())
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class AuditRequestHandler(BaseHTTPRequestHandler):
+    CLIENT_ERRORS = (InvalidJob, InvalidAuditType, InvalidDiscoveryMode, CrawlInterrupted,
+                     ValueError)
+
+    def do_GET(self):
+        if self.path != '/health':
+            return self.send_json(404, {'error': 'Not found: {}'.format(self.path)})
+
+        browser_pool = self.server.audit_server.browser_pool
+        self.send_json(200, {'status': 'ok', 'browsers': browser_pool.launched})
+
+    def do_POST(self):
+        if self.path != '/audit':
+            return self.send_json(404, {'error': 'Not found: {}'.format(self.path)})
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            job = json.loads(self.rfile.read(length) or b'{}')
+            result = self.server.audit_server.run_job(job)
+        except self.CLIENT_ERRORS as e:
+            return self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            return self.send_json(500, {'error': '{}: {}'.format(type(e).__name__, e)})
+
+        self.send_json(200, result)
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket clients have no address.
+        return self.client_address[0] if self.client_address else 'unix'
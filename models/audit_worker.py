@@ -0,0 +1,133 @@
+"""
+Distributed Audits
+AuditCoordinator crawls a site and enqueues its page urls on a shared WorkQueue, then collects
+the results into an AxeSiteAudit. AuditWorker, run on any number of nodes, leases urls from the
+queue, audits them with AxePageAudit and pushes the results back.
+
+    python app.py coordinate httpbin.org --queue sqlite:///shared/httpbin.db
+    python app.py work --queue sqlite:///shared/httpbin.db
+"""
+import os
+import socket
+import time
+from urllib.parse import urlsplit
+
+from models.audit_profile import AuditProfile
+from models.auth_session import AuthSession
+from models.axe_audit import AxeAudit
+from models.browser_pool import BrowserPool
+from models.page import Page
+from models.profiler import Profiler
+from models.site import CrawlInterrupted, Site
+
+
+class AuditCoordinator(object):
+    def __init__(self, site, queue):
+        self.site = site
+        self.queue = queue
+
+    #
+    # Instance Methods
+    #
+    def enqueue(self):
+        """Crawls the site, unless given a sitemap file, and queues its pages as a new run.
+        Returns the number of pages queued.
+        """
+        AxeAudit.validate_type(self.site.audit_type)
+        self.site.start_run()
+        urls = self.site.extract_site_page_urls_from_sitemap()
+
+        if self.site.crawl_finished is False and not self.site.crawl_truncated:
+            raise CrawlInterrupted('Crawl of {} was interrupted. Nothing was queued.'.format(
+                self.site.fqdn))
+
+        # Results of an earlier run on the same queue are not this run's.
+        self.queue.start_run(self.site.run_id)
+        self.queue.set_meta('audit_type', self.site.audit_type)
+        return self.queue.enqueue(urls)
+
+    def wait(self, poll_seconds=5, on_progress=None):
+        """Blocks until every queued url is done or has failed for good."""
+        while True:
+            counts = self.queue.counts()
+            if on_progress:
+                on_progress(counts)
+            if self.queue.is_done():
+                return counts
+            time.sleep(poll_seconds)
+
+    def collect(self):
+        for url, data in self.queue.results():
+            page = Page(self.site, url)
+            page.aliases = self.site.aliases.get(url, [])
+            page.audit = AxeAudit.from_page_dict(page, data)
+            self.site.add_page(page)
+
+        return AxeAudit.from_site(self.site)
+
+
+class AuditWorker(object):
+    def __init__(self, queue, **options):
+        self.queue = queue
+        self.worker_id = options.get('worker_id') or '{}-{}'.format(socket.gethostname(),
+                                                                    os.getpid())
+        self.poll_seconds = options.get('poll_seconds', 5)
+        self.profile = options.get('profile') or AuditProfile()
+        self.browser_pool = options.get('browser_pool') or BrowserPool.from_profile(self.profile)
+        # Logs in once for every page the worker audits, like its browsers are launched once.
+        self.auth_session = options.get('auth_session') or AuthSession.from_profile(
+            self.profile)
+        # (origin, audit type) -> Site, reused across the pages the worker leases.
+        self.sites = {}
+
+    #
+    # Instance Methods
+    #
+    def run(self, forever=False):
+        """Audits urls until the queue is drained, or indefinitely when forever is set."""
+        audited = 0
+        try:
+            while True:
+                task = self.run_once()
+                if task is not None:
+                    audited += 1
+                elif not forever and self.queue.is_done():
+                    return audited
+                else:
+                    time.sleep(self.poll_seconds)
+        finally:
+            # Closing the sites flushes their result stores.
+            for site in self.sites.values():
+                site.close()
+            self.sites.clear()
+            self.browser_pool.close()
+            if self.auth_session:
+                self.auth_session.close()
+
+    def run_once(self):
+        task = self.queue.lease(self.worker_id)
+        if task is None:
+            return None
+
+        audit_type = self.queue.get_meta('audit_type')
+        try:
+            page = Page(self.site_for(task.url, audit_type), task.url)
+            page.axe_audit(audit_type)
+            self.queue.complete(task.url, page.audit.to_dict(), self.worker_id)
+        except Exception as e:
+            self.queue.fail(task.url, '{}: {}'.format(type(e).__name__, e), self.worker_id)
+
+        return task
+
+    def site_for(self, url, audit_type):
+        parts = urlsplit(url)
+        origin = '{}://{}'.format(parts.scheme, parts.netloc)
+        site = self.sites.get((origin, audit_type))
+        if site is None:
+            site = Site.from_domain_or_url(origin, audit_type=audit_type,
+                                           browser_pool=self.browser_pool,
+                                           auth_session=self.auth_session, profile=self.profile)
+            self.sites[(origin, audit_type)] = site
+        # Workers report no timings. A fresh profiler keeps a long-running worker's memory flat.
+        site.profiler = Profiler()
+        return site
@@ -0,0 +1,262 @@
+"""
+AuthSession
+Signs the crawl and the audit in to sites behind a login. The login is scripted once, in its
+own Chrome session: fill in the username and password fields and submit. The cookies and
+localStorage it leaves behind are then copied into every pooled browser session, through the
+DevTools protocol before the session's next page load, and into SitemapSpider's requests, so
+signed-in pages load as fast as public ones.
+
+The session is refreshed, by logging in again, when its cookies expire or after max_age
+seconds, and whenever a page redirects to the login page instead. Only one login runs at a
+time; sessions signed in with an older login pick up the new one before their next page.
+
+Settings come from the audit profile's auth section. See profiles/example.yml. The password is
+read from an environment variable (ANN_ARBOR_PASSWORD by default) so it stays out of profiles.
+
+Relationships
+- belongs_to site
+- has_one login browser pool
+"""
+import json
+import os
+import re
+import threading
+import time
+import weakref
+from urllib.parse import urlsplit
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+from models.browser_pool import BrowserPool
+
+
+class LoginFailed(Exception):
+    pass
+
+
+class AuthSession(object):
+    # Sessions are refreshed this many seconds before their cookies expire, so that a page
+    # load never starts with a cookie about to lapse.
+    EXPIRY_MARGIN = 60
+
+    # Sets the captured localStorage on each page of the logged in origin, before the page's
+    # own scripts run.
+    STORAGE_SCRIPT_F = """
+        (function (origin, items) {{
+            if (window.location.origin !== origin) {{
+                return;
+            }}
+            Object.keys(items).forEach(function (key) {{
+                window.localStorage.setItem(key, items[key]);
+            }});
+        }})({}, {});
+    """
+
+    def __init__(self, settings, login_pool):
+        self.settings = settings
+        # Chrome session the login is scripted in, quit after each login.
+        self.login_pool = login_pool
+        self.skip_pattern = re.compile(settings['skip_pattern'], re.I) \
+            if settings['skip_pattern'] else None
+
+        self.cookies = None
+        self.local_storage = None
+        self.origin = None
+        self.logged_in_at = None
+        # Incremented by each login. Drivers remember the login they were signed in with.
+        self.generation = 0
+        self.signed_in_drivers = weakref.WeakKeyDictionary()
+        self.lock = threading.Lock()
+
+    #
+    # Static Methods
+    #
+    @staticmethod
+    def from_profile(profile):
+        """The profile's login, or None if it has no auth.login_url."""
+        auth = profile.settings['auth']
+        if not auth['login_url']:
+            return None
+
+        # The login gets a Chrome session of its own, whichever driver audits pages.
+        browser = profile.browser
+        login_pool = BrowserPool(size=1, chrome_options=browser['chrome_options'],
+                                 page_load_timeout=browser['page_load_timeout'])
+        return AuthSession(auth, login_pool)
+
+    @staticmethod
+    def cdp_cookie(cookie):
+        """Selenium cookie -> DevTools Network.CookieParam.
+        https://chromedevtools.github.io/devtools-protocol/tot/Network/#type-CookieParam
+        """
+        cdp_cookie = dict((key, cookie[key]) for key in
+                          ['name', 'value', 'domain', 'path', 'secure', 'httpOnly']
+                          if key in cookie)
+        if cookie.get('expiry'):
+            cdp_cookie['expires'] = cookie['expiry']
+        if cookie.get('sameSite') in ['Strict', 'Lax', 'None']:
+            cdp_cookie['sameSite'] = cookie['sameSite']
+        return cdp_cookie
+
+    #
+    # Properties
+    #
+    @property
+    def login_url(self):
+        return self.settings['login_url']
+
+    @property
+    def expires_at(self):
+        """When the session should be refreshed: its first cookie to expire, or max_age
+        seconds after login, whichever is sooner. None if neither applies.
+        """
+        deadlines = [cookie['expiry'] - self.EXPIRY_MARGIN for cookie in self.cookies or []
+                     if cookie.get('expiry')]
+        if self.settings['max_age'] and self.logged_in_at is not None:
+            deadlines.append(self.logged_in_at + self.settings['max_age'])
+        return min(deadlines) if deadlines else None
+
+    @property
+    def expired(self):
+        if self.cookies is None:
+            return True
+        expires_at = self.expires_at
+        return expires_at is not None and time.time() >= expires_at
+
+    @property
+    def password(self):
+        password_env = self.settings['password_env']
+        password = os.environ.get(password_env)
+        if password is None:
+            error_str = 'Set {} to the password for {}.'.format(password_env, self.login_url)
+            raise LoginFailed(error_str)
+        return password
+
+    #
+    # Instance Methods
+    #
+    def current(self):
+        """Returns the current login's generation, logging in first if there is none yet or
+        it has expired.
+        """
+        with self.lock:
+            if self.expired:
+                self.log_in()
+            return self.generation
+
+    def refresh(self, generation):
+        """Logs in again after a page was redirected to the login page, unless a login newer
+        than generation, the one the page was loaded with, has happened since.
+        """
+        with self.lock:
+            if self.generation == generation:
+                self.log_in()
+            return self.generation
+
+    def log_in(self):
+        username_selector = self.settings['username_selector']
+        password_selector = self.settings['password_selector']
+        try:
+            with self.login_pool.checkout() as driver:
+                driver.get(self.login_url)
+                driver.find_element(By.CSS_SELECTOR, username_selector).send_keys(
+                    self.settings['username'])
+                driver.find_element(By.CSS_SELECTOR, password_selector).send_keys(
+                    self.password)
+                driver.find_element(By.CSS_SELECTOR, self.settings['submit_selector']).click()
+
+                try:
+                    WebDriverWait(driver, self.settings['timeout']).until(
+                        lambda d: not self.is_login_page(d.current_url))
+                except TimeoutException:
+                    error_str = ('Login at {} failed: still on the login page after {} '
+                                 'seconds.').format(self.login_url, self.settings['timeout'])
+                    raise LoginFailed(error_str)
+
+                self.cookies = driver.get_cookies()
+                self.local_storage = driver.execute_script(
+                    'return Object.assign({}, window.localStorage);') or {}
+                url = urlsplit(driver.current_url)
+                self.origin = '{}://{}'.format(url.scheme, url.netloc)
+        finally:
+            self.login_pool.close()
+
+        self.logged_in_at = time.time()
+        self.generation += 1
+        return self
+
+    def sign_in(self, driver):
+        """Copies the current login into driver, unless it already has it. Cookies are set
+        for their domains right away; localStorage is set by a script run on each new
+        document of the logged in origin.
+        https://chromedevtools.github.io/devtools-protocol/tot/Page/#method-addScriptToEvaluateOnNewDocument
+        """
+        generation = self.current()
+        signed_in_generation, script_id = self.signed_in_drivers.get(driver, (None, None))
+        if signed_in_generation == generation:
+            return generation
+
+        driver.execute_cdp_cmd('Network.setCookies', {
+            'cookies': [self.cdp_cookie(cookie) for cookie in self.cookies]})
+
+        if script_id:
+            driver.execute_cdp_cmd('Page.removeScriptToEvaluateOnNewDocument',
+                                   {'identifier': script_id})
+            script_id = None
+        if self.local_storage:
+            source = self.STORAGE_SCRIPT_F.format(json.dumps(self.origin),
+                                                  json.dumps(self.local_storage))
+            script = driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument',
+                                            {'source': source})
+            script_id = script.get('identifier')
+
+        self.signed_in_drivers[driver] = (generation, script_id)
+        return generation
+
+    def load(self, driver, url):
+        """Loads url in driver signed in. If the session has expired on the server and the
+        page redirects to the login page, logs in again and reloads the page once.
+        """
+        generation = self.sign_in(driver)
+        driver.get(url)
+
+        if self.is_login_page(driver.current_url):
+            self.refresh(generation)
+            self.sign_in(driver)
+            driver.get(url)
+            if self.is_login_page(driver.current_url):
+                raise LoginFailed('{} redirected to the login page after logging in '
+                                  'again.'.format(url))
+        return driver
+
+    def scrapy_cookies(self):
+        """The current login's cookies, as scrapy Request cookies."""
+        self.current()
+        return [dict((key, cookie[key]) for key in ['name', 'value', 'domain', 'path', 'secure']
+                     if key in cookie)
+                for cookie in self.cookies]
+
+    def is_login_page(self, url):
+        login_url = urlsplit(self.login_url)
+        url = urlsplit(url)
+        return url.netloc == login_url.netloc and \
+            url.path.rstrip('/') == login_url.path.rstrip('/')
+
+    def skips(self, url):
+        """Whether the crawl should leave url alone: the login page, and pages matching
+        skip_pattern (log out links, by default), which would end the session.
+        """
+        if self.is_login_page(url):
+            return True
+        return bool(self.skip_pattern and self.skip_pattern.search(urlsplit(url).path))
+
+    def close(self):
+        self.login_pool.close()
+        return self
+
+    # Magic Methods
+    def __repr__(self):
+        F = '<AuthSession login_url={} generation={}>'
+        return F.format(self.login_url, self.generation)
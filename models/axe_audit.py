@@ -8,20 +8,18 @@ Relationships
 Fields
 - created_at
 """
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import json
 import os
 from os.path import join as pathjoin
 import string
 import csv
-import logging
+import time
 
-from selenium.webdriver.remote.remote_connection import LOGGER as webdriver_logger
-from selenium import webdriver
-from selenium.webdriver import chrome
 from axe_selenium_python import Axe
 
-from config.app import AUDITS_DIR
+from models.html_report import HtmlReport
+from models.parquet_writer import ParquetViolationWriter
 from models.violation import Violation
 
 
@@ -29,6 +27,10 @@ class InvalidAuditType(Exception):
     pass
 
 
+class AxeRunFailed(Exception):
+    pass
+
+
 class AxeAudit(object):
     @staticmethod
     def from_page(page, audit_type):
@@ -36,6 +38,15 @@ class AxeAudit(object):
         audit.now()
         return audit
 
+    @staticmethod
+    def from_page_dict(page, data):
+        """Rebuilds a page audit from AxePageAudit.to_dict, e.g. as returned by a worker."""
+        audit = AxePageAudit(page, data['type'])
+        audit.violations = [Violation.from_dict(page, v) for v in data['violations']]
+        audit.started_at = datetime.fromisoformat(data['started_at'])
+        audit.ended_at = audit.started_at + timedelta(seconds=data['runtime'])
+        return audit
+
     @staticmethod
     def from_site(site):
         audit = AxeSiteAudit(site)
@@ -53,25 +64,31 @@ class AxeAudit(object):
     def write_to_violation_csv(violations_csv_path, violations):
         with open(violations_csv_path, mode='w') as csv_file:
             fieldnames = ['page_url', 'source', 'identifier', 'severity', 'kind', 'help',
-                          'help_url', 'html', 'failure']
+                          'help_url', 'html', 'failure', 'viewport']
             writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
 
             writer.writeheader()
             for violation in violations:
-                violation_data = {
-                        'page_url': violation.page.url,
-                        'source': violation.source,
-                        'identifier': violation.identifier,
-                        'severity': violation.severity,
-                        'kind': violation.kind,
-                        'help': violation.help,
-                        'help_url': violation.help_url,
-                        'html': violation.html,
-                        'failure': violation.failure
-                    }
-                writer.writerow(violation_data)
+                # Duplicate pages share their canonical page's violations.
+                for page_url in violation.page.urls:
+                    writer.writerow(AxeAudit.violation_csv_row(violation, page_url))
         return violations_csv_path
 
+    @staticmethod
+    def violation_csv_row(violation, page_url):
+        return {
+            'page_url': page_url,
+            'source': violation.source,
+            'identifier': violation.identifier,
+            'severity': violation.severity,
+            'kind': violation.kind,
+            'help': violation.help,
+            'help_url': violation.help_url,
+            'html': violation.html,
+            'failure': violation.failure,
+            'viewport': violation.viewport
+        }
+
     #
     # Properties
     #
@@ -89,15 +106,54 @@ class AxeAudit(object):
 
     @property
     def violations_path(self):
+        if self.site.violations_format == 'parquet':
+            return self.parquet_path
         return self.csv_path()
 
+    @property
+    def violations_label(self):
+        return 'Parquet' if self.site.violations_format == 'parquet' else 'CSV'
+
+    @property
+    def parquet_path(self):
+        return self.csv_path().replace('.csv', '.parquet')
+
+    @property
+    def profile_path(self):
+        return self.csv_path().replace('-violations.csv', '-profile.json')
+
+    @property
+    def html_report_path(self):
+        return self.csv_path().replace('-violations.csv', '-report.html')
+
+    @property
+    def profile_summary(self):
+        return self.profiler.summarize()
+
     #
     # Instance Methods
     #
+    def each_violation(self):
+        return iter(self.violations)
+
+    def write_violations(self):
+        if self.site.violations_format == 'parquet':
+            return self.write_violations_to_parquet()
+        return self.write_violations_to_csv()
+
     def write_violations_to_csv(self):
-        path = self.violations_path
+        path = self.csv_path()
         return AxeAudit.write_to_violation_csv(path, self.violations)
 
+    def write_violations_to_parquet(self):
+        return ParquetViolationWriter.write_violations(self.parquet_path, self.violations)
+
+    def write_profile(self):
+        return self.profiler.write_json(self.profile_path)
+
+    def write_html_report(self):
+        return HtmlReport(self).write()
+
 
 class AxeSiteAudit(AxeAudit):
     def __init__(self, site):
@@ -108,6 +164,45 @@ class AxeSiteAudit(AxeAudit):
     #
     # Properties
     #
+    @property
+    def profiler(self):
+        return self.site.profiler
+
+    @property
+    def rule_rollup(self):
+        # Pages added to the site directly, rather than with Site.add_page, are counted here.
+        rollup = self.site.rule_rollup
+        for page in self.site.pages[rollup.pages:]:
+            rollup.add_page(page)
+        return rollup
+
+    @property
+    def template_index(self):
+        # Pages added to the site directly, rather than with Site.add_page, are indexed here.
+        index = self.site.template_index
+        for page in self.site.pages[index.pages:]:
+            index.add_page(page)
+        return index
+
+    @property
+    def rules_path(self):
+        return self.csv_path().replace('-violations.csv', '-rules.csv')
+
+    @property
+    def templates_path(self):
+        return self.csv_path().replace('-violations.csv', '-templates.csv')
+
+    @property
+    def issues_path(self):
+        return self.csv_path().replace('-violations.csv', '-issues.csv')
+
+    @property
+    def violations_path(self):
+        # With dedupe on, the CSV lists unique issues rather than a row per violation.
+        if self.site.dedupe and self.site.violations_format == 'csv':
+            return self.issues_path
+        return super(AxeSiteAudit, self).violations_path
+
     @property
     def violations(self):
         page_violations = []
@@ -118,48 +213,58 @@ class AxeSiteAudit(AxeAudit):
     #
     # Instance Methods
     #
-    def pages_sorted_by_violations(self):
-        return sorted(self.site.pages, key=lambda p: len(p.violations), reverse=True)
+    def each_violation(self):
+        """Yields violations page by page, without collecting them in a list."""
+        for page in self.site.pages:
+            for violation in page.violations:
+                yield violation
 
-    def templates_sorted_by_violations(self):
-        template_groups = {}
+    def write_violations(self):
+        if self.site.dedupe and self.site.violations_format == 'csv':
+            return self.write_issues_to_csv()
+        return super(AxeSiteAudit, self).write_violations()
 
-        for page in self.site.pages:
-            if not page.template:
-                continue
-            if page.template not in template_groups:
-                template_groups[page.template] = 0
-            template_groups[page.template] += len(page.violations)
+    def write_issues_to_csv(self):
+        return self.site.issue_index.write_csv(self.issues_path)
 
-        # Convert to a list of tuples for sorting: https://stackoverflow.com/a/1296049/9381758
-        template_violations = list(template_groups.items())
-        return sorted(template_violations, key=lambda tv: tv[1], reverse=True)
+    def write_rules_to_csv(self):
+        return self.rule_rollup.write_csv(self.rules_path)
 
-    def subtemplates_sorted_by_violations(self):
-        subtemplate_groups = {}
+    def write_templates_to_csv(self):
+        return self.template_index.write_csv(self.templates_path)
 
-        for page in self.site.pages:
-            if not page.subtemplate:
-                continue
-            if page.subtemplate not in subtemplate_groups:
-                subtemplate_groups[page.subtemplate] = 0
-            subtemplate_groups[page.subtemplate] += len(page.violations)
+    def write_violations_to_parquet(self):
+        # Pages are written as they are audited when the site streams its violations.
+        if self.site.streamed_violations_path == self.parquet_path:
+            return self.parquet_path
+        return super(AxeSiteAudit, self).write_violations_to_parquet()
+
+    def pages_sorted_by_violations(self):
+        return sorted(self.site.pages, key=lambda p: len(p.violations), reverse=True)
 
-        # Convert to a list of tuples for sorting: https://stackoverflow.com/a/1296049/9381758
-        subtemplate_violations = list(subtemplate_groups.items())
-        return sorted(subtemplate_violations, key=lambda tv: tv[1], reverse=True)
+    def templates_sorted_by_violations(self, n=None, depth=1):
+        # Templates are the first path segment, subtemplates the first two, and so on.
+        return [(node.path, node.violations) for node in self.template_index.top(n, depth)]
+
+    def subtemplates_sorted_by_violations(self, n=None):
+        return self.templates_sorted_by_violations(n, depth=2)
 
     def csv_path(self):
-        site_path = pathjoin(AUDITS_DIR, self.site.slug, self.site.slug)
+        site_path = pathjoin(self.site.audit_dir, self.site.slug)
         audit_type = self.type
         audit_type = audit_type if audit_type is not None else "all"
         return "{}-site-{}-violations.csv".format(site_path, audit_type)
 
     def summarize(self):
         if self.site.group_by_templates:
-            return self.summarize_by_templates()
+            summary = self.summarize_by_templates()
         else:
-            return self.summarize_by_pages()
+            summary = self.summarize_by_pages()
+
+        audit_plan = self.site.audit_plan
+        if audit_plan is not None and audit_plan.budget_exhausted:
+            summary += "\n\n" + audit_plan.summarize()
+        return summary
 
     def summarize_by_templates(self):
         summary_f = r"""
@@ -177,13 +282,18 @@ Top Templates by Violations:
 Top Subtemplates by Violations:
 {}
 
+Top Rules by Violations:
+{}
+
 created:        {}
 runtime:        {}
 
-Violations CSV: {}"""
+Violations {}: {}
+Rules CSV:      {}
+Templates CSV:  {}"""
 
-        template_violations_groups = self.templates_sorted_by_violations()[:10]
-        subtemplate_violations_groups = self.subtemplates_sorted_by_violations()[:10]
+        template_violations_groups = self.templates_sorted_by_violations(10)
+        subtemplate_violations_groups = self.subtemplates_sorted_by_violations(10)
 
         return summary_f.format(self.site.fqdn,
                                 len(self.site.pages),
@@ -192,9 +302,13 @@ Violations CSV: {}"""
                                 len(self.warnings),
                                 self.format_violation_groups(template_violations_groups),
                                 self.format_violation_groups(subtemplate_violations_groups),
+                                self.rule_rollup.summarize(),
                                 self.created_at.strftime('%F %T'),
                                 self.site.runtime,
-                                self.violations_path)
+                                self.violations_label,
+                                self.violations_path,
+                                self.rules_path,
+                                self.templates_path)
 
     def summarize_by_pages(self):
         summary_f = r"""
@@ -209,10 +323,14 @@ violations:     {}
 Top Pages by Violations:
 {}
 
+Top Rules by Violations:
+{}
+
 created:        {}
 runtime:        {}
 
-Violations CSV: {}"""
+Violations {}: {}
+Rules CSV:      {}"""
 
         sorted_pages = self.pages_sorted_by_violations()[:10]
         top_page_groups = [(page.url, len(page.violations)) for page in sorted_pages]
@@ -222,9 +340,28 @@ Violations CSV: {}"""
                                 len(self.errors),
                                 len(self.warnings),
                                 self.format_violation_groups(top_page_groups),
+                                self.rule_rollup.summarize(),
                                 self.created_at.strftime('%F %T'),
                                 self.site.runtime,
-                                self.violations_path)
+                                self.violations_label,
+                                self.violations_path,
+                                self.rules_path)
+
+    def to_dict(self):
+        audit_plan = self.site.audit_plan
+        return {
+            'fqdn': self.site.fqdn,
+            'type': self.type,
+            'created_at': self.created_at.isoformat(),
+            'runtime': self.site.runtime.total_seconds(),
+            'pages': [page.audit.to_dict() for page in self.site.pages if page.audit],
+            'violations': len(self.violations),
+            'errors': len(self.errors),
+            'warnings': len(self.warnings),
+            'rules': self.rule_rollup.to_dict(),
+            'templates': self.template_index.to_dict(),
+            'coverage': audit_plan.coverage() if audit_plan is not None else None
+        }
 
     def format_violation_groups(self, groups):
         lines = []
@@ -243,6 +380,41 @@ Violations CSV: {}"""
 
 
 class AxePageAudit(AxeAudit):
+    # Runs axe for only the result types parse_report reads, and trims each result to the
+    # fields Violation uses, before the results are serialized back over WebDriver. Passes and
+    # inapplicable results, and each node's check details (any/all/none), are most of a full
+    # payload.
+    # https://github.com/dequelabs/axe-core/blob/develop/doc/API.md#options-parameter
+    TRIMMED_RUN_SCRIPT = """
+        var options = arguments[0];
+        var callback = arguments[arguments.length - 1];
+        options.resultTypes = ['violations', 'incomplete'];
+
+        function trim(result) {
+            return {
+                id: result.id, impact: result.impact, tags: result.tags,
+                description: result.description, help: result.help, helpUrl: result.helpUrl,
+                nodes: result.nodes.map(function (node) {
+                    return {html: node.html, impact: node.impact, target: node.target,
+                            failureSummary: node.failureSummary};
+                })
+            };
+        }
+
+        axe.run(document, options).then(function (results) {
+            callback({url: results.url, timestamp: results.timestamp,
+                      violations: results.violations.map(trim),
+                      incomplete: results.incomplete.map(trim)});
+        }, function (error) {
+            callback({error: String(error)});
+        });
+    """
+
+    # axe-core source, read once rather than from disk for every page.
+    axe_source = None
+
+    RESULT_TYPES = ['violations', 'incomplete', 'passes', 'inapplicable']
+
     def __init__(self, page, audit_type=None):
         self.page = page
         self.type = audit_type
@@ -251,6 +423,24 @@ class AxePageAudit(AxeAudit):
         self.ended_at = None
         os.makedirs(self.report_dir, exist_ok=True)
 
+    #
+    # Static Methods
+    #
+    @staticmethod
+    def url_file_name(url):
+        # Source: https://stackoverflow.com/a/295146/1093087
+        _, fname = url.split('://')
+        valid_chars = "-_.%s%s" % (string.ascii_letters, string.digits)
+        fname = ''.join(c for c in fname if c in valid_chars)
+        return fname.replace('.', '-')
+
+    @staticmethod
+    def read_axe_source():
+        if AxePageAudit.axe_source is None:
+            with open(Axe(None).script_url, 'r', encoding='utf8') as f:
+                AxePageAudit.axe_source = f.read()
+        return AxePageAudit.axe_source
+
     #
     # Properties
     #
@@ -258,9 +448,26 @@ class AxePageAudit(AxeAudit):
     def url(self):
         return self.page.url
 
+    @property
+    def site(self):
+        return self.page.site
+
+    @property
+    def profiler(self):
+        return self.page.site.profiler
+
     @property
     def report_dir(self):
-        return self.page.site.audit_dir
+        return self.page.site.run_dir
+
+    @property
+    def report_path(self):
+        """Where the axe results for this page are kept: the run's result store when the site
+        uses one, otherwise a JSON file per page.
+        """
+        if self.page.site.result_store is not None:
+            return self.page.site.result_store.path
+        return pathjoin(self.report_dir, self.report_file_name("json"))
 
     @property
     def runtime(self):
@@ -272,47 +479,128 @@ class AxePageAudit(AxeAudit):
     # Instance Methods
     #
     def now(self):
-        json_path = self.generate_report()
-        self.violations = self.parse_report(json_path)
+        if self.page.site.resume and self.report_exists():
+            # Page was already audited by the run being resumed.
+            json_path = self.report_path
+        else:
+            json_path = self.generate_report()
+
+        with self.profiler.span('parse', self.url):
+            self.violations = self.parse_report(json_path)
+
         self.ended_at = datetime.now(timezone.utc)
         return self
 
     def report_file_name(self, file_type):
-        # Source: https://stackoverflow.com/a/295146/1093087
-        _, fname = self.url.split('://')
-        valid_chars = "-_.%s%s" % (string.ascii_letters, string.digits)
-        fname = ''.join(c for c in fname if c in valid_chars)
-        fname = fname.replace('.', '-')
+        fname = AxePageAudit.url_file_name(self.url)
         audit_type = self.type
         audit_type = self.type if audit_type is not None else "all"
         full_file_name = "{}-page-{}-violations.{}".format(fname, audit_type, file_type)
         return full_file_name
 
     def generate_report(self):
-        # Set logging to only warnings or above to cut down on console clutter
-        # https://stackoverflow.com/q/11029717/#answer-11029841
-        webdriver_logger.setLevel(logging.WARNING)
-        logging.getLogger("urllib3").setLevel(logging.WARNING)
-
-        # Run headless
-        chrome_options = chrome.options.Options()
-        chrome_options.add_argument("--headless")
+        # Check out a warm Chrome session, launching one if the pool has none idle.
+        checkout_started = time.perf_counter()
+        with self.page.site.browser_pool.checkout() as driver:
+            self.profiler.record('browser', time.perf_counter() - checkout_started, self.url)
+
+            with self.profiler.span('navigation', self.url):
+                if self.page.site.auth_session:
+                    # Signs the session in first, logging in again if the login has expired.
+                    self.page.site.auth_session.load(driver, self.url)
+                else:
+                    driver.get(self.url)
+            axe = Axe(driver)
+
+            # Inject axe-core javascript into page and run checks.
+            with self.profiler.span('axe_inject', self.url):
+                driver.execute_script(self.read_axe_source())
+            # Rule subsets come from the site's audit profile.
+            axe_options = self.page.site.profile.axe_options
+            if self.page.site.viewports:
+                results = self.run_axe_per_viewport(driver, axe, axe_options)
+            else:
+                with self.profiler.span('axe_run', self.url):
+                    results = self.run_axe(driver, axe, axe_options)
 
-        # Set up Axe with Chrome driver
-        driver = webdriver.Chrome(options=chrome_options)
-        driver.get(self.url)
-        axe = Axe(driver)
+        # Write results to file
+        with self.profiler.span('serialization', self.url):
+            path = self.write_report(results)
+        return path
 
-        # Inject axe-core javascript into page and run checks.
-        axe.inject()
-        results = axe.run()
+    def run_axe(self, driver, axe, axe_options):
+        if self.page.site.full_results:
+            return axe.run(options=json.dumps(axe_options) if axe_options else None)
+        return self.run_trimmed_axe(driver, axe_options)
 
-        # Write results to file
-        path = pathjoin(self.report_dir, self.report_file_name("json"))
-        axe.write_results(results, path)
-        driver.close()
+    def run_axe_per_viewport(self, driver, axe, axe_options):
+        """Runs axe at each of the site's viewports on the page already loaded, resizing it in
+        between, and merges the results. Mobile viewports emulate a mobile device. Each node
+        is tagged with its viewport.
+        https://chromedevtools.github.io/devtools-protocol/tot/Emulation/#method-setDeviceMetricsOverride
+        """
+        merged = None
+        try:
+            for name, width, height, mobile in self.page.site.viewports:
+                with self.profiler.span('viewport', self.url):
+                    driver.execute_cdp_cmd('Emulation.setDeviceMetricsOverride', {
+                        'width': width, 'height': height, 'deviceScaleFactor': 0,
+                        'mobile': mobile})
+                with self.profiler.span('axe_run', self.url):
+                    results = self.run_axe(driver, axe, axe_options)
+
+                if merged is None:
+                    merged = dict(results)
+                    for result_type in self.RESULT_TYPES:
+                        merged[result_type] = []
+                for result_type in self.RESULT_TYPES:
+                    merged[result_type] += [self.tag_viewport(result, name)
+                                            for result in results.get(result_type, [])]
+        finally:
+            # Sessions are shared, so the next page starts at the browser's own size.
+            driver.execute_cdp_cmd('Emulation.clearDeviceMetricsOverride', {})
+        return merged
+
+    def tag_viewport(self, result, viewport):
+        tagged = dict(result)
+        tagged['nodes'] = [dict(node, viewport=viewport) for node in result.get('nodes', [])]
+        return tagged
+
+    def run_trimmed_axe(self, driver, axe_options):
+        results = driver.execute_async_script(self.TRIMMED_RUN_SCRIPT, axe_options or {})
+        if 'error' in results:
+            raise AxeRunFailed('axe.run failed on {}: {}'.format(self.url, results['error']))
+        return results
+
+    def report_exists(self):
+        result_store = self.page.site.result_store
+        if result_store is not None:
+            return self.url in result_store
+        return os.path.exists(self.report_path)
+
+    def write_report(self, results):
+        result_store = self.page.site.result_store
+        if result_store is not None:
+            result_store.append(self.url, results)
+            return result_store.path
+
+        # Written to a temp file first so that an interrupted run never leaves a partial report
+        # behind for --resume to pick up.
+        path = self.report_path
+        partial_path = '{}.part'.format(path)
+        with open(partial_path, 'w') as f:
+            json.dump(results, f, indent=4)
+        os.replace(partial_path, path)
         return path
 
+    def read_report(self, report_path):
+        result_store = self.page.site.result_store
+        if result_store is not None and report_path == result_store.path:
+            return result_store.get(self.url)
+
+        with open(report_path, "r") as f:
+            return json.loads(f.read())
+
     def parse_report(self, report_path):
         """
         Axe calls errors violations and warnings incomplete.
@@ -320,9 +608,7 @@ class AxePageAudit(AxeAudit):
         that contains both errors and warnings.
         """
         violations = []
-
-        with open(report_path, "r") as f:
-            data = json.loads(f.read())
+        data = self.read_report(report_path)
 
         axe_errors = data["violations"]
         axe_warnings = data["incomplete"]
@@ -333,12 +619,17 @@ class AxePageAudit(AxeAudit):
         for axe_warning in axe_warnings:
             violations += Violation.s_from_audit_axe_warning(self, axe_warning)
 
+        # Results replayed from the crawl's static checks say so.
+        source = data.get('source')
+        if source:
+            for violation in violations:
+                violation.source = source
+
         return violations
 
     def csv_path(self):
-        site_name = self.page.site.slug
         page_name = self.report_file_name("csv")
-        return pathjoin(AUDITS_DIR, site_name, page_name)
+        return pathjoin(self.page.site.audit_dir, page_name)
 
     def summarize(self):
         summary_f = r"""
@@ -351,10 +642,22 @@ violations:   {}
 
 runtime:      {}
 
-Violations CSV: {}"""
+Violations {}: {}"""
 
         return summary_f.format(self.url, len(self.violations), len(self.errors),
-                                len(self.warnings), self.runtime, self.violations_path)
+                                len(self.warnings), self.runtime, self.violations_label,
+                                self.violations_path)
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'type': self.type,
+            'started_at': self.started_at.isoformat(),
+            'runtime': self.runtime.total_seconds(),
+            'errors': len(self.errors),
+            'warnings': len(self.warnings),
+            'violations': [violation.to_dict() for violation in self.violations]
+        }
 
     # Magic Methods
     def __repr__(self):
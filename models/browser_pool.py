@@ -0,0 +1,172 @@
+"""
+BrowserPool
+Headless Chrome sessions shared by page audits. Sessions are launched lazily, up to size, and
+kept warm between audits so that Chrome start-up is paid once per session rather than once per
+page.
+
+Drivers
+- chrome   headless Chrome sessions (default)
+- replay   ReplayDriver sessions serving recorded axe results, for browser-free tests and
+           benchmarks
+
+Relationships
+- has_many drivers (selenium webdriver sessions)
+"""
+from contextlib import contextmanager
+import logging
+import queue
+import threading
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.remote_connection import LOGGER as webdriver_logger
+from selenium import webdriver
+from selenium.webdriver import chrome
+
+from models.replay_driver import ReplayDriver, ReplayRecordings
+
+
+class BrowserPool(object):
+    def __init__(self, size=1, **options):
+        self.size = size
+        self.driver = options.get('driver') or 'chrome'
+        # Replay drivers serve recordings, loaded from replay_from unless given.
+        self.recordings = options.get('recordings')
+        self.replay_from = options.get('replay_from')
+        # Chrome command line options. Runs headless by default.
+        self.chrome_options = options.get('chrome_options') or ['--headless']
+        self.page_load_timeout = options.get('page_load_timeout')
+        self.script_timeout = options.get('script_timeout')
+        # Url patterns, such as '*.png', that Chrome will not load.
+        self.block_resources = options.get('block_resources') or []
+
+        self.idle = queue.LifoQueue()
+        self.launched = 0
+        self.lock = threading.Lock()
+        # Signalled when a driver is returned or a launch slot frees up, so that a checkout
+        # waiting on a full pool can take the driver or launch a replacement.
+        self.available = threading.Condition(self.lock)
+
+    #
+    # Static Methods
+    #
+    @staticmethod
+    def from_profile(profile):
+        browser = profile.browser
+        return BrowserPool(size=profile.pool_size,
+                           chrome_options=browser['chrome_options'],
+                           page_load_timeout=browser['page_load_timeout'],
+                           script_timeout=browser['script_timeout'],
+                           block_resources=browser['block_resources'],
+                           driver=browser['driver'],
+                           replay_from=browser['replay_from'])
+
+    #
+    # Instance Methods
+    #
+    def new_driver(self):
+        if self.driver == 'replay':
+            return self.new_replay_driver()
+        return self.new_chrome_driver()
+
+    def new_replay_driver(self):
+        with self.lock:
+            if self.recordings is None:
+                self.recordings = ReplayRecordings(self.replay_from)
+        return ReplayDriver(self.recordings)
+
+    def new_chrome_driver(self):
+        # Set logging to only warnings or above to cut down on console clutter
+        # https://stackoverflow.com/q/11029717/#answer-11029841
+        webdriver_logger.setLevel(logging.WARNING)
+        logging.getLogger("urllib3").setLevel(logging.WARNING)
+
+        chrome_options = chrome.options.Options()
+        for argument in self.chrome_options:
+            chrome_options.add_argument(argument)
+
+        driver = webdriver.Chrome(options=chrome_options)
+        if self.page_load_timeout:
+            driver.set_page_load_timeout(self.page_load_timeout)
+        if self.script_timeout:
+            driver.set_script_timeout(self.script_timeout)
+        if self.block_resources:
+            # https://chromedevtools.github.io/devtools-protocol/tot/Network/#method-setBlockedURLs
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.block_resources})
+        return driver
+
+    @contextmanager
+    def checkout(self):
+        """Yields a driver for the duration of a page audit. A driver that raised a
+        WebDriverException is assumed broken and is replaced rather than returned to the pool.
+        """
+        driver = self.acquire()
+        try:
+            yield driver
+        except WebDriverException:
+            self.discard(driver)
+            raise
+        except BaseException:
+            self.release(driver)
+            raise
+        else:
+            self.release(driver)
+
+    def acquire(self):
+        """Returns an idle driver, or launches one if the pool is not full. Otherwise waits
+        until a driver is released or discarded.
+        """
+        with self.available:
+            while True:
+                try:
+                    return self.idle.get_nowait()
+                except queue.Empty:
+                    pass
+                if self.launched < self.size:
+                    self.launched += 1
+                    break
+                self.available.wait()
+
+        # Launched outside the lock: Chrome takes a while to start.
+        try:
+            return self.new_driver()
+        except BaseException:
+            self.free_slot()
+            raise
+
+    def release(self, driver):
+        with self.available:
+            self.idle.put(driver)
+            self.available.notify()
+
+    def free_slot(self):
+        with self.available:
+            self.launched -= 1
+            self.available.notify()
+
+    def discard(self, driver):
+        self.free_slot()
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def warm_up(self):
+        """Launches every session up front, e.g. when a server starts."""
+        drivers = [self.acquire() for _ in range(self.size - self.idle.qsize())]
+        for driver in drivers:
+            self.release(driver)
+        return self
+
+    def close(self):
+        while True:
+            try:
+                driver = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(driver)
+
+    # Magic Methods
+    def __repr__(self):
+        F = '<BrowserPool driver={} size={} launched={} idle={}>'
+        return F.format(self.driver, self.size, self.launched, self.idle.qsize())
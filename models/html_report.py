@@ -0,0 +1,201 @@
+"""
+HtmlReport
+HTML version of an audit, with drill-down by rule and by template (python app.py audit --html).
+
+The report's index lists totals and one row per rule and per template. Each row links to that
+section's violations, which are split across pages of page_size violations each, in a folder
+beside the index. The index stays small however many violations an audit finds, so it opens
+quickly, and violations are only loaded when a section is opened.
+
+The report is written in two passes over the audit's violations. The first only counts each
+section's violations, errors, warnings and pages. The second writes each section's pages of
+violations as they fill, or when the section's last violation is reached. Sections never hold
+their full list of violations: at most one unfinished page each, and none once the section is
+written. Views are rendered with jinja2 template streams and written out as they render.
+
+Relationships
+- belongs_to audit
+- has_many sections
+"""
+import os
+from os.path import join as pathjoin
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from config.app import VIEWS_DIR
+from models.rule_rollup import SpaceSaving
+
+SEVERITIES = ['critical', 'serious', 'moderate', 'minor']
+
+
+class ReportSection(object):
+    def __init__(self, kind, key, number):
+        self.kind = kind
+        self.key = key
+        self.number = number
+        self.count = 0
+        self.pages = 0
+        self.last_page_url = None
+        self.errors = 0
+        self.warnings = 0
+        self.help = None
+        self.help_url = None
+        self.severity = None
+        self.html_counts = SpaceSaving(capacity=20)
+
+        # Violations of the page being filled, and how many were written before them.
+        self.pending = []
+        self.written = 0
+
+    #
+    # Properties
+    #
+    @property
+    def label(self):
+        if self.kind == 'template' and not self.key:
+            return '(home page)'
+        return self.key
+
+    @property
+    def top_html(self):
+        """Most frequent failing element and its share of the section's violations."""
+        top = self.html_counts.top(1)
+        if not top:
+            return None, 0
+        return top[0][0], top[0][1] / self.count
+
+    #
+    # Instance Methods
+    #
+    def add(self, violation):
+        """Counts violation. Violations arrive page by page, so a new page url is a new page.
+        """
+        self.count += 1
+        if violation.page.url != self.last_page_url:
+            self.pages += 1
+            self.last_page_url = violation.page.url
+        if violation.is_error():
+            self.errors += 1
+        else:
+            self.warnings += 1
+        self.html_counts.add(violation.html)
+
+        if self.help is None:
+            self.help = violation.help
+            self.help_url = violation.help_url
+        if self.severity_rank(violation.severity) < self.severity_rank(self.severity):
+            self.severity = violation.severity
+        return self
+
+    def severity_rank(self, severity):
+        return SEVERITIES.index(severity) if severity in SEVERITIES else len(SEVERITIES)
+
+    def file_name(self, page_number):
+        return '{}-{}-{}.html'.format(self.kind, self.number, page_number)
+
+    # Magic Methods
+    def __repr__(self):
+        F = '<ReportSection kind={} key={} violations={}>'
+        return F.format(self.kind, self.key, self.count)
+
+
+class HtmlReport(object):
+    def __init__(self, audit, page_size=500):
+        self.audit = audit
+        self.page_size = page_size
+        loader = FileSystemLoader(pathjoin(VIEWS_DIR, 'html_report'))
+        self.environment = Environment(loader=loader, autoescape=select_autoescape(['html']),
+                                       trim_blocks=True, lstrip_blocks=True)
+
+    #
+    # Properties
+    #
+    @property
+    def path(self):
+        return self.audit.html_report_path
+
+    @property
+    def files_dir(self):
+        return self.path.replace('.html', '-files')
+
+    @property
+    def files_dir_name(self):
+        return os.path.basename(self.files_dir)
+
+    #
+    # Instance Methods
+    #
+    def write(self):
+        rules, templates, totals = self.count_sections()
+        self.write_sections(rules, templates)
+
+        self.render('index.html', self.path, audit=self.audit, totals=totals,
+                    rules=self.ranked(rules), templates=self.ranked(templates),
+                    files_dir=self.files_dir_name)
+        return self.path
+
+    def count_sections(self):
+        """First pass: counts the violations of each rule and template section, and in all.
+        """
+        rules = {}
+        templates = {}
+        totals = dict.fromkeys(['violations', 'errors', 'warnings', 'pages'], 0)
+        last_page_url = None
+
+        for violation in self.audit.each_violation():
+            self.section_for(rules, 'rule', violation.identifier).add(violation)
+            self.section_for(templates, 'template', violation.page.template).add(violation)
+
+            totals['violations'] += 1
+            totals['errors' if violation.is_error() else 'warnings'] += 1
+            if violation.page.url != last_page_url:
+                totals['pages'] += 1
+                last_page_url = violation.page.url
+        return rules, templates, totals
+
+    def section_for(self, sections, kind, key):
+        if key not in sections:
+            sections[key] = ReportSection(kind, key, len(sections) + 1)
+        return sections[key]
+
+    def ranked(self, sections):
+        """Sections, most violations first."""
+        return sorted(sections.values(), key=lambda s: s.count, reverse=True)
+
+    def write_sections(self, rules, templates):
+        """Second pass: writes each section's violations a page at a time, as soon as the page
+        fills or the section's last violation is reached.
+        """
+        os.makedirs(self.files_dir, exist_ok=True)
+        for violation in self.audit.each_violation():
+            for section in [rules[violation.identifier], templates[violation.page.template]]:
+                section.pending.append(violation)
+                if len(section.pending) == self.page_size or \
+                        section.written + len(section.pending) == section.count:
+                    self.write_section_page(section)
+        return self
+
+    def write_section_page(self, section):
+        page_number = section.written // self.page_size + 1
+        path = pathjoin(self.files_dir, section.file_name(page_number))
+        self.render('violations.html', path, section=section, page_number=page_number,
+                    page_count=self.page_count(section), start=section.written,
+                    index_name=os.path.basename(self.path), violations=section.pending)
+        section.written += len(section.pending)
+        section.pending = []
+        return path
+
+    def page_count(self, section):
+        return max(1, -(-section.count // self.page_size))
+
+    def render(self, view, path, **context):
+        # The file's own write buffer batches the stream's small chunks.
+        stream = self.environment.get_template(view).stream(**context)
+        with open(path, 'w') as f:
+            stream.dump(f)
+        return path
+
+    # Magic Methods
+    def __repr__(self):
+        F = '<HtmlReport path={} page_size={}>'
+        return F.format(self.path, self.page_size)
@@ -0,0 +1,154 @@
+"""
+Issue
+A failing component shared across pages, such as a navigation bar that fails color-contrast on
+every page it appears on. Used when a site audit is run with dedupe on.
+
+Each page's violations are fingerprinted by rule, kind, normalized html and viewport. Violations
+with the same fingerprint share one Issue, which keeps a single copy of the violation's fields
+and the pages it occurs on. Each page keeps a lightweight Occurrence per violation, which reads
+its fields from the issue, so per-page and per-site counts stay exact.
+
+Relationships
+- has_one violation (the first seen, holds the shared fields)
+- has_many pages
+- IssueIndex has_many issues
+"""
+import csv
+import hashlib
+
+
+class Issue(object):
+    def __init__(self, key, violation):
+        self.key = key
+        self.violation = violation
+        self.pages = []
+        self.occurrences = 0
+
+    #
+    # Static Methods
+    #
+    @staticmethod
+    def key_for(violation):
+        # Whitespace inside markup varies with templating, not with the component.
+        html = ' '.join(violation.html.split()) if violation.html else violation.html
+        return (violation.identifier, violation.kind, html, violation.viewport)
+
+    #
+    # Properties
+    #
+    @property
+    def fingerprint(self):
+        return hashlib.sha1(repr(self.key).encode('utf-8')).hexdigest()[:12]
+
+    @property
+    def page_urls(self):
+        return [url for page in self.pages for url in page.urls]
+
+    #
+    # Instance Methods
+    #
+    def add(self, page):
+        if not self.pages or self.pages[-1] is not page:
+            self.pages.append(page)
+        self.occurrences += 1
+        return Occurrence(self, page)
+
+    # Magic Methods
+    def __repr__(self):
+        F = '<Issue identifier={} kind={} pages={} occurrences={}>'
+        return F.format(self.violation.identifier, self.violation.kind, len(self.pages),
+                        self.occurrences)
+
+
+class Occurrence(object):
+    """Stands in for a Violation on one page. Fields not set here are read from the issue's
+    violation.
+    """
+    __slots__ = ('issue', 'page')
+
+    def __init__(self, issue, page):
+        self.issue = issue
+        self.page = page
+
+    def to_dict(self):
+        data = self.issue.violation.to_dict()
+        data['page_url'] = self.page.url
+        return data
+
+    # Magic Methods
+    def __getattr__(self, name):
+        return getattr(self.issue.violation, name)
+
+    def __repr__(self):
+        F = '<Occurrence issue={} page={}>'
+        return F.format(self.issue.fingerprint, self.page.url)
+
+    def __str__(self):
+        F = '{} reported a {} {} {} on {}'
+        return F.format(self.source, self.severity, self.identifier, self.kind, self.page.url)
+
+
+class IssueIndex(object):
+    CSV_FIELDS = ['issue', 'source', 'identifier', 'severity', 'kind', 'type', 'help',
+                  'help_url', 'html', 'failure', 'violations', 'pages', 'page_urls', 'viewport']
+
+    def __init__(self):
+        self.issues = {}
+
+    #
+    # Instance Methods
+    #
+    def add_page(self, page):
+        """Replaces the page's violations with occurrences of shared issues."""
+        if not page.audit:
+            return page
+
+        occurrences = []
+        for violation in page.violations:
+            key = Issue.key_for(violation)
+            issue = self.issues.get(key)
+            if issue is None:
+                issue = self.issues[key] = Issue(key, violation)
+            occurrences.append(issue.add(page))
+
+        page.audit.violations = occurrences
+        return page
+
+    def issues_sorted_by_pages(self):
+        return sorted(self.issues.values(), key=lambda i: (len(i.pages), i.occurrences),
+                      reverse=True)
+
+    def write_csv(self, path):
+        """One row per unique issue, with the urls of every page it occurs on."""
+        with open(path, mode='w') as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=self.CSV_FIELDS)
+            writer.writeheader()
+
+            for issue in self.issues_sorted_by_pages():
+                violation = issue.violation
+                page_urls = issue.page_urls
+                writer.writerow({
+                    'issue': issue.fingerprint,
+                    'source': violation.source,
+                    'identifier': violation.identifier,
+                    'severity': violation.severity,
+                    'kind': violation.kind,
+                    'type': violation.type,
+                    'help': violation.help,
+                    'help_url': violation.help_url,
+                    'html': violation.html,
+                    'failure': violation.failure,
+                    'violations': issue.occurrences,
+                    'pages': len(page_urls),
+                    'page_urls': ' '.join(page_urls),
+                    'viewport': violation.viewport
+                })
+        return path
+
+    # Magic Methods
+    def __len__(self):
+        return len(self.issues)
+
+    def __repr__(self):
+        F = '<IssueIndex issues={}>'
+        return F.format(len(self.issues))
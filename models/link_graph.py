@@ -0,0 +1,265 @@
+"""
+LinkGraph
+The site's internal links, as recorded by SitemapSpider: which page links to which.
+
+Pages get integer ids in the order the crawl first sees them. While crawling, LinkGraphBuilder
+buffers (source, target) id pairs and spills them to an edge file, so memory does not grow with
+the number of links. When the crawl closes, the edge file is sorted into CSR (compressed sparse
+row) arrays in two streaming passes: per page, an offset into one flat array of target ids, both
+for links out of each page and for links into it.
+
+LinkGraph memory-maps the arrays rather than loading them: 4 bytes per link in each direction
+plus 8 bytes per page, read from disk as queries touch them.
+
+Files (audits/<site>/link-graph/)
+- nodes.txt                   page url per line, line number is the page id
+- edges.bin                   spilled (source, target) id pairs, in crawl order
+- out.offsets, out.targets    links out of each page
+- in.offsets, in.targets      links into each page
+"""
+from array import array
+from collections import deque
+import mmap
+import os
+from os.path import join as pathjoin
+
+NODES_FILE = 'nodes.txt'
+EDGES_FILE = 'edges.bin'
+
+
+class LinkGraphBuilder(object):
+    def __init__(self, graph_dir, resume=False, buffer_size=65536):
+        self.graph_dir = graph_dir
+        self.buffer_size = buffer_size
+        self.ids = {}
+        self.new_nodes = []
+        self.edges = array('I')
+
+        os.makedirs(graph_dir, exist_ok=True)
+        if resume:
+            # Ids already given out by the interrupted crawl.
+            for url in LinkGraph.read_nodes(graph_dir):
+                self.ids[url] = len(self.ids)
+        else:
+            for file_name in os.listdir(graph_dir):
+                os.remove(pathjoin(graph_dir, file_name))
+
+    #
+    # Instance Methods
+    #
+    def node_id(self, url):
+        node_id = self.ids.get(url)
+        if node_id is None:
+            node_id = self.ids[url] = len(self.ids)
+            self.new_nodes.append(url)
+        return node_id
+
+    def add_links(self, source_url, target_urls):
+        source_id = self.node_id(source_url)
+        for target_url in target_urls:
+            self.edges.append(source_id)
+            self.edges.append(self.node_id(target_url))
+
+        if len(self.edges) >= self.buffer_size * 2:
+            self.flush()
+        return self
+
+    def flush(self):
+        if self.new_nodes:
+            with open(pathjoin(self.graph_dir, NODES_FILE), 'a') as nodes_file:
+                nodes_file.writelines('{}\n'.format(url) for url in self.new_nodes)
+            self.new_nodes = []
+
+        if self.edges:
+            with open(pathjoin(self.graph_dir, EDGES_FILE), 'ab') as edges_file:
+                self.edges.tofile(edges_file)
+            self.edges = array('I')
+        return self
+
+    def close(self):
+        """Flushes the buffers and sorts the recorded links into the graph's arrays."""
+        self.flush()
+        LinkGraph.build(self.graph_dir, len(self.ids))
+        return self
+
+    # Magic Methods
+    def __repr__(self):
+        F = '<LinkGraphBuilder graph_dir={} nodes={}>'
+        return F.format(self.graph_dir, len(self.ids))
+
+
+class LinkGraph(object):
+    def __init__(self, graph_dir):
+        self.graph_dir = graph_dir
+        self.urls = list(LinkGraph.read_nodes(graph_dir))
+        self._ids = None
+        self.files = []
+        self.out_offsets, self.out_targets = self.open_arrays('out')
+        self.in_offsets, self.in_targets = self.open_arrays('in')
+
+    #
+    # Static Methods
+    #
+    @staticmethod
+    def exists(graph_dir):
+        return os.path.exists(pathjoin(graph_dir, 'in.targets'))
+
+    @staticmethod
+    def read_nodes(graph_dir):
+        nodes_path = pathjoin(graph_dir, NODES_FILE)
+        if not os.path.exists(nodes_path):
+            return
+        with open(nodes_path, 'r') as nodes_file:
+            for line in nodes_file:
+                yield line.rstrip('\n')
+
+    @staticmethod
+    def read_edges(graph_dir, chunk_size=65536):
+        """Yields (source, target) id pairs from the edge file, a chunk at a time."""
+        edges_path = pathjoin(graph_dir, EDGES_FILE)
+        if not os.path.exists(edges_path):
+            return
+        with open(edges_path, 'rb') as edges_file:
+            while True:
+                chunk = array('I')
+                chunk.frombytes(edges_file.read(chunk_size * 8))
+                if not chunk:
+                    return
+                yield from zip(chunk[0::2], chunk[1::2])
+
+    @staticmethod
+    def build(graph_dir, node_count):
+        """Writes CSR arrays for both directions from the edge file. Only the arrays being
+        written are held in memory: the edge file is streamed, once to count degrees and again
+        to place each target.
+        """
+        out_degrees = array('Q', bytes(8 * node_count))
+        in_degrees = array('Q', bytes(8 * node_count))
+        for source, target in LinkGraph.read_edges(graph_dir):
+            out_degrees[source] += 1
+            in_degrees[target] += 1
+
+        for direction, degrees, by_source in [('out', out_degrees, True),
+                                              ('in', in_degrees, False)]:
+            offsets = array('Q', [0])
+            for degree in degrees:
+                offsets.append(offsets[-1] + degree)
+            del degrees
+
+            targets = array('I', bytes(4 * offsets[-1]))
+            cursors = array('Q', offsets[:-1])
+            for source, target in LinkGraph.read_edges(graph_dir):
+                node, other = (source, target) if by_source else (target, source)
+                targets[cursors[node]] = other
+                cursors[node] += 1
+            del cursors
+
+            LinkGraph.write_array(pathjoin(graph_dir, direction + '.offsets'), offsets)
+            LinkGraph.write_array(pathjoin(graph_dir, direction + '.targets'), targets)
+            del offsets, targets
+
+        return graph_dir
+
+    @staticmethod
+    def write_array(path, values):
+        # Written to a temp file first so that a graph is never read half written.
+        with open(path + '.part', 'wb') as f:
+            values.tofile(f)
+        os.replace(path + '.part', path)
+        return path
+
+    #
+    # Properties
+    #
+    @property
+    def ids(self):
+        if self._ids is None:
+            self._ids = dict((url, node_id) for node_id, url in enumerate(self.urls))
+        return self._ids
+
+    @property
+    def node_count(self):
+        return len(self.urls)
+
+    @property
+    def edge_count(self):
+        return len(self.out_targets)
+
+    #
+    # Instance Methods
+    #
+    def open_arrays(self, direction):
+        return (self.open_array(pathjoin(self.graph_dir, direction + '.offsets'), 'Q'),
+                self.open_array(pathjoin(self.graph_dir, direction + '.targets'), 'I'))
+
+    def open_array(self, path, typecode):
+        if os.path.getsize(path) == 0:
+            return memoryview(array(typecode))
+        f = open(path, 'rb')
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        self.files.append((f, mapped, view))
+        return view.cast(typecode)
+
+    def neighbors(self, offsets, targets, node_id):
+        return targets[offsets[node_id]:offsets[node_id + 1]]
+
+    def links_from(self, url):
+        """Urls the page links to."""
+        node_id = self.ids.get(url)
+        if node_id is None:
+            return []
+        return [self.urls[n] for n in self.neighbors(self.out_offsets, self.out_targets, node_id)]
+
+    def linked_from(self, url):
+        """Urls of the pages linking to url, e.g. the pages embedding a broken component."""
+        node_id = self.ids.get(url)
+        if node_id is None:
+            return []
+        return [self.urls[n] for n in self.neighbors(self.in_offsets, self.in_targets, node_id)]
+
+    def in_degree(self, url):
+        node_id = self.ids.get(url)
+        if node_id is None:
+            return 0
+        return self.in_offsets[node_id + 1] - self.in_offsets[node_id]
+
+    def depths(self, root_url):
+        """Fewest clicks from root_url to each page, by page id. -1 where unreachable."""
+        depths = array('i', [-1]) * self.node_count
+        root_id = self.ids.get(root_url)
+        if root_id is None:
+            return depths
+
+        depths[root_id] = 0
+        queue = deque([root_id])
+        while queue:
+            node_id = queue.popleft()
+            for target in self.neighbors(self.out_offsets, self.out_targets, node_id):
+                if depths[target] < 0:
+                    depths[target] = depths[node_id] + 1
+                    queue.append(target)
+        return depths
+
+    def orphans(self, urls, root_url=None):
+        """Yields the urls no crawled page links to, such as pages found only in XML
+        sitemaps.
+        """
+        for url in urls:
+            if url != root_url and self.in_degree(url) == 0:
+                yield url
+
+    def close(self):
+        # Views on the maps must be released before the maps can be closed.
+        for view in [self.out_offsets, self.out_targets, self.in_offsets, self.in_targets]:
+            view.release()
+        for f, mapped, view in self.files:
+            view.release()
+            mapped.close()
+            f.close()
+        self.files = []
+
+    # Magic Methods
+    def __repr__(self):
+        F = '<LinkGraph nodes={} edges={}>'
+        return F.format(self.node_count, self.edge_count)
@@ -7,6 +7,7 @@ Relationships
 
 Fields
 - url
+- aliases
 """
 from urllib.parse import urlparse
 from models.axe_audit import AxeAudit
@@ -16,7 +17,10 @@ class Page(object):
     def __init__(self, site, url=None):
         self.site = site
         self.url = url if url else site.url
+        # Other urls serving the same document. Audited once, reported for each.
+        self.aliases = []
         self.audit = None
+        self._templates = None
 
     #
     # Static Methods
@@ -27,7 +31,10 @@ class Page(object):
         audit_type = options.get("audit_type")
         AxeAudit.validate_type(audit_type)
 
-        return AxeAudit.from_page(page, audit_type)
+        try:
+            return AxeAudit.from_page(page, audit_type)
+        finally:
+            site.close()
 
     #
     # Properties
@@ -38,6 +45,10 @@ class Page(object):
             return []
         return self.audit.violations
 
+    @property
+    def urls(self):
+        return [self.url] + self.aliases
+
     @property
     def path(self):
         url_path = urlparse(self.url).path
@@ -52,16 +63,11 @@ class Page(object):
     @property
     def templates(self):
         # Segments of the URL path are assumed to be templates. This can be used to group
-        # pages.
-        templates = [self.path] if self.path != '' else []
-        path = self.path
-
-        while path != '':
-            path, _, _ = path.rpartition('/')
-            if path != '':
-                templates.append(path)
-
-        return templates
+        # pages. Built once, as template and subtemplate read it on every call.
+        if self._templates is None:
+            segments = self.path.split('/') if self.path != '' else []
+            self._templates = ['/'.join(segments[:n]) for n in range(len(segments), 0, -1)]
+        return self._templates
 
     @property
     def template(self):
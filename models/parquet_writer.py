@@ -0,0 +1,134 @@
+"""
+ParquetViolationWriter
+Writes violations to a Parquet file for analytics tools, as an alternative to the violations CSV
+(python app.py audit --format parquet).
+
+Columns are typed, and the low-cardinality ones (urls, templates, rule ids, severities...) are
+dictionary-encoded, so a multi-million row audit loads in seconds and can be scanned a column at
+a time. Rows are buffered by page and written out a row group at a time, so a site audit can
+stream pages into the file as they are audited rather than holding every row until the end.
+
+Template columns are those of the audited page; duplicate pages (aliases) get a row of their
+own, as in the CSV.
+
+Requires pyarrow.
+"""
+import os
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class ParquetUnavailable(Exception):
+    pass
+
+
+class ParquetViolationWriter(object):
+    # Columns holding few distinct values, stored as dictionary indexes.
+    DICTIONARY_COLUMNS = ['page_url', 'template', 'subtemplate', 'source', 'identifier',
+                          'severity', 'kind', 'type', 'help', 'help_url', 'viewport']
+    TEXT_COLUMNS = ['html', 'failure']
+    COLUMNS = DICTIONARY_COLUMNS + TEXT_COLUMNS
+
+    def __init__(self, path, row_group_size=65536):
+        if pyarrow is None:
+            raise ParquetUnavailable('Parquet export requires pyarrow: pip install pyarrow')
+
+        self.path = path
+        self.row_group_size = row_group_size
+        self.rows = 0
+        self.row_groups = 0
+        self.buffer = self.new_buffer()
+        self.buffered = 0
+
+        # Written to a temp file first so that an interrupted audit never leaves a truncated
+        # file behind.
+        self.partial_path = '{}.part'.format(path)
+        self.writer = pyarrow.parquet.ParquetWriter(self.partial_path, self.schema())
+
+    #
+    # Static Methods
+    #
+    @staticmethod
+    def schema():
+        dictionary_string = pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+        fields = [pyarrow.field(c, dictionary_string) for c in
+                  ParquetViolationWriter.DICTIONARY_COLUMNS]
+        fields += [pyarrow.field(c, pyarrow.string()) for c in ParquetViolationWriter.TEXT_COLUMNS]
+        return pyarrow.schema(fields)
+
+    @staticmethod
+    def write_violations(path, violations):
+        writer = ParquetViolationWriter(path)
+        for violation in violations:
+            writer.add_violation(violation)
+        return writer.close()
+
+    #
+    # Instance Methods
+    #
+    def write_page(self, page):
+        """Adds a page's violations, writing a row group once enough rows are buffered. Meant
+        to be called as each page audit completes.
+        """
+        for violation in page.violations:
+            self.add_violation(violation)
+        return self
+
+    def add_violation(self, violation):
+        page = violation.page
+        for page_url in page.urls:
+            self.buffer['page_url'].append(page_url)
+            self.buffer['template'].append(page.template)
+            self.buffer['subtemplate'].append(page.subtemplate)
+            self.buffer['source'].append(violation.source)
+            self.buffer['identifier'].append(violation.identifier)
+            self.buffer['severity'].append(violation.severity)
+            self.buffer['kind'].append(violation.kind)
+            self.buffer['type'].append(violation.type)
+            self.buffer['help'].append(violation.help)
+            self.buffer['help_url'].append(violation.help_url)
+            self.buffer['viewport'].append(violation.viewport)
+            self.buffer['html'].append(violation.html)
+            self.buffer['failure'].append(violation.failure)
+            self.buffered += 1
+
+        if self.buffered >= self.row_group_size:
+            self.flush()
+        return self
+
+    def flush(self):
+        if not self.buffered:
+            return self
+
+        arrays = []
+        for column in self.COLUMNS:
+            array = pyarrow.array(self.buffer[column], type=pyarrow.string())
+            if column in self.DICTIONARY_COLUMNS:
+                array = array.dictionary_encode()
+            arrays.append(array)
+
+        table = pyarrow.Table.from_arrays(arrays, schema=self.writer.schema)
+        self.writer.write_table(table, row_group_size=self.buffered)
+        self.rows += self.buffered
+        self.row_groups += 1
+        self.buffer = self.new_buffer()
+        self.buffered = 0
+        return self
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+        os.replace(self.partial_path, self.path)
+        return self.path
+
+    def new_buffer(self):
+        return dict((column, []) for column in self.COLUMNS)
+
+    # Magic Methods
+    def __repr__(self):
+        F = '<ParquetViolationWriter path={} rows={} row_groups={}>'
+        return F.format(self.path, self.rows + self.buffered, self.row_groups)
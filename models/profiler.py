@@ -0,0 +1,156 @@
+"""
+Profiler
+Records timing spans for each phase of an audit and metrics for the crawl that preceded it.
+Cheap enough to leave on: a span is two perf_counter calls and a list append.
+
+Relationships
+- belongs_to site
+
+Fields
+- spans           phase -> list of durations in seconds
+- page_spans      page url -> phase -> duration in seconds
+- crawl metrics   requests, bytes downloaded, responses from the HTTP cache, response latency
+                  histogram
+"""
+from contextlib import contextmanager
+import json
+import math
+import time
+
+
+class Profiler(object):
+    # Audit phases in pipeline order, used to order the report.
+    PHASES = ['crawl', 'browser', 'navigation', 'axe_inject', 'viewport', 'axe_run',
+              'serialization', 'parse']
+
+    # Upper bounds, in milliseconds, of the response latency histogram buckets.
+    LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+    def __init__(self):
+        self.spans = {}
+        self.page_spans = {}
+        self.crawl_requests = 0
+        self.crawl_bytes = 0
+        self.crawl_cached = 0
+        self.crawl_started_at = None
+        self.crawl_ended_at = None
+        self.latency_histogram = [0] * (len(self.LATENCY_BUCKETS_MS) + 1)
+
+    #
+    # Static Methods
+    #
+    @staticmethod
+    def percentile(sorted_values, pct):
+        """Nearest-rank percentile of an already sorted list."""
+        if not sorted_values:
+            return None
+        rank = max(int(math.ceil(pct / 100.0 * len(sorted_values))), 1)
+        return sorted_values[rank - 1]
+
+    #
+    # Properties
+    #
+    @property
+    def crawl_seconds(self):
+        if self.crawl_started_at is None:
+            return 0
+        return self.crawl_ended_at - self.crawl_started_at
+
+    @property
+    def requests_per_second(self):
+        if not self.crawl_seconds:
+            return None
+        return self.crawl_requests / self.crawl_seconds
+
+    #
+    # Instance Methods
+    #
+    @contextmanager
+    def span(self, phase, page_url=None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - started, page_url)
+
+    def record(self, phase, seconds, page_url=None):
+        self.spans.setdefault(phase, []).append(seconds)
+        if page_url:
+            page_phases = self.page_spans.setdefault(page_url, {})
+            page_phases[phase] = page_phases.get(phase, 0) + seconds
+
+    def record_response(self, latency, size, cached=False):
+        """Cached responses (unchanged since the last crawl) count as requests, but their
+        bodies were not downloaded again.
+        """
+        now = time.perf_counter()
+        if self.crawl_started_at is None:
+            self.crawl_started_at = now - (latency or 0)
+        self.crawl_ended_at = now
+        self.crawl_requests += 1
+        if cached:
+            self.crawl_cached += 1
+        else:
+            self.crawl_bytes += size
+
+        if latency is not None:
+            latency_ms = latency * 1000
+            bucket = 0
+            while bucket < len(self.LATENCY_BUCKETS_MS) and \
+                    latency_ms > self.LATENCY_BUCKETS_MS[bucket]:
+                bucket += 1
+            self.latency_histogram[bucket] += 1
+
+    def phase_stats(self):
+        stats = {}
+        ordered_phases = [p for p in self.PHASES if p in self.spans]
+        ordered_phases += sorted(p for p in self.spans if p not in self.PHASES)
+
+        for phase in ordered_phases:
+            durations = sorted(self.spans[phase])
+            stats[phase] = {
+                'count': len(durations),
+                'total': sum(durations),
+                'p50': self.percentile(durations, 50),
+                'p95': self.percentile(durations, 95),
+                'p99': self.percentile(durations, 99),
+                'max': durations[-1]
+            }
+        return stats
+
+    def crawl_stats(self):
+        bucket_labels = ['<={}ms'.format(ms) for ms in self.LATENCY_BUCKETS_MS]
+        bucket_labels.append('>{}ms'.format(self.LATENCY_BUCKETS_MS[-1]))
+        return {
+            'requests': self.crawl_requests,
+            'bytes': self.crawl_bytes,
+            'cached': self.crawl_cached,
+            'seconds': self.crawl_seconds,
+            'requests_per_second': self.requests_per_second,
+            'latency_histogram': dict(zip(bucket_labels, self.latency_histogram))
+        }
+
+    def to_dict(self):
+        return {
+            'phases': self.phase_stats(),
+            'crawl': self.crawl_stats(),
+            'pages': self.page_spans
+        }
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    def summarize(self):
+        lines = ['{:<16}{:>8}{:>10}{:>10}{:>10}'.format('phase', 'count', 'p50', 'p95', 'p99')]
+        for phase, stats in self.phase_stats().items():
+            lines.append('{:<16}{:>8}{:>10.3f}{:>10.3f}{:>10.3f}'.format(
+                phase, stats['count'], stats['p50'], stats['p95'], stats['p99']))
+
+        if self.crawl_requests:
+            crawl_f = 'crawl: {} requests, {} bytes, {} from cache, {:.1f} requests/sec'
+            lines.append(crawl_f.format(self.crawl_requests, self.crawl_bytes, self.crawl_cached,
+                                        self.requests_per_second or 0))
+
+        return "\n".join(lines)
@@ -0,0 +1,198 @@
+"""
+ProgressReporter
+Live progress for long site audits (python app.py audit --crawl --progress).
+
+The crawl and the page audits bump plain counters on the reporter; a background thread reads
+them at a fixed interval and logs one line. Nothing is printed per page, so reporting costs a
+few integer increments per page however often pages complete.
+
+Each update covers
+- crawl   pages discovered, responses fetched, frontier (discovered but not yet fetched)
+- audit   pages audited of total, pages per second, moving average page latency, ETA,
+          running error and warning counts
+
+Modes
+- text    colored log lines on stderr (colorlog)
+- json    one JSON object per line on stderr, for job runners
+
+Relationships
+- belongs_to site
+"""
+import json
+import logging
+import sys
+import threading
+import time
+
+import colorlog
+
+# One logger for every reporter. Each reporter adds its own handler while it runs, and only
+# that handler writes the reporter's lines, so a long-running process (python app.py serve)
+# keeps no logger or handler per job once the job's reporter stops.
+LOGGER = logging.getLogger('ann_arbor.progress')
+LOGGER.propagate = False
+LOGGER.setLevel(logging.INFO)
+
+
+class ProgressReporter(object):
+    MODES = ['text', 'json']
+
+    # Weight of the latest page in the moving average page latency.
+    LATENCY_SMOOTHING = 0.2
+
+    def __init__(self, site, mode='text', interval=2.0, stream=None):
+        self.site = site
+        self.mode = mode
+        self.interval = interval
+        self.stream = stream or sys.stderr
+
+        # Shared counters
+        self.discovered = 0
+        self.pages_total = None
+        self.pages_audited = 0
+        self.errors = 0
+        self.warnings = 0
+        self.page_latency = None
+
+        self.started_at = None
+        self.audit_started_at = None
+        self.stopped = threading.Event()
+        self.thread = None
+        self.handler = None
+
+    #
+    # Properties
+    #
+    @property
+    def phase(self):
+        return 'crawl' if self.pages_total is None else 'audit'
+
+    @property
+    def crawled(self):
+        return self.site.profiler.crawl_requests
+
+    @property
+    def frontier(self):
+        if not self.site.follows_links:
+            return 0
+        return max(self.discovered - self.crawled, 0)
+
+    @property
+    def pages_per_second(self):
+        if self.audit_started_at is None or not self.pages_audited:
+            return None
+        return self.pages_audited / (time.perf_counter() - self.audit_started_at)
+
+    @property
+    def eta_seconds(self):
+        if self.pages_total is None or not self.pages_per_second:
+            return None
+        return (self.pages_total - self.pages_audited) / self.pages_per_second
+
+    #
+    # Instance Methods
+    #
+    def new_handler(self):
+        handler = colorlog.StreamHandler(self.stream)
+        handler.addFilter(lambda record: getattr(record, 'reporter', None) is self)
+        if self.mode == 'json':
+            handler.setFormatter(logging.Formatter('%(message)s'))
+        else:
+            handler.setFormatter(colorlog.ColoredFormatter(
+                '%(log_color)s%(asctime)s %(message)s', datefmt='%H:%M:%S',
+                log_colors={'INFO': 'cyan', 'WARNING': 'yellow'}))
+        return handler
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self.handler = self.new_handler()
+        LOGGER.addHandler(self.handler)
+        self.thread = threading.Thread(target=self.run, name='progress-reporter', daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.report()
+
+    def stop(self):
+        if self.thread is not None and not self.stopped.is_set():
+            self.stopped.set()
+            self.thread.join()
+            self.report()
+        if self.handler is not None:
+            LOGGER.removeHandler(self.handler)
+            self.handler = None
+        return self
+
+    def start_audit(self, pages_total):
+        self.pages_total = pages_total
+        self.audit_started_at = time.perf_counter()
+        return self
+
+    def page_audited(self, page):
+        self.pages_audited += 1
+        for violation in page.violations:
+            if violation.is_error():
+                self.errors += 1
+            else:
+                self.warnings += 1
+
+        if page.audit is not None and page.audit.ended_at is not None:
+            latency = page.audit.runtime.total_seconds()
+            if self.page_latency is None:
+                self.page_latency = latency
+            else:
+                self.page_latency += self.LATENCY_SMOOTHING * (latency - self.page_latency)
+        return self
+
+    def snapshot(self):
+        return {
+            'phase': self.phase,
+            'elapsed': round(time.perf_counter() - self.started_at, 1),
+            'discovered': self.discovered,
+            'crawled': self.crawled,
+            'frontier': self.frontier,
+            'pages_total': self.pages_total,
+            'pages_audited': self.pages_audited,
+            'pages_per_second': self.round(self.pages_per_second, 2),
+            'page_latency': self.round(self.page_latency, 2),
+            'eta_seconds': self.round(self.eta_seconds, 0),
+            'errors': self.errors,
+            'warnings': self.warnings
+        }
+
+    def report(self):
+        snapshot = self.snapshot()
+        message = json.dumps(snapshot) if self.mode == 'json' else self.format_snapshot(snapshot)
+        LOGGER.info(message, extra={'reporter': self})
+        return snapshot
+
+    def format_snapshot(self, snapshot):
+        if snapshot['phase'] == 'crawl':
+            F = 'crawl: {discovered} discovered, {crawled} fetched, {frontier} in frontier'
+            return F.format(**snapshot)
+
+        F = ('audit: {pages_audited}/{pages_total} pages, {rate} pages/s, {latency} s/page, '
+             'eta {eta}, {errors} errors, {warnings} warnings')
+        return F.format(rate=self.or_dash(snapshot['pages_per_second']),
+                        latency=self.or_dash(snapshot['page_latency']),
+                        eta=self.format_eta(snapshot['eta_seconds']), **snapshot)
+
+    def format_eta(self, seconds):
+        if seconds is None:
+            return '-'
+        minutes, seconds = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        return '{}:{:02d}:{:02d}'.format(hours, minutes, seconds)
+
+    def round(self, value, digits):
+        return None if value is None else round(value, digits)
+
+    def or_dash(self, value):
+        return '-' if value is None else value
+
+    # Magic Methods
+    def __repr__(self):
+        F = '<ProgressReporter mode={} phase={} audited={}>'
+        return F.format(self.mode, self.phase, self.pages_audited)
@@ -0,0 +1,126 @@
+"""
+ReplayDriver
+A stand-in for a Chrome WebDriver session that serves recorded axe results rather than loading
+pages and running axe, so audits can run without a browser: in tests, and to benchmark the
+rest of the pipeline (parsing, violations, rollups, CSV) on its own.
+
+Select it in an audit profile (browser.driver: replay) with browser.replay_from pointing at
+recorded results, or pass recordings to BrowserPool directly. Recordings are read from
+- a run directory   per-page JSON reports, as written by an earlier audit
+- a result store    results.aar, as written by --results binary
+- a JSON file       one axe report, replayed for every url
+
+Results are replayed as recorded: trimmed and full runs return the same results.
+
+Relationships
+- belongs_to browser_pool
+"""
+import json
+import os
+import re
+
+from models.axe_audit import AxePageAudit
+from models.result_store import MAGIC, ResultStore
+
+
+class RecordingNotFound(Exception):
+    pass
+
+
+class ReplayRecordings(object):
+    # <url file name>-page-<audit type>-violations.json, see AxePageAudit.report_file_name.
+    REPORT_FILE_PATTERN = re.compile(r'^(.+)-page-[a-z]+-violations\.json$')
+
+    def __init__(self, path):
+        self.path = path
+        self.report_paths = None
+        self.result_store = None
+        self.recording = None
+
+        if os.path.isdir(path):
+            self.report_paths = self.index_reports(path)
+        elif self.is_result_store(path):
+            self.result_store = ResultStore.open(path)
+        else:
+            with open(path, 'r') as f:
+                self.recording = json.load(f)
+
+    #
+    # Static Methods
+    #
+    @staticmethod
+    def is_result_store(path):
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+
+    @staticmethod
+    def index_reports(run_dir):
+        """Url file name -> report path. Reports are read as they are replayed."""
+        report_paths = {}
+        for file_name in os.listdir(run_dir):
+            match = ReplayRecordings.REPORT_FILE_PATTERN.match(file_name)
+            if match:
+                report_paths[match.group(1)] = os.path.join(run_dir, file_name)
+        return report_paths
+
+    #
+    # Instance Methods
+    #
+    def get(self, url):
+        if self.recording is not None:
+            return self.recording
+
+        if self.result_store is not None:
+            return self.result_store.get(url)
+
+        report_path = self.report_paths.get(AxePageAudit.url_file_name(url))
+        if report_path is None:
+            return None
+        with open(report_path, 'r') as f:
+            return json.load(f)
+
+    # Magic Methods
+    def __repr__(self):
+        F = '<ReplayRecordings path={}>'
+        return F.format(self.path)
+
+
+class ReplayDriver(object):
+    def __init__(self, recordings):
+        # Anything with get(url) -> axe results or None, e.g. ReplayRecordings or a dict.
+        self.recordings = recordings
+        self.current_url = None
+
+    #
+    # Instance Methods
+    #
+    def get(self, url):
+        self.current_url = url
+
+    def execute_script(self, script, *args):
+        # Injecting axe is a no-op: there is no page to inject it into.
+        return None
+
+    def execute_async_script(self, script, *args):
+        results = self.recordings.get(self.current_url)
+        if results is None:
+            raise RecordingNotFound('No recorded axe results for {}'.format(self.current_url))
+        return results
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        # Viewport changes and the like have no effect on recorded results.
+        return {}
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+    def set_script_timeout(self, seconds):
+        pass
+
+    def quit(self):
+        pass
+
+    # Magic Methods
+    def __repr__(self):
+        F = '<ReplayDriver current_url={}>'
+        return F.format(self.current_url)
@@ -0,0 +1,288 @@
+"""
+ResultStore
+Compact, append-only file of axe results for a run, in place of one pretty-printed JSON file per
+page. Rule metadata (description, help, tags...) is identical on every page, so it is written
+once to a rule dictionary and pages refer to rules by index.
+
+File layout
+- header    MAGIC + version byte
+- records   1 byte record type, 4 byte big-endian payload length, zlib-compressed JSON payload
+  - R       rule: {"index", "id", "tags", "description", "help", "helpUrl"}
+  - P       page: {"url", "timestamp", "source", "violations": [[rule index, nodes, impact]],
+                   "incomplete": [...], "passes": [[rule index, node count]],
+                   "inapplicable": [rule index]}
+
+Nodes and impact are kept for violations and incomplete results, the arrays audits report on.
+A rule's impact is the worst of its failing nodes on that page, so it is stored with each
+result rather than in the rule dictionary. Passes and inapplicable results keep only the rule
+and node count. Source is kept for results that name one, such as the crawl's static checks.
+
+A sidecar index (<path>.idx, lines of url<TAB>offset) lets readers seek straight to a page. It
+is rebuilt by scanning the store if missing. A record cut short by a crash is truncated away the
+next time the store is opened for writing.
+"""
+import json
+import os
+import struct
+import threading
+import zlib
+
+MAGIC = b'AARS'
+VERSION = 1
+RECORD_HEADER = struct.Struct('>cI')
+RULE_RECORD = b'R'
+PAGE_RECORD = b'P'
+RULE_FIELDS = ['id', 'tags', 'description', 'help', 'helpUrl']
+
+
+class CorruptResultStore(Exception):
+    pass
+
+
+class ResultStore(object):
+    def __init__(self, path, compression_level=6):
+        self.path = path
+        self.index_path = '{}.idx'.format(path)
+        self.compression_level = compression_level
+        self.rules = []
+        self.rule_indexes = {}
+        self.offsets = {}
+        self.lock = threading.Lock()
+        self.file = None
+
+        if os.path.exists(path):
+            self.load()
+
+    #
+    # Static Methods
+    #
+    @staticmethod
+    def open(path):
+        return ResultStore(path)
+
+    #
+    # Properties
+    #
+    @property
+    def urls(self):
+        return list(self.offsets)
+
+    #
+    # Instance Methods
+    #
+    def append(self, url, results):
+        """Appends axe results for url. Later results for the same url supersede earlier ones."""
+        with self.lock:
+            if self.file is None:
+                self.open_for_append()
+
+            page = {
+                'url': url,
+                'timestamp': results.get('timestamp'),
+                'violations': [[self.rule_index(r), r['nodes'], r.get('impact')]
+                               for r in results.get('violations', [])],
+                'incomplete': [[self.rule_index(r), r['nodes'], r.get('impact')]
+                               for r in results.get('incomplete', [])],
+                'passes': [[self.rule_index(r), len(r.get('nodes', []))]
+                           for r in results.get('passes', [])],
+                'inapplicable': [self.rule_index(r) for r in results.get('inapplicable', [])]
+            }
+            if results.get('source'):
+                page['source'] = results['source']
+
+            offset = self.write_record(PAGE_RECORD, page)
+            self.file.flush()
+            self.offsets[url] = offset
+            with open(self.index_path, 'a') as index_file:
+                index_file.write('{}\t{}\n'.format(url, offset))
+            return offset
+
+    def get(self, url):
+        """Seeks to url's record and returns its results in axe's shape."""
+        offset = self.offsets.get(url)
+        if offset is None:
+            return None
+
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            record_type, payload = self.read_record(f)
+        return self.expand(payload)
+
+    def iter_pages(self):
+        """Streams (url, results) in the order pages were written, one record at a time. Pages
+        that were audited again later are yielded once, with their latest results.
+        """
+        with open(self.path, 'rb') as f:
+            self.read_header(f)
+            while True:
+                offset = f.tell()
+                record = self.read_record(f)
+                if record is None:
+                    break
+                record_type, payload = record
+                if record_type == PAGE_RECORD and self.offsets.get(payload['url']) == offset:
+                    yield payload['url'], self.expand(payload)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def rule_index(self, rule):
+        index = self.rule_indexes.get(rule['id'])
+        if index is None:
+            index = len(self.rules)
+            entry = dict((field, rule.get(field)) for field in RULE_FIELDS)
+            entry['index'] = index
+            self.write_record(RULE_RECORD, entry)
+            self.rules.append(entry)
+            self.rule_indexes[rule['id']] = index
+        return index
+
+    def expand(self, page):
+        def rule_result(index, nodes, *impact):
+            rule = self.rules[index]
+            result = dict((field, rule.get(field)) for field in RULE_FIELDS)
+            # Stores written before impact was kept per result have it in the rule.
+            result['impact'] = impact[0] if impact else rule.get('impact')
+            result['nodes'] = nodes
+            return result
+
+        results = {
+            'url': page['url'],
+            'timestamp': page['timestamp'],
+            'violations': [rule_result(*entry) for entry in page['violations']],
+            'incomplete': [rule_result(*entry) for entry in page['incomplete']],
+            'passes': [rule_result(i, []) for i, _ in page['passes']],
+            'inapplicable': [rule_result(i, []) for i in page['inapplicable']]
+        }
+        if 'source' in page:
+            results['source'] = page['source']
+        return results
+
+    def write_record(self, record_type, payload):
+        data = zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'),
+                             self.compression_level)
+        offset = self.file.tell()
+        self.file.write(RECORD_HEADER.pack(record_type, len(data)))
+        self.file.write(data)
+        return offset
+
+    def read_record(self, f):
+        """Returns (record type, payload) or None at the end of the store, including at a
+        record cut short by an interrupted write.
+        """
+        header = self.read_record_header(f)
+        if header is None:
+            return None
+
+        record_type, length = header
+        data = f.read(length)
+        if len(data) < length:
+            return None
+
+        try:
+            return record_type, json.loads(zlib.decompress(data))
+        except (zlib.error, ValueError):
+            return None
+
+    def read_record_header(self, f):
+        header = f.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return None
+        return RECORD_HEADER.unpack(header)
+
+    def read_header(self, f):
+        header = f.read(len(MAGIC) + 1)
+        if len(header) <= len(MAGIC) or header[:len(MAGIC)] != MAGIC:
+            raise CorruptResultStore('Not a result store: {}'.format(self.path))
+        if header[len(MAGIC)] != VERSION:
+            raise CorruptResultStore('Unsupported result store version: {}'.format(header[-1]))
+
+    def load(self):
+        """Reads the rule dictionary and page offsets. Returns the offset just past the last
+        complete record.
+
+        With an index, page offsets come from the index and page records are skipped without
+        being read, so only the (small) rule records are decompressed.
+        """
+        self.rules = []
+        self.rule_indexes = {}
+        self.offsets = self.read_index()
+        use_index = self.offsets is not None
+        self.offsets = self.offsets or {}
+        page_offsets = set()
+        size = os.path.getsize(self.path)
+
+        with open(self.path, 'rb') as f:
+            self.read_header(f)
+            end = f.tell()
+            while True:
+                offset = f.tell()
+                header = self.read_record_header(f)
+                if header is None or offset + RECORD_HEADER.size + header[1] > size:
+                    break
+                record_type, length = header
+
+                if record_type == PAGE_RECORD and use_index:
+                    page_offsets.add(offset)
+                    f.seek(length, os.SEEK_CUR)
+                else:
+                    f.seek(offset)
+                    record = self.read_record(f)
+                    if record is None:
+                        break
+                    record_type, payload = record
+                    if record_type == RULE_RECORD:
+                        self.rules.append(payload)
+                        self.rule_indexes[payload['id']] = payload['index']
+                    else:
+                        self.offsets[payload['url']] = offset
+                end = f.tell()
+
+        if use_index:
+            # Ignore index entries for records that did not make it into the store.
+            self.offsets = dict((url, offset) for url, offset in self.offsets.items()
+                                if offset in page_offsets)
+
+        return end
+
+    def read_index(self):
+        if not os.path.exists(self.index_path):
+            return None
+
+        offsets = {}
+        with open(self.index_path, 'r') as index_file:
+            for line in index_file:
+                url, _, offset = line.rstrip('\n').rpartition('\t')
+                if url and offset.isdigit():
+                    offsets[url] = int(offset)
+        return offsets
+
+    def open_for_append(self):
+        if os.path.exists(self.path):
+            end = self.load()
+            self.file = open(self.path, 'r+b')
+            # Drop a record left incomplete by an interrupted run.
+            self.file.truncate(end)
+            self.file.seek(end)
+        else:
+            self.file = open(self.path, 'wb')
+            self.file.write(MAGIC + bytes([VERSION]))
+
+        # Rewrite the index from the store itself, the source of truth.
+        with open(self.index_path, 'w') as index_file:
+            for url, offset in self.offsets.items():
+                index_file.write('{}\t{}\n'.format(url, offset))
+
+    # Magic Methods
+    def __contains__(self, url):
+        return url in self.offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __repr__(self):
+        F = '<ResultStore path={} pages={} rules={}>'
+        return F.format(self.path, len(self.offsets), len(self.rules))
@@ -0,0 +1,164 @@
+"""
+RuleRollup
+Violation counts per axe rule and severity, and the elements (html snippets) that fail each
+rule most often. A single shared component, such as a header, often accounts for a large share
+of a rule's violations; fixing it first clears the most violations.
+
+Counts are updated a page at a time as pages are audited. Memory is bounded by the number of
+rules rather than the number of violations: exact counts are kept per rule and severity, and the
+most frequent elements per rule are estimated with a SpaceSaving sketch.
+
+Relationships
+- belongs_to site
+- has_many sketches (one per rule)
+"""
+import csv
+
+
+class SpaceSaving(object):
+    """Heavy hitters sketch (Metwally et al., Efficient Computation of Frequent and Top-k
+    Elements in Data Streams). Tracks at most capacity items. When full, a new item replaces the
+    item with the lowest count and inherits that count as its possible overestimate (error).
+    Any item occurring more than total / capacity times is guaranteed to be tracked.
+    """
+    def __init__(self, capacity=20):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.total = 0
+
+    #
+    # Instance Methods
+    #
+    def add(self, item, count=1):
+        self.total += count
+
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+        else:
+            evicted = min(self.counts, key=self.counts.get)
+            floor = self.counts.pop(evicted)
+            del self.errors[evicted]
+            self.counts[item] = floor + count
+            self.errors[item] = floor
+        return self
+
+    def top(self, n=10):
+        """Returns up to n (item, count, error) tuples, most frequent first. The true count of
+        an item is between count - error and count.
+        """
+        items = sorted(self.counts, key=self.counts.get, reverse=True)[:n]
+        return [(item, self.counts[item], self.errors[item]) for item in items]
+
+    # Magic Methods
+    def __repr__(self):
+        F = '<SpaceSaving capacity={} tracked={} total={}>'
+        return F.format(self.capacity, len(self.counts), self.total)
+
+
+class RuleRollup(object):
+    CSV_FIELDS = ['identifier', 'severity', 'violations', 'top_html', 'top_html_violations',
+                  'top_html_share']
+
+    def __init__(self, sketch_capacity=20):
+        self.sketch_capacity = sketch_capacity
+        self.pages = 0
+        self.total = 0
+        self.rule_counts = {}
+        self.severity_counts = {}
+        self.sketches = {}
+
+    #
+    # Instance Methods
+    #
+    def add_page(self, page):
+        for violation in page.violations:
+            self.add(violation)
+        self.pages += 1
+        return self
+
+    def add(self, violation):
+        identifier = violation.identifier
+        key = (identifier, violation.severity)
+
+        self.total += 1
+        self.rule_counts[identifier] = self.rule_counts.get(identifier, 0) + 1
+        self.severity_counts[key] = self.severity_counts.get(key, 0) + 1
+
+        if identifier not in self.sketches:
+            self.sketches[identifier] = SpaceSaving(self.sketch_capacity)
+        self.sketches[identifier].add(violation.html)
+        return self
+
+    def rules_sorted_by_violations(self):
+        return sorted(self.rule_counts.items(), key=lambda rc: rc[1], reverse=True)
+
+    def severities(self, identifier):
+        """Returns (severity, count) pairs for a rule, most violations first."""
+        counts = [(severity, count) for (rule, severity), count in self.severity_counts.items()
+                  if rule == identifier]
+        return sorted(counts, key=lambda sc: sc[1], reverse=True)
+
+    def top_html(self, identifier, n=1):
+        sketch = self.sketches.get(identifier)
+        return sketch.top(n) if sketch else []
+
+    def top_html_share(self, identifier):
+        """Share of a rule's violations caused by its most frequent element."""
+        top = self.top_html(identifier)
+        if not top:
+            return 0
+        return top[0][1] / self.rule_counts[identifier]
+
+    def summarize(self, n=10):
+        lines = []
+        for identifier, count in self.rules_sorted_by_violations()[:n]:
+            severities = ', '.join('{}: {}'.format(s, c) for s, c in self.severities(identifier))
+            lines.append('{}: {} ({})'.format(identifier, count, severities))
+
+            for html, html_count, _ in self.top_html(identifier):
+                snippet = ' '.join(str(html).split())
+                snippet = snippet if len(snippet) <= 80 else snippet[:77] + '...'
+                lines.append('  {:.0%} {}'.format(html_count / count, snippet))
+
+        return "\n".join(lines)
+
+    def to_dict(self, n=5):
+        rules = []
+        for identifier, count in self.rules_sorted_by_violations():
+            rules.append({
+                'identifier': identifier,
+                'violations': count,
+                'severities': dict(self.severities(identifier)),
+                'top_html': [{'html': html, 'violations': html_count, 'error': error}
+                             for html, html_count, error in self.top_html(identifier, n)]
+            })
+        return {'violations': self.total, 'rules': rules}
+
+    def write_csv(self, path):
+        """One row per rule and severity, with the rule's most frequent failing element."""
+        with open(path, mode='w') as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=self.CSV_FIELDS)
+            writer.writeheader()
+
+            for identifier, _ in self.rules_sorted_by_violations():
+                top = self.top_html(identifier)
+                top_html, top_count = (top[0][0], top[0][1]) if top else (None, 0)
+                for severity, count in self.severities(identifier):
+                    writer.writerow({
+                        'identifier': identifier,
+                        'severity': severity,
+                        'violations': count,
+                        'top_html': top_html,
+                        'top_html_violations': top_count,
+                        'top_html_share': round(self.top_html_share(identifier), 4)
+                    })
+        return path
+
+    # Magic Methods
+    def __repr__(self):
+        F = '<RuleRollup pages={} rules={} violations={}>'
+        return F.format(self.pages, len(self.rule_counts), self.total)
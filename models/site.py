@@ -7,36 +7,156 @@ Relationships
 Fields
 - url
 """
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+import gzip
 import os
+import shutil
+import threading
 from os.path import join as pathjoin
-from urllib.parse import urljoin, urlsplit
+from urllib.parse import urlsplit
 
+from lxml import etree
 import requests
 from scrapy.crawler import CrawlerProcess
+from scrapy.settings import default_settings
 import tldextract
-from scrapy.linkextractors import IGNORED_EXTENSIONS
 
 from config.app import AUDITS_DIR
+from models.audit_plan import AuditPlan
+from models.audit_profile import AuditProfile
+from models.auth_session import AuthSession
 from models.axe_audit import AxeAudit
+from models.browser_pool import BrowserPool
+from models.issue import IssueIndex
+from models.link_graph import LinkGraph
 from models.page import Page
+from models.parquet_writer import ParquetViolationWriter
+from models.profiler import Profiler
+from models.progress import ProgressReporter
+from models.result_store import ResultStore
+from models.rule_rollup import RuleRollup
+from models.static_checker import StaticChecks
+from models.template_index import TemplateIndex
+from models.url_classifier import UrlClassifier
 from spiders.sitemap_spider import SitemapSpider
 
 
+class CrawlInterrupted(Exception):
+    pass
+
+
+class InvalidDiscoveryMode(Exception):
+    pass
+
+
+class InvalidResultsFormat(Exception):
+    pass
+
+
+class InvalidViolationsFormat(Exception):
+    pass
+
+
+class InvalidViewport(Exception):
+    pass
+
+
 class Site(object):
-    USER_AGENT = 'Ann Arbor Spider'
+    # How page audit results are kept: a JSON file per page, or one compact binary result
+    # store per run (see ResultStore).
+    RESULTS_FORMATS = ['json', 'binary']
+
+    # How violations are exported: a CSV, or a Parquet file for analytics tools.
+    VIOLATIONS_FORMATS = ['csv', 'parquet']
+
+    # How the crawl discovers pages: by following links, from robots.txt and XML sitemaps,
+    # or both.
+    DISCOVERY_MODES = ['links', 'sitemaps', 'both']
+
+    # Named viewports, as width and height in CSS pixels and whether to emulate a mobile device
+    # (meta viewport, overlay scrollbars). Others are given as WIDTHxHEIGHT, as desktop windows.
+    VIEWPORTS = {'desktop': (1280, 800, False), 'tablet': (768, 1024, True),
+                 'mobile': (375, 667, True)}
 
     def __init__(self, domain_or_url, **options):
+        # Tuning loaded from a YAML profile. Options passed here override its output settings.
+        self.profile = options.get('profile') or AuditProfile()
+        output = self.profile.output
+
         # Options
         # Defaults to using templates
         self.group_by_templates = options.get('templates', True)
         self.audit_type = options.get('audit_type')
+        # Continue an interrupted crawl/audit from the job directory rather than starting over.
+        self.resume = options.get('resume', False)
+        # Store a violation shared by many pages (e.g. a nav bar) once, as an Issue.
+        self.dedupe = options.get('dedupe') or output['dedupe']
+        # Keep axe's full results (passes, inapplicable, check details) for debugging.
+        self.full_results = options.get('full_results') or self.profile.settings['axe'][
+            'full_results']
+        self.discovery = options.get('discovery') or 'links'
+        # Audit the urls in an existing url list or XML sitemap instead of crawling.
+        self.sitemap_file = options.get('sitemap_file')
+        # Audit the most important pages of each template first, and stop after time_budget
+        # minutes. See AuditPlan.
+        self.prioritize = options.get('prioritize', False)
+        self.time_budget = options.get('time_budget')
+        # Report the crawl's static checks rather than auditing pages in a browser.
+        self.static_only = options.get('static_only', False)
+        # Run axe at each viewport on a single page load: [(name, width, height)]
+        self.viewports = self.parse_viewports(options.get('viewports') or
+                                              self.profile.browser['viewports'])
+        # Revalidate pages cached by the last crawl rather than downloading them again.
+        http_cache = options.get('http_cache')
+        self.http_cache = self.profile.settings['crawl']['http_cache'] if http_cache is None \
+            else http_cache
+        self.validate_discovery_mode(self.discovery)
+        self.results_format = options.get('results_format') or output['results'] or 'json'
+        if self.results_format not in self.RESULTS_FORMATS:
+            error_str = 'Invalid results format: {}. Must be from the following: {}'.format(
+                self.results_format, self.RESULTS_FORMATS)
+            raise InvalidResultsFormat(error_str)
+        self.violations_format = options.get('violations_format') or output['format'] or 'csv'
+        if self.violations_format not in self.VIOLATIONS_FORMATS:
+            error_str = 'Invalid violations format: {}. Must be from the following: {}'.format(
+                self.violations_format, self.VIOLATIONS_FORMATS)
+            raise InvalidViolationsFormat(error_str)
 
         self.pages = []
         self.violations = []
         self.last_scanned_at = None
         self.started_at = datetime.now(timezone.utc)
         self.ended_at = None
+        self.run_id = None
+        self.crawl_finished = None
+        # Whether the time budget ran out before the crawl finished.
+        self.crawl_truncated = False
+        self._aliases = None
+        self._result_store = None
+        # Guards the lazily built aliases and result store, first read by worker threads.
+        self.lock = threading.Lock()
+        self._link_graph = None
+        self.streamed_violations_path = None
+        self.audit_plan = None
+        self.profiler = Profiler()
+        self.rule_rollup = RuleRollup()
+        self.issue_index = IssueIndex()
+        self.template_index = TemplateIndex()
+
+        # Where the site's audit directory goes. Benchmarks and tests point it elsewhere.
+        self.audits_dir = options.get('audits_dir') or AUDITS_DIR
+
+        # Live progress on stderr, as text or JSON lines. See ProgressReporter.
+        self.progress = None
+        progress_mode = options.get('progress') or output['progress']
+        if progress_mode:
+            self.progress = ProgressReporter(self, mode=progress_mode,
+                                             interval=options.get('progress_interval', 2.0))
+
+        # A long-running server shares a running crawler across sites.
+        self.crawler_service = options.get('crawler_service')
 
         self.tld_extract = tldextract.extract(domain_or_url)
         self.scheme = self.extract_scheme(domain_or_url)
@@ -48,7 +168,27 @@ class Site(object):
             self.scheme = self.get_scheme_by_request()
             self.url = self.base_url
 
+        # Url canonicalization rules. See UrlClassifier for policies.
+        self.url_classifier = UrlClassifier(
+            self.base_url,
+            strip_tracking_params=options.get('strip_tracking_params', False),
+            case=options.get('url_case'),
+            trailing_slash=options.get('trailing_slash')
+        )
+
         os.makedirs(self.audit_dir, exist_ok=True)
+        self.static_checks = StaticChecks(self.static_checks_path)
+
+        # A long-running server also shares warm browsers. Otherwise the site owns its browser
+        # pool and closes it when its audit is done.
+        self.owns_browser_pool = options.get('browser_pool') is None
+        self.browser_pool = options.get('browser_pool') or self.new_browser_pool()
+
+        # Signs the crawl and browser sessions in to sites behind a login. See AuthSession.
+        # Like the browser pool, a session passed in is shared and left open.
+        self.owns_auth_session = options.get('auth_session') is None
+        self.auth_session = options.get('auth_session') or AuthSession.from_profile(
+            self.profile)
 
     #
     # Static Methods
@@ -57,6 +197,38 @@ class Site(object):
     def from_domain_or_url(domain_or_url, **options):
         return Site(domain_or_url, **options)
 
+    @staticmethod
+    def validate_discovery_mode(discovery):
+        if discovery not in Site.DISCOVERY_MODES:
+            error_str = 'Invalid discovery mode: {}. Must be from the following: {}'.format(
+                discovery, Site.DISCOVERY_MODES)
+            raise InvalidDiscoveryMode(error_str)
+
+    @staticmethod
+    def parse_viewports(viewports):
+        """Parses viewports, given as a list or comma-separated string of names (see
+        VIEWPORTS) and WIDTHxHEIGHT sizes, e.g. 'desktop,mobile' or '1024x768', into
+        (name, width, height, mobile) tuples.
+        """
+        if isinstance(viewports, str):
+            viewports = viewports.split(',')
+
+        parsed = []
+        for viewport in viewports or []:
+            name = viewport.strip()
+            if name in Site.VIEWPORTS:
+                width, height, mobile = Site.VIEWPORTS[name]
+            else:
+                mobile = False
+                try:
+                    width, height = [int(n) for n in name.lower().split('x')]
+                except ValueError:
+                    error_str = ('Invalid viewport: {}. Must be WIDTHxHEIGHT or from the '
+                                 'following: {}').format(name, sorted(Site.VIEWPORTS))
+                    raise InvalidViewport(error_str)
+            parsed.append((name, width, height, mobile))
+        return parsed
+
     #
     # Properties
     #
@@ -106,12 +278,142 @@ class Site(object):
 
     @property
     def audit_dir(self):
-        return pathjoin(AUDITS_DIR, self.slug)
+        return pathjoin(self.audits_dir, self.slug)
 
     @property
     def sitemap_path(self):
         return pathjoin(self.audit_dir, 'sitemap.txt')
 
+    @property
+    def follows_links(self):
+        return self.discovery in ['links', 'both']
+
+    @property
+    def reads_sitemaps(self):
+        return self.discovery in ['sitemaps', 'both']
+
+    @property
+    def static_checks_path(self):
+        return pathjoin(self.audit_dir, 'static-checks.jsonl')
+
+    @property
+    def aliases_path(self):
+        return pathjoin(self.audit_dir, 'aliases.txt')
+
+    @property
+    def content_hashes_path(self):
+        # sha1 of each page body crawled, so a resumed crawl still spots duplicates of pages
+        # crawled before it was interrupted.
+        return pathjoin(self.audit_dir, 'content-hashes.txt')
+
+    @property
+    def aliases(self):
+        """Maps each canonical page url to the urls found serving the same document, either
+        by <link rel=canonical> or by identical content.
+        """
+        with self.lock:
+            if self._aliases is None:
+                # Built in full before it is published to other threads.
+                aliases = {}
+                for alias, canonical_url in self.read_alias_file().items():
+                    aliases.setdefault(canonical_url, []).append(alias)
+                self._aliases = aliases
+            return self._aliases
+
+    @property
+    def job_dir(self):
+        return pathjoin(self.audit_dir, 'job')
+
+    @property
+    def crawl_job_dir(self):
+        """Scrapy JOBDIR: persists the pending request queue (the crawl frontier) and the
+        request fingerprints it has already scheduled.
+        """
+        return pathjoin(self.job_dir, 'crawl')
+
+    @property
+    def link_graph_dir(self):
+        return pathjoin(self.audit_dir, 'link-graph')
+
+    @property
+    def link_graph(self):
+        """Internal links recorded by the last crawl that followed links, or None."""
+        if self._link_graph is None and LinkGraph.exists(self.link_graph_dir):
+            self._link_graph = LinkGraph(self.link_graph_dir)
+        return self._link_graph
+
+    @property
+    def http_cache_dir(self):
+        return pathjoin(self.audit_dir, 'http-cache')
+
+    @property
+    def crawl_finished_path(self):
+        return pathjoin(self.job_dir, 'crawl-finished')
+
+    @property
+    def run_id_path(self):
+        return pathjoin(self.job_dir, 'run_id')
+
+    @property
+    def run_dir(self):
+        """Directory for per-page reports. Single page audits have no run id and keep their
+        reports in the site's audit directory.
+        """
+        if not self.run_id:
+            return self.audit_dir
+        return pathjoin(self.audit_dir, 'runs', self.run_id)
+
+    @property
+    def result_store(self):
+        if self.results_format != 'binary':
+            return None
+
+        path = pathjoin(self.run_dir, 'results.aar')
+        with self.lock:
+            if self._result_store is None or self._result_store.path != path:
+                os.makedirs(self.run_dir, exist_ok=True)
+                self._result_store = ResultStore(path)
+            return self._result_store
+
+    @property
+    def crawl_settings(self):
+        settings = {
+            'USER_AGENT': self.profile.user_agent,
+            # Persist the frontier so that an interrupted crawl can be resumed.
+            # https://docs.scrapy.org/en/latest/topics/jobs.html
+            'JOBDIR': self.crawl_job_dir
+        }
+        # Limits, concurrency and timeouts from the audit profile.
+        settings.update(self.profile.crawl_settings)
+        if self.http_cache:
+            settings.update(self.http_cache_settings)
+        if self.time_budget and 'CLOSESPIDER_TIMEOUT' not in settings:
+            # The crawl can use no more than the whole budget.
+            settings['CLOSESPIDER_TIMEOUT'] = self.time_budget * 60
+        return settings
+
+    @property
+    def http_cache_settings(self):
+        """Keeps every response, with its ETag and Last-Modified validators, between crawls.
+        Each request asks for revalidation (Cache-Control: max-age=0), so a cached page is
+        fetched again with If-None-Match/If-Modified-Since. A 304 costs the headers only, and
+        the cached response is passed to the spider as if it had been downloaded.
+        https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
+        """
+        headers = dict(default_settings.DEFAULT_REQUEST_HEADERS)
+        headers['Cache-Control'] = 'max-age=0'
+        return {
+            'HTTPCACHE_ENABLED': True,
+            'HTTPCACHE_DIR': self.http_cache_dir,
+            'HTTPCACHE_POLICY': 'scrapy.extensions.httpcache.RFC2616Policy',
+            # One database file rather than the default's six files per response.
+            'HTTPCACHE_STORAGE': 'scrapy.extensions.httpcache.DbmCacheStorage',
+            # Store pages the server marks no-store or no-cache too; they are revalidated.
+            'HTTPCACHE_ALWAYS_STORE': True,
+            'HTTPCACHE_IGNORE_RESPONSE_CACHE_CONTROLS': ['no-store'],
+            'DEFAULT_REQUEST_HEADERS': headers
+        }
+
     @property
     def runtime(self):
         if not self.ended_at:
@@ -121,42 +423,208 @@ class Site(object):
     #
     # Instance Methods
     #
+    def new_browser_pool(self):
+        # Static-only audits replay the crawl's static checks in place of Chrome.
+        if self.static_only:
+            return BrowserPool(size=self.profile.pool_size, driver='replay',
+                               recordings=self.static_checks)
+        return BrowserPool.from_profile(self.profile)
+
     def audit(self):
         AxeAudit.validate_type(self.audit_type)
-        urls = self.extract_site_page_urls_from_sitemap()
+        if self.progress:
+            self.progress.start()
 
-        for url in urls:
-            page = Page(self, url)
-            page.axe_audit(self.audit_type)
-            self.pages.append(page)
+        try:
+            self.start_run()
+            # Urls are read from the sitemap as pages are audited, not loaded up front, unless
+            # they are ranked first.
+            self.audit_plan = AuditPlan(self, self.extract_site_page_urls_from_sitemap(),
+                                        prioritize=self.prioritize, time_budget=self.time_budget)
+
+            if self.crawl_finished is False and not self.crawl_truncated:
+                raise CrawlInterrupted('Crawl of {} was interrupted. Rerun with --resume to '
+                                       'continue.'.format(self.fqdn))
+
+            # Parquet violations are written as pages are audited, not all at the end.
+            violations_writer = None
+            if self.violations_format == 'parquet':
+                violations_writer = ParquetViolationWriter(AxeAudit.from_site(self).parquet_path)
+
+            if self.progress:
+                # A second pass over the sitemap, cheap next to auditing its pages.
+                pages_total = self.audit_plan.pages_total
+                if pages_total is None:
+                    pages_total = sum(1 for _ in self.read_page_urls())
+                self.progress.start_audit(pages_total)
+
+            # With more than one worker, pages are audited by a thread per worker, each with
+            # its own browser session from the pool. Either way they are added in sitemap order.
+            executor = None
+            if self.profile.workers > 1:
+                executor = ThreadPoolExecutor(max_workers=self.profile.workers)
+                audited_pages = self.dispatch(executor, self.audit_plan)
+            else:
+                audited_pages = map(self.audit_page, self.audit_plan)
+
+            try:
+                for page in audited_pages:
+                    self.add_page(page)
+                    if violations_writer:
+                        violations_writer.write_page(page)
+            finally:
+                if executor:
+                    executor.shutdown(cancel_futures=True)
+
+            if violations_writer:
+                self.streamed_violations_path = violations_writer.close()
+        finally:
+            self.close()
 
         return AxeAudit.from_site(self)
 
+    def dispatch(self, executor, urls):
+        """Audits urls on executor, yielding pages in url order. Unlike executor.map, which
+        submits every url up front, it keeps two pages per worker in flight and reads the next
+        url only as one completes.
+        """
+        in_flight = deque()
+        for url in urls:
+            in_flight.append(executor.submit(self.audit_page, url))
+            if len(in_flight) >= self.profile.workers * 2:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+    def audit_page(self, url):
+        page = Page(self, url)
+        page.aliases = self.aliases.get(url, [])
+        return page.axe_audit(self.audit_type)
+
+    def add_page(self, page):
+        """Adds an audited page, counting its violations into the rule rollup and template
+        index as it arrives. With dedupe on, the page's violations are folded into shared issues
+        first.
+        """
+        if self.dedupe:
+            self.issue_index.add_page(page)
+        self.pages.append(page)
+        self.rule_rollup.add_page(page)
+        self.template_index.add_page(page)
+        if self.progress:
+            self.progress.page_audited(page)
+        return page
+
     def extract_site_page_urls_from_sitemap(self):
-        page_urls = []
-        sitemap_path = self.generate_sitemap()
+        if not self.sitemap_file:
+            self.generate_sitemap()
+        return self.read_page_urls()
 
-        with open(sitemap_path, 'r') as f:
-            for line in f.read().split('\n'):
-                if line.strip() and not line.strip().startswith('#'):
-                    page_urls.append(line.strip())
+    def read_page_urls(self):
+        """Yields the urls to audit: those in sitemap_file when one was given, otherwise those
+        in the crawl's sitemap.
+        """
+        if self.sitemap_file:
+            return self.read_url_list(self.sitemap_file)
+        return self.read_sitemap_urls(self.sitemap_path)
+
+    def read_sitemap_urls(self, sitemap_path):
+        """Yields the urls in a sitemap file, gzipped or not, a line at a time."""
+        with self.open_sitemap(sitemap_path, 'rt') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield line
+
+    def read_url_list(self, path):
+        """Yields the site's urls, normalized, from a url list (one url per line) or an XML
+        sitemap, gzipped or not. Urls outside the site are skipped.
+        """
+        with self.open_sitemap(path, 'rb') as f:
+            is_xml = f.read(512).lstrip().startswith(b'<')
 
-        return page_urls
+        urls = self.read_xml_sitemap_urls(path) if is_xml else self.read_sitemap_urls(path)
+        for url in urls:
+            url = self.normalize_url(url)
+            if self.is_valid_internal_url(url):
+                yield url
+
+    def read_xml_sitemap_urls(self, path):
+        """Yields <loc> urls from an XML sitemap, clearing each element once read so that
+        memory use does not grow with the size of the sitemap.
+        https://www.sitemaps.org/protocol.html
+        """
+        with self.open_sitemap(path, 'rb') as f:
+            for _, element in etree.iterparse(f, tag='{*}loc'):
+                if element.text and element.text.strip():
+                    yield element.text.strip()
+                element.clear()
+                parent = element.getparent()
+                while parent is not None and parent.getprevious() is not None:
+                    del parent.getparent()[0]
+
+    def open_sitemap(self, path, mode):
+        with open(path, 'rb') as f:
+            gzipped = f.read(2) == b'\x1f\x8b'
+        return gzip.open(path, mode) if gzipped else open(path, mode)
+
+    def start_run(self):
+        """Assigns the run id under which page reports are stored. A resumed run reuses the
+        id of the interrupted run so that pages already audited are not audited again.
+        """
+        if self.resume and os.path.exists(self.run_id_path):
+            with open(self.run_id_path, 'r') as f:
+                self.run_id = f.read().strip()
+            return self.run_id
 
-    def generate_sitemap(self):
-        with open(self.sitemap_path, 'w') as sitemap_file:
-            sitemap_file.write("### Sitemap Draft ###\n")
+        if not self.resume:
+            shutil.rmtree(self.job_dir, ignore_errors=True)
+
+        os.makedirs(self.job_dir, exist_ok=True)
+        self.run_id = self.started_at.strftime('%Y%m%d%H%M%S')
+        with open(self.run_id_path, 'w') as f:
+            f.write(self.run_id)
+        return self.run_id
 
-        self.map_pages_to_sitemap_file_with_spiders()
+    def generate_sitemap(self):
+        if self.resume and os.path.exists(self.crawl_finished_path):
+            self.crawl_finished = True
+            return self.sitemap_path
+
+        resuming_crawl = self.resume and os.path.exists(self.crawl_job_dir)
+
+        if not resuming_crawl:
+            shutil.rmtree(self.crawl_job_dir, ignore_errors=True)
+            with open(self.sitemap_path, 'w') as sitemap_file:
+                sitemap_file.write("### Sitemap Draft ###\n")
+            open(self.aliases_path, 'w').close()
+            open(self.content_hashes_path, 'w').close()
+            self.static_checks.clear()
+
+        with self.profiler.span('crawl'):
+            self.map_pages_to_sitemap_file_with_spiders()
         self.clean_up_sitemap_file()
+
+        if self.crawl_finished:
+            # Frontier is exhausted. Leave a marker so a resumed audit skips the crawl.
+            shutil.rmtree(self.crawl_job_dir, ignore_errors=True)
+            os.makedirs(self.job_dir, exist_ok=True)
+            open(self.crawl_finished_path, 'w').close()
+
         return self.sitemap_path
 
     def map_pages_to_sitemap_file_with_spiders(self):
         """Generate sitemap file using scrapy spider and crawler process.
         """
+        # A running crawler service (see python app.py serve) keeps its reactor alive
+        # between crawls.
+        if self.crawler_service:
+            self.crawler_service.crawl(SitemapSpider, self, settings=self.crawl_settings)
+            return self
+
         # This process of passing url taken from this Stack Overflow answer:
         # https://stackoverflow.com/questions/40846714/scrapy-python-how-to-pass-url-and-retrieve-url-for-scraping#answer-40846873
-        process = CrawlerProcess({'USER_AGENT': self.USER_AGENT})
+        process = CrawlerProcess(self.crawl_settings)
 
         # https://kirankoduru.github.io/python/running-scrapy-programmatically.html
         # Accepts a spider class and a list of arguments to pass to it when instantiating.
@@ -168,26 +636,135 @@ class Site(object):
         return self
 
     def clean_up_sitemap_file(self):
-        sitemap_urls = []
-
-        with open(self.sitemap_path, 'r') as f:
-            page_urls = [line.strip() for line in f.read().split('\n') if line]
-
-        for url in page_urls:
+        # Duplicate pages are audited once, under their canonical url. Sorting holds the set
+        # of crawled urls, as the spider already did while crawling, but not the file.
+        crawled_urls = set()
+        for url in self.read_sitemap_urls(self.sitemap_path):
             normalized_url = self.normalize_url(url)
             if self.is_valid_internal_url(normalized_url):
-                sitemap_urls.append(normalized_url)
-
-        sitemap_urls = sorted(list(set(sitemap_urls)))
-
-        with open(self.sitemap_path, 'w') as sitemap_file:
+                crawled_urls.add(normalized_url)
+
+        # A page is only dropped as an alias if its canonical url will be audited in its place.
+        # Others, e.g. duplicates of the base url, which the sitemap leaves out, stay in.
+        aliases = self.read_alias_file()
+        kept_aliases = dict((alias, canonical_url) for alias, canonical_url in aliases.items()
+                            if canonical_url in crawled_urls)
+        if len(kept_aliases) < len(aliases):
+            self.write_alias_file(kept_aliases)
+        sitemap_urls = crawled_urls - set(kept_aliases)
+
+        # Written to a temp file first so that an interrupted clean up never leaves a
+        # truncated sitemap behind.
+        draft_path = self.sitemap_path + '.part'
+        with open(draft_path, 'w') as sitemap_file:
             header_f = "#\n## Sitemap for {} generated {}\n###\n"
             header = header_f.format(self.fqdn, self.started_at.strftime('%F %T'))
             sitemap_file.write(header)
-            sitemap_file.write("\n".join(sitemap_urls))
+            # Every line ends in a newline, so a resumed crawl appends urls on lines of
+            # their own.
+            for url in sorted(sitemap_urls):
+                sitemap_file.write("{}\n".format(url))
+        os.replace(draft_path, self.sitemap_path)
 
         return self.sitemap_path
 
+    def close(self):
+        """Quits browser sessions, unless they are shared with other sites, closes the result
+        store and stops progress reporting.
+        """
+        if self.progress:
+            self.progress.stop()
+        if self.owns_browser_pool:
+            self.browser_pool.close()
+        if self.auth_session and self.owns_auth_session:
+            self.auth_session.close()
+        if self._result_store is not None:
+            self._result_store.close()
+        if self._link_graph is not None:
+            self._link_graph.close()
+            self._link_graph = None
+        return self
+
+    def read_link_stats(self):
+        """Depth and in-degree of each page the crawl reached by following links, from the
+        link graph recorded by SitemapSpider.
+        """
+        link_stats = {}
+        link_graph = self.link_graph
+
+        if link_graph is None:
+            return link_stats
+
+        depths = link_graph.depths(self.base_url)
+        in_offsets = link_graph.in_offsets
+        for node_id, url in enumerate(link_graph.urls):
+            if depths[node_id] >= 0:
+                link_stats[url] = [depths[node_id], in_offsets[node_id + 1] - in_offsets[node_id]]
+
+        return link_stats
+
+    def pages_linking_to(self, url):
+        """Urls of the crawled pages linking to url, e.g. to find every page embedding a
+        broken component.
+        """
+        link_graph = self.link_graph
+        return link_graph.linked_from(self.normalize_url(url)) if link_graph else []
+
+    def orphan_page_urls(self):
+        """Sitemap urls no crawled page links to, e.g. pages found only in XML sitemaps."""
+        link_graph = self.link_graph
+        if link_graph is None:
+            return
+        yield from link_graph.orphans(self.read_page_urls(), self.base_url)
+
+    def read_alias_file(self):
+        """Returns dict of alias url -> canonical url recorded by the spider. Chains (a is an
+        alias of b, b of c) are resolved to the final canonical url. Cycles (pages naming each
+        other as canonical) are broken by keeping the first url seen as the canonical one.
+        """
+        aliases = {}
+        # Url -> position it was first seen in, alias or canonical.
+        first_seen = {}
+
+        if not os.path.exists(self.aliases_path):
+            return aliases
+
+        with open(self.aliases_path, 'r') as f:
+            for line in f:
+                alias, _, canonical_url = line.strip().partition('\t')
+                if alias and canonical_url and alias != canonical_url:
+                    aliases[alias] = canonical_url
+                    first_seen.setdefault(alias, len(first_seen))
+                    first_seen.setdefault(canonical_url, len(first_seen))
+
+        for alias in list(aliases):
+            chain = []
+            url = alias
+            while url in aliases and url not in chain:
+                chain.append(url)
+                url = aliases[url]
+            if url in chain:
+                cycle = chain[chain.index(url):]
+                del aliases[min(cycle, key=first_seen.get)]
+
+        for alias, canonical_url in aliases.items():
+            seen = {alias}
+            while canonical_url in aliases and canonical_url not in seen:
+                seen.add(canonical_url)
+                canonical_url = aliases[canonical_url]
+            aliases[alias] = canonical_url
+
+        return aliases
+
+    def write_alias_file(self, aliases):
+        draft_path = self.aliases_path + '.part'
+        with open(draft_path, 'w') as f:
+            for alias, canonical_url in aliases.items():
+                f.write("{}\t{}\n".format(alias, canonical_url))
+        os.replace(draft_path, self.aliases_path)
+        self._aliases = None
+        return self.aliases_path
+
     def extract_scheme(self, domain_or_url):
         scheme = urlsplit(domain_or_url).scheme
         return scheme if scheme else None
@@ -207,37 +784,11 @@ class Site(object):
             return 'http'
 
     def normalize_url(self, url):
-        """Normlize url as absolute url. For example, if base_url is https://foo.com,
+        """Normalize url as absolute url. For example, if base_url is https://foo.com,
         will transform url bars/new as follows:
         bars/new -> https://foo.com/bars/new
         """
-        is_absolute_url = url.startswith('http://') or url.startswith('https://')
-        starts_with_slash = url.startswith('/')
-
-        # Remove trailing slash from base url.
-        if url in ['/', '{}/'.format(self.base_url)]:
-            url = self.base_url
-
-        if not is_absolute_url and not starts_with_slash:
-            url = '/{}'.format(url)
-
-        if not is_absolute_url:
-            url = urljoin(self.base_url, url)
-
-        return url
+        return self.url_classifier.normalize(url)
 
     def is_valid_internal_url(self, normalized_url):
-        # Concerning 'javascript:' href
-        # https://stackoverflow.com/questions/7755088
-        invalid_markers = ['mailto:', 'tel:', 'fax:', '#', 'javascript:']
-
-        if any(marker in normalized_url for marker in invalid_markers):
-            return False
-
-        # Scrapy provides a list of file extensions that it will not follow.
-        # This makes sure links with those extensions are not added to sitemap
-        # https://github.com/scrapy/scrapy/blob/b85943/scrapy/linkextractors/__init__.py#L20-L39
-        if any(normalized_url.endswith(extension) for extension in IGNORED_EXTENSIONS):
-            return False
-
-        return normalized_url.startswith(self.base_url)
+        return self.url_classifier.is_valid_internal(normalized_url)
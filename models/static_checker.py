@@ -0,0 +1,173 @@
+"""
+StaticChecker
+Cheap accessibility checks run on each page's HTML as the crawl parses it, without a browser:
+images without alt text, a missing lang attribute, links without text and unlabeled form
+inputs. They catch a subset of what axe finds, and can miss what scripts change after load,
+but cost well under a millisecond per page.
+
+Results are shaped like axe's (rule id, impact, help and failing nodes), with source 'static',
+so they read as violations like any other. They rank pages for prioritized audits, pages with
+more issues first, and --static-only audits report them without running a browser at all
+(python app.py audit --crawl --static-only httpbin.org).
+
+StaticChecks keeps a site's results, a JSON line per page (audits/<site>/static-checks.jsonl),
+and serves them by url like recorded axe results. See ReplayDriver.
+
+Rules
+- html-has-lang   <html> without a lang attribute
+- image-alt       <img> without alt, aria-label, aria-labelledby or title
+- link-name       <a href> with no text, image alt text, aria-label, aria-labelledby or title
+- label           form inputs with no <label>, aria-label, aria-labelledby, title or placeholder
+"""
+import json
+import os
+import threading
+
+HELP_URL_F = 'https://dequeuniversity.com/rules/axe/3.1/{}?application=axeAPI'
+
+RULES = {
+    'html-has-lang': {'impact': 'serious', 'tags': ['cat.language', 'wcag2a', 'wcag311'],
+                      'help': '<html> element must have a lang attribute',
+                      'failure': 'Fix any of the following:\n  The <html> element does not '
+                                 'have a lang attribute'},
+    'image-alt': {'impact': 'critical', 'tags': ['cat.text-alternatives', 'wcag2a', 'wcag111'],
+                  'help': 'Images must have alternate text',
+                  'failure': 'Fix any of the following:\n  Element does not have an alt '
+                             'attribute'},
+    'link-name': {'impact': 'serious', 'tags': ['cat.name-role-value', 'wcag2a', 'wcag412'],
+                  'help': 'Links must have discernible text',
+                  'failure': 'Fix any of the following:\n  Element does not have text that '
+                             'is visible to screen readers'},
+    'label': {'impact': 'critical', 'tags': ['cat.forms', 'wcag2a', 'wcag332'],
+              'help': 'Form elements must have labels',
+              'failure': 'Fix any of the following:\n  Form element does not have an implicit '
+                         '(wrapped) or explicit <label>'}
+}
+
+NAMED = 'normalize-space(@aria-label) or @aria-labelledby or normalize-space(@title)'
+
+# Elements failing each rule, relative to the document's <html> element.
+RULE_XPATHS = {
+    'html-has-lang': 'self::html[not(normalize-space(@lang))]',
+    'image-alt': '//img[not(@alt) and not({}) and not(@role="presentation" or @role="none")]'
+                 .format(NAMED),
+    'link-name': '//a[@href and not(normalize-space(.)) and not(.//img[normalize-space(@alt)]) '
+                 'and not({})]'.format(NAMED),
+    'label': '//*[self::input[not(@type="hidden" or @type="submit" or @type="button" or '
+             '@type="image" or @type="reset")] or self::select or self::textarea]'
+             '[not(@id and @id = //label/@for) and not(ancestor::label) and '
+             'not(normalize-space(@placeholder)) and not({})]'.format(NAMED)
+}
+
+
+class StaticChecker(object):
+    #
+    # Static Methods
+    #
+    @staticmethod
+    def start_tag(element):
+        attributes = ''.join(' {}="{}"'.format(name, value)
+                             for name, value in element.attrib.items())
+        return '<{}{}>'.format(element.tag, attributes)
+
+    #
+    # Instance Methods
+    #
+    def check(self, url, document):
+        """Axe-shaped results for document, the page's parsed <html> element (lxml)."""
+        violations = []
+        for rule_id, xpath in RULE_XPATHS.items():
+            elements = document.xpath(xpath)
+            if elements:
+                violations.append(self.rule_result(rule_id, elements))
+        return {'url': url, 'source': 'static', 'violations': violations, 'incomplete': []}
+
+    def rule_result(self, rule_id, elements):
+        rule = RULES[rule_id]
+        nodes = [{'html': self.start_tag(element), 'impact': rule['impact'],
+                  'target': [element.getroottree().getpath(element)],
+                  'failureSummary': rule['failure']}
+                 for element in elements]
+        return {'id': rule_id, 'impact': rule['impact'], 'tags': rule['tags'],
+                'description': rule['help'], 'help': rule['help'],
+                'helpUrl': HELP_URL_F.format(rule_id), 'nodes': nodes}
+
+    # Magic Methods
+    def __repr__(self):
+        return '<StaticChecker rules={}>'.format(len(RULE_XPATHS))
+
+
+class StaticChecks(object):
+    def __init__(self, path):
+        self.path = path
+        # url -> offset of the page's line, read when first needed.
+        self.offsets = None
+        self.lock = threading.Lock()
+
+    #
+    # Static Methods
+    #
+    @staticmethod
+    def issue_count(results):
+        return sum(len(result['nodes']) for result in results['violations'])
+
+    #
+    # Instance Methods
+    #
+    def append(self, results):
+        with self.lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(results) + '\n')
+            self.offsets = None
+        return results
+
+    def clear(self):
+        with self.lock:
+            open(self.path, 'w').close()
+            self.offsets = None
+        return self
+
+    def load(self):
+        with self.lock:
+            if self.offsets is None:
+                offsets = {}
+                if os.path.exists(self.path):
+                    with open(self.path, 'rb') as f:
+                        offset = 0
+                        for line in f:
+                            url = json.loads(line)['url']
+                            offsets[url] = offset
+                            offset += len(line)
+                self.offsets = offsets
+        return self.offsets
+
+    def get(self, url):
+        """Results for url, or empty results if the crawl did not check it: pages found only
+        in sitemaps are never parsed.
+        """
+        offset = self.load().get(url)
+        if offset is None:
+            return {'url': url, 'source': 'static', 'violations': [], 'incomplete': []}
+
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def scores(self):
+        """Url -> issues found by the static checks, for ranking pages."""
+        scores = {}
+        if not os.path.exists(self.path):
+            return scores
+        with open(self.path, 'r') as f:
+            for line in f:
+                results = json.loads(line)
+                scores[results['url']] = self.issue_count(results)
+        return scores
+
+    # Magic Methods
+    def __contains__(self, url):
+        return url in self.load()
+
+    def __repr__(self):
+        F = '<StaticChecks path={}>'
+        return F.format(self.path)
@@ -0,0 +1,167 @@
+"""
+TemplateIndex
+Violation counts by url path prefix, at any depth. Url path segments are assumed to be
+templates (see Page.templates): /docs is a template, /docs/api a subtemplate, and so on down.
+
+Pages are added once, as they are audited, into a trie of path segments. Each node keeps running
+counts for the pages at or under its prefix, so "violations under /docs/api" is a walk of the
+prefix's segments, O(depth), and a node's children are its drill-down. Nodes are also listed by
+depth, so the top templates at any depth are ranked without walking the tree.
+
+Relationships
+- belongs_to site
+- has_many nodes
+
+Fields (per node)
+- path, depth
+- pages        pages at or under the prefix
+- violations   violations on those pages
+- errors       violations that are errors
+"""
+import csv
+import heapq
+
+
+class TemplateNode(object):
+    def __init__(self, path, depth):
+        self.path = path
+        self.depth = depth
+        self.children = {}
+        self.pages = 0
+        self.violations = 0
+        self.errors = 0
+
+    #
+    # Properties
+    #
+    @property
+    def warnings(self):
+        return self.violations - self.errors
+
+    #
+    # Instance Methods
+    #
+    def children_sorted_by_violations(self):
+        return sorted(self.children.values(), key=lambda n: n.violations, reverse=True)
+
+    def to_dict(self):
+        return {
+            'path': self.path,
+            'depth': self.depth,
+            'pages': self.pages,
+            'violations': self.violations,
+            'errors': self.errors,
+            'warnings': self.warnings
+        }
+
+    # Magic Methods
+    def __repr__(self):
+        F = '<TemplateNode path={} pages={} violations={}>'
+        return F.format(self.path, self.pages, self.violations)
+
+
+class TemplateIndex(object):
+    CSV_FIELDS = ['path', 'depth', 'pages', 'violations', 'errors', 'warnings']
+
+    def __init__(self):
+        self.root = TemplateNode('', 0)
+        # depth -> nodes at that depth, in the order they were first seen
+        self.levels = {}
+
+    #
+    # Static Methods
+    #
+    @staticmethod
+    def segments(path):
+        path = path.strip('/')
+        return path.split('/') if path else []
+
+    #
+    # Properties
+    #
+    @property
+    def pages(self):
+        return self.root.pages
+
+    @property
+    def depth(self):
+        return max(self.levels) if self.levels else 0
+
+    #
+    # Instance Methods
+    #
+    def add_page(self, page):
+        violations = page.violations
+        errors = sum(1 for violation in violations if violation.is_error())
+
+        node = self.root
+        self.count(node, violations, errors)
+        for segment in self.segments(page.path):
+            child = node.children.get(segment)
+            if child is None:
+                path = '{}/{}'.format(node.path, segment) if node.path else segment
+                child = node.children[segment] = TemplateNode(path, node.depth + 1)
+                self.levels.setdefault(child.depth, []).append(child)
+            node = child
+            self.count(node, violations, errors)
+        return self
+
+    def count(self, node, violations, errors):
+        node.pages += 1
+        node.violations += len(violations)
+        node.errors += errors
+        return node
+
+    def node(self, path):
+        """Node for a path prefix such as 'docs/api' or '/docs/api/', or None."""
+        node = self.root
+        for segment in self.segments(path):
+            node = node.children.get(segment)
+            if node is None:
+                return None
+        return node
+
+    def violations_under(self, path):
+        node = self.node(path)
+        return node.violations if node else 0
+
+    def children(self, path=''):
+        """Drill-down: the prefixes one level under path, most violations first."""
+        node = self.node(path)
+        return node.children_sorted_by_violations() if node else []
+
+    def top(self, n=10, depth=1):
+        """The n prefixes at depth with the most violations, or all of them if n is None."""
+        nodes = self.levels.get(depth, [])
+        if n is None:
+            return sorted(nodes, key=lambda node: node.violations, reverse=True)
+        return heapq.nlargest(n, nodes, key=lambda node: node.violations)
+
+    def walk(self):
+        """Every node under the root, depth first, most violations first at each level."""
+        stack = list(reversed(self.root.children_sorted_by_violations()))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children_sorted_by_violations()))
+
+    def to_dict(self, n=10):
+        return dict(('depth_{}'.format(depth), [node.to_dict() for node in self.top(n, depth)])
+                    for depth in sorted(self.levels))
+
+    def write_csv(self, path):
+        """One row per path prefix, in drill-down order."""
+        with open(path, mode='w') as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=self.CSV_FIELDS)
+            writer.writeheader()
+            for node in self.walk():
+                writer.writerow(node.to_dict())
+        return path
+
+    # Magic Methods
+    def __len__(self):
+        return sum(len(nodes) for nodes in self.levels.values())
+
+    def __repr__(self):
+        F = '<TemplateIndex pages={} prefixes={} depth={}>'
+        return F.format(self.pages, len(self), self.depth)
@@ -0,0 +1,149 @@
+"""
+UrlClassifier
+Canonicalizes and classifies urls extracted while crawling a site. Runs for every link the
+spider extracts, so patterns and lookups are compiled once per site.
+
+Relationships
+- belongs_to site
+
+Options
+- strip_tracking_params  [False, True]
+- case                   [preserve, host, lower]
+- trailing_slash         [preserve, strip, add]
+"""
+import re
+from urllib.parse import urljoin, parse_qsl, urlencode
+
+from scrapy.linkextractors import IGNORED_EXTENSIONS
+
+
+class InvalidUrlRule(Exception):
+    pass
+
+
+class UrlClassifier(object):
+    # Concerning 'javascript:' href
+    # https://stackoverflow.com/questions/7755088
+    INVALID_MARKERS = re.compile(r'mailto:|tel:|fax:|#|javascript:')
+
+    # Scrapy provides a list of file extensions that it will not follow.
+    # This makes sure links with those extensions are not added to sitemap
+    # https://github.com/scrapy/scrapy/blob/b85943/scrapy/linkextractors/__init__.py#L20-L39
+    IGNORED_EXTENSIONS = frozenset(IGNORED_EXTENSIONS)
+
+    TRACKING_PARAMS = re.compile(r'^(utm_\w+|gclid|dclid|fbclid|msclkid|mc_cid|mc_eid|_ga|_gl)$')
+
+    CASE_POLICIES = ['preserve', 'host', 'lower']
+    TRAILING_SLASH_POLICIES = ['preserve', 'strip', 'add']
+
+    def __init__(self, base_url, **options):
+        self.base_url = base_url
+        self.strip_tracking_params = options.get('strip_tracking_params', False)
+        self.case = options.get('case') or 'preserve'
+        self.trailing_slash = options.get('trailing_slash') or 'preserve'
+
+        if self.case not in self.CASE_POLICIES:
+            raise InvalidUrlRule('Invalid case policy: {}'.format(self.case))
+        if self.trailing_slash not in self.TRAILING_SLASH_POLICIES:
+            raise InvalidUrlRule('Invalid trailing slash policy: {}'.format(self.trailing_slash))
+
+        self.base_url_with_slash = '{}/'.format(base_url)
+        self.rewrites_urls = (self.strip_tracking_params or self.case != 'preserve' or
+                              self.trailing_slash != 'preserve')
+
+    #
+    # Instance Methods
+    #
+    def normalize(self, url):
+        """Normalize url as absolute url. For example, if base_url is https://foo.com,
+        will transform url bars/new as follows:
+        bars/new -> https://foo.com/bars/new
+
+        Fragments are dropped. Links that are only a fragment are left as is, so that they
+        are classified as invalid rather than mistaken for the base url.
+        """
+        if url.startswith('#'):
+            return url
+
+        url, _, _ = url.partition('#')
+        is_absolute_url = url.startswith('http://') or url.startswith('https://')
+
+        # Remove trailing slash from base url.
+        if url == '/' or url == self.base_url_with_slash:
+            return self.base_url
+
+        if not is_absolute_url:
+            if not url.startswith('/'):
+                url = '/{}'.format(url)
+            # urljoin is only needed for protocol-relative links and dot segments. Plain
+            # absolute paths join by concatenation, which is much cheaper.
+            if url.startswith('//') or '/.' in url:
+                url = urljoin(self.base_url, url)
+            else:
+                url = self.base_url + url
+        elif self.case != 'preserve':
+            scheme, _, rest = url.partition('://')
+            netloc, slash, path = rest.partition('/')
+            url = '{}://{}{}{}'.format(scheme.lower(), netloc.lower(), slash, path)
+
+        if self.rewrites_urls and self.is_internal(url):
+            url = self.canonicalize(url)
+
+        return url
+
+    def canonicalize(self, url):
+        path, question_mark, query = url[len(self.base_url):].partition('?')
+
+        if self.case == 'lower':
+            path = path.lower()
+
+        if self.trailing_slash == 'strip' and path.endswith('/'):
+            path = path.rstrip('/')
+        elif self.trailing_slash == 'add' and not path.endswith('/') and not self.extension(path):
+            path = '{}/'.format(path)
+
+        if self.strip_tracking_params and query:
+            params = [(k, v) for k, v in parse_qsl(query, keep_blank_values=True)
+                      if not self.TRACKING_PARAMS.match(k)]
+            query = urlencode(params)
+            question_mark = '?' if query else ''
+
+        if path in ('', '/') and not query:
+            return self.base_url
+        return '{}{}{}{}'.format(self.base_url, path, question_mark, query)
+
+    def is_valid_internal(self, normalized_url):
+        # Cheapest check first: most rejected links are external.
+        if not self.is_internal(normalized_url):
+            return False
+
+        if self.INVALID_MARKERS.search(normalized_url):
+            return False
+
+        return not self.has_ignored_extension(normalized_url)
+
+    def is_internal(self, url):
+        if not url.startswith(self.base_url):
+            return False
+
+        # Guard against hosts that merely share a prefix, e.g. foo.com.evil.com
+        return len(url) == len(self.base_url) or url[len(self.base_url)] in '/?'
+
+    def has_ignored_extension(self, url):
+        path = url[len(self.base_url):].partition('?')[0]
+        extension = self.extension(path)
+
+        if not extension:
+            return False
+
+        # Covers compound extensions such as tar.gz
+        _, _, stem = path.rpartition('/')
+        compound_extension = '.'.join(stem.rsplit('.', 2)[-2:])
+
+        return (extension in self.IGNORED_EXTENSIONS or
+                compound_extension in self.IGNORED_EXTENSIONS)
+
+    def extension(self, path):
+        _, _, segment = path.rpartition('/')
+        _, dot, extension = segment.rpartition('.')
+        return extension.lower() if dot else ''
@@ -14,6 +14,7 @@ Fields
 - help_url
 - html
 - failure
+- viewport  [None, or a viewport name when audited at several viewports]
 """
 
 
@@ -51,15 +52,35 @@ class Violation(object):
         violation.help_url = axe_violation['helpUrl']
         violation.html = node['html']
         violation.failure = node.get('failureSummary')
+        violation.viewport = node.get('viewport')
         violation.type = 'design' if violation.identifier == 'color-contrast' else 'code'
         return violation
 
+    @staticmethod
+    def from_dict(page, data):
+        violation = Violation(page=page, source=data['source'], identifier=data['identifier'],
+                              severity=data['severity'])
+        violation.kind = data['kind']
+        violation.type = data['type']
+        violation.help = data['help']
+        violation.help_url = data['help_url']
+        violation.html = data['html']
+        violation.failure = data['failure']
+        violation.viewport = data.get('viewport')
+        return violation
+
     def __init__(self, **options):
         self.page = options.get('page')
         self.source = options.get('source')
         self.identifier = options.get('identifier')
         self.severity = options.get('severity')
         self.kind = 'error'
+        self.type = None
+        self.help = None
+        self.help_url = None
+        self.html = None
+        self.failure = None
+        self.viewport = None
 
     def is_error(self):
         return self.kind == 'error'
@@ -67,6 +88,21 @@ class Violation(object):
     def is_warning(self):
         return self.kind == 'warning'
 
+    def to_dict(self):
+        return {
+            'page_url': self.page.url,
+            'source': self.source,
+            'identifier': self.identifier,
+            'severity': self.severity,
+            'kind': self.kind,
+            'type': self.type,
+            'help': self.help,
+            'help_url': self.help_url,
+            'html': self.html,
+            'failure': self.failure,
+            'viewport': self.viewport
+        }
+
     # Magic Methods
     def __repr__(self):
         F = '<Violation source={} kind={} identifier={} severity={}>'
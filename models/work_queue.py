@@ -0,0 +1,279 @@
+"""
+WorkQueue
+Shared queue of page urls for distributed audits. A coordinator enqueues the urls it crawled;
+workers lease a url, audit it and push the result back.
+
+- Leases expire, so a url leased by a worker that died is handed to another worker.
+- Failed urls are retried until max_attempts leases have been handed out.
+- Only the worker holding a url's lease can complete or fail it. A slow worker whose lease
+  expired and was handed to another worker cannot record, requeue or overwrite its error.
+- Result writes are idempotent: the first result recorded for a url wins.
+- Each coordinator run starts with start_run. Tasks and results left by an earlier run on the
+  same queue are dropped, so they are never collected as the new run's audit.
+
+Backends are looked up by uri scheme in WorkQueue.BACKENDS. SQLite is built in and is enough
+for several workers on one machine or on a shared filesystem with working locks.
+
+Task statuses
+- pending, leased, done, failed
+"""
+import json
+import sqlite3
+import time
+from urllib.parse import urlsplit
+
+
+class InvalidQueueBackend(Exception):
+    pass
+
+
+class Task(object):
+    def __init__(self, url, attempts=0, **options):
+        self.url = url
+        self.attempts = attempts
+        self.leased_by = options.get('leased_by')
+        self.lease_expires_at = options.get('lease_expires_at')
+
+    # Magic Methods
+    def __repr__(self):
+        F = '<Task url={} attempts={} leased_by={}>'
+        return F.format(self.url, self.attempts, self.leased_by)
+
+
+class WorkQueue(object):
+    BACKENDS = {}
+
+    #
+    # Static Methods
+    #
+    @staticmethod
+    def from_uri(uri, **options):
+        """Opens a queue from a uri such as sqlite:///path/to/queue.db. A plain file path is
+        treated as a SQLite database.
+        """
+        scheme = urlsplit(uri).scheme if '://' in uri else 'sqlite'
+        backend = WorkQueue.BACKENDS.get(scheme)
+
+        if backend is None:
+            error_str = 'Invalid queue backend: {}. Must be from the following: {}'.format(
+                scheme, sorted(WorkQueue.BACKENDS))
+            raise InvalidQueueBackend(error_str)
+
+        return backend.from_uri(uri, **options)
+
+    @staticmethod
+    def register(scheme, backend):
+        WorkQueue.BACKENDS[scheme] = backend
+        return backend
+
+    #
+    # Interface
+    #
+    def set_meta(self, key, value):
+        raise NotImplementedError
+
+    def get_meta(self, key, default=None):
+        raise NotImplementedError
+
+    def start_run(self, run_id):
+        raise NotImplementedError
+
+    def enqueue(self, urls):
+        raise NotImplementedError
+
+    def lease(self, worker_id, lease_seconds=None):
+        raise NotImplementedError
+
+    def complete(self, url, result, worker_id):
+        raise NotImplementedError
+
+    def fail(self, url, error, worker_id):
+        raise NotImplementedError
+
+    def results(self):
+        raise NotImplementedError
+
+    def failures(self):
+        raise NotImplementedError
+
+    def counts(self):
+        raise NotImplementedError
+
+    #
+    # Instance Methods
+    #
+    def is_done(self):
+        counts = self.counts()
+        return counts['pending'] == 0 and counts['leased'] == 0
+
+
+class SQLiteWorkQueue(WorkQueue):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            url TEXT PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            leased_by TEXT,
+            lease_expires_at REAL,
+            error TEXT,
+            result TEXT
+        );
+        CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires_at);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, path, **options):
+        self.path = path
+        self.lease_seconds = options.get('lease_seconds', 300)
+        self.max_attempts = options.get('max_attempts', 3)
+
+        # Autocommit mode; transactions are opened explicitly where a read-then-write must be
+        # atomic across processes.
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None,
+                                  check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(self.SCHEMA)
+
+    #
+    # Static Methods
+    #
+    @staticmethod
+    def from_uri(uri, **options):
+        path = uri[len('sqlite://'):] if uri.startswith('sqlite://') else uri
+        return SQLiteWorkQueue(path, **options)
+
+    #
+    # Instance Methods
+    #
+    def set_meta(self, key, value):
+        self.db.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                        (key, json.dumps(value)))
+
+    def get_meta(self, key, default=None):
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def start_run(self, run_id):
+        """Scopes the queue to run_id. Tasks queued by any other run are dropped. Returns
+        True if a new run started, False if run_id, e.g. a resumed run, was already current.
+        """
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'run_id'").fetchone()
+            new_run = row is None or json.loads(row[0]) != run_id
+            if new_run:
+                self.db.execute('DELETE FROM tasks')
+                self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('run_id', ?)",
+                                (json.dumps(run_id),))
+            self.db.execute('COMMIT')
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        return new_run
+
+    def enqueue(self, urls):
+        """Adds urls not already queued. Returns the number added."""
+        before = self.db.total_changes
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            self.db.executemany('INSERT OR IGNORE INTO tasks (url) VALUES (?)',
+                                ((url,) for url in urls))
+            self.db.execute('COMMIT')
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        return self.db.total_changes - before
+
+    def lease(self, worker_id, lease_seconds=None):
+        """Leases the next pending url, or one whose lease has expired, to worker_id.
+        Returns a Task or None when nothing is available.
+        """
+        now = time.time()
+        lease_expires_at = now + (lease_seconds or self.lease_seconds)
+
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            self.expire_exhausted_leases(now)
+            row = self.db.execute("""
+                SELECT url, attempts FROM tasks
+                WHERE status = 'pending' OR (status = 'leased' AND lease_expires_at < ?)
+                ORDER BY attempts, rowid
+                LIMIT 1
+            """, (now,)).fetchone()
+
+            if row is None:
+                self.db.execute('COMMIT')
+                return None
+
+            url, attempts = row
+            self.db.execute("""
+                UPDATE tasks SET status = 'leased', attempts = attempts + 1, leased_by = ?,
+                                 lease_expires_at = ?
+                WHERE url = ?
+            """, (worker_id, lease_expires_at, url))
+            self.db.execute('COMMIT')
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+
+        return Task(url, attempts + 1, leased_by=worker_id, lease_expires_at=lease_expires_at)
+
+    def expire_exhausted_leases(self, now):
+        # A lease that expired on its final attempt will not be retried.
+        self.db.execute("""
+            UPDATE tasks SET status = 'failed', error = 'lease expired'
+            WHERE status = 'leased' AND lease_expires_at < ? AND attempts >= ?
+        """, (now, self.max_attempts))
+
+    def complete(self, url, result, worker_id):
+        """Records result for url, leased by worker_id. Returns False if a result was already
+        recorded or the lease has since been handed to another worker.
+        """
+        cursor = self.db.execute("""
+            UPDATE tasks SET status = 'done', result = ?, error = NULL, lease_expires_at = NULL
+            WHERE url = ? AND status = 'leased' AND leased_by = ?
+        """, (json.dumps(result), url, worker_id))
+        return cursor.rowcount == 1
+
+    def fail(self, url, error, worker_id):
+        """Returns url, leased by worker_id, to the queue for another attempt, or marks it
+        failed once it has been attempted max_attempts times. Returns False if the lease has
+        since been handed to another worker.
+        """
+        cursor = self.db.execute("""
+            UPDATE tasks
+            SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                error = ?, lease_expires_at = NULL
+            WHERE url = ? AND status = 'leased' AND leased_by = ?
+        """, (self.max_attempts, str(error), url, worker_id))
+        return cursor.rowcount == 1
+
+    def results(self):
+        """Yields (url, result) for completed urls."""
+        cursor = self.db.execute("SELECT url, result FROM tasks WHERE status = 'done' "
+                                 "ORDER BY url")
+        for url, result in cursor:
+            yield url, json.loads(result)
+
+    def failures(self):
+        """Returns (url, error) for urls that failed for good."""
+        cursor = self.db.execute("SELECT url, error FROM tasks WHERE status = 'failed' "
+                                 "ORDER BY url")
+        return cursor.fetchall()
+
+    def counts(self):
+        self.expire_exhausted_leases(time.time())
+        counts = dict.fromkeys(['pending', 'leased', 'done', 'failed'], 0)
+        for status, count in self.db.execute('SELECT status, COUNT(*) FROM tasks '
+                                             'GROUP BY status'):
+            counts[status] = count
+        return counts
+
+    def close(self):
+        self.db.close()
+
+
+WorkQueue.register('sqlite', SQLiteWorkQueue)
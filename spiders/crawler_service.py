@@ -0,0 +1,75 @@
+"""
+CrawlerService
+Runs the Twisted reactor in a background thread so that a long-running process can start
+crawls on demand. Scrapy's CrawlerProcess starts and stops the reactor for each crawl, and a
+Twisted reactor cannot be restarted, so a server needs one reactor that stays up.
+"""
+import threading
+
+from scrapy.crawler import CrawlerRunner
+from scrapy.utils.log import configure_logging
+from scrapy.utils.reactor import install_reactor
+
+ASYNCIO_REACTOR = 'twisted.internet.asyncioreactor.AsyncioSelectorReactor'
+
+
+class CrawlerService(object):
+    def __init__(self):
+        self.reactor = None
+        self.thread = None
+
+    #
+    # Properties
+    #
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    #
+    # Instance Methods
+    #
+    def start(self):
+        # Must run before anything imports twisted.internet.reactor, which would install the
+        # default reactor instead of the one scrapy expects.
+        install_reactor(ASYNCIO_REACTOR)
+        from twisted.internet import reactor
+
+        configure_logging()
+        self.reactor = reactor
+        self.thread = threading.Thread(target=reactor.run, name='crawler-reactor',
+                                       kwargs={'installSignalHandlers': False}, daemon=True)
+        self.thread.start()
+        return self
+
+    def crawl(self, spider_class, *args, **options):
+        """Schedules a crawl on the reactor thread and blocks the calling thread until the
+        spider closes. Several crawls may run on the reactor at once.
+        """
+        if not self.running:
+            raise RuntimeError('CrawlerService must be started before crawling.')
+
+        done = threading.Event()
+        outcome = {}
+
+        def on_done(result):
+            outcome['result'] = result
+            done.set()
+
+        def schedule():
+            runner = CrawlerRunner(options.get('settings'))
+            deferred = runner.crawl(spider_class, *args)
+            deferred.addBoth(on_done)
+
+        self.reactor.callFromThread(schedule)
+        done.wait()
+
+        result = outcome.get('result')
+        if hasattr(result, 'raiseException'):
+            result.raiseException()
+        return result
+
+    def stop(self):
+        if self.running:
+            self.reactor.callFromThread(self.reactor.stop)
+            self.thread.join()
+        return self
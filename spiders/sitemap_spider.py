@@ -1,16 +1,52 @@
+import hashlib
+import os
+from urllib.parse import urljoin
+
+from lxml.etree import XMLSyntaxError
+from scrapy import signals
 from scrapy.spiders import Spider
 from scrapy.http import Request
+from scrapy.utils.defer import maybe_deferred_to_future
+from scrapy.utils.gz import gunzip, gzip_magic_number
+from scrapy.utils.sitemap import Sitemap, sitemap_urls_from_robots
+from twisted.internet.threads import deferToThread
+
+from models.link_graph import LinkGraphBuilder
+from models.static_checker import StaticChecker
 
 
 class SitemapSpider(Spider):
     name = 'SitemapSpider'
 
+    # Close reasons that leave nothing more to crawl: the frontier ran out, or the profile's
+    # max_pages limit was reached on purpose. Errors and the time budget (closespider_timeout)
+    # cut the crawl short, and a resumed crawl continues it.
+    COMPLETE_REASONS = ['finished', 'closespider_pagecount']
+
     def __init__(self, site, *args, **kwargs):
         self.site = site
         self.start_urls = [self.base_url]
-        self.unique_links = [self.base_url]
+        self.unique_links = {self.base_url}
+        # sha1 of response body -> first url seen serving it
+        self.content_hashes = {}
+        # Which page links to which. Used to rank pages for prioritized audits.
+        self.link_graph = LinkGraphBuilder(site.link_graph_dir, resume=site.resume)
+        self.static_checker = StaticChecker()
+        # Login whose cookies the crawl's cookie jar holds, for sites behind a login.
+        self.auth_generation = None
+
+        if site.resume:
+            self.unique_links.update(self.read_sitemap_links())
+            self.content_hashes.update(self.read_content_hashes())
+
         super(SitemapSpider, self).__init__(*args, **kwargs)
 
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super(SitemapSpider, cls).from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.response_received, signal=signals.response_received)
+        return spider
+
     @property
     def base_url(self):
         return self.site.base_url
@@ -18,21 +54,251 @@ class SitemapSpider(Spider):
     #
     # Instance Methods
     #
+    async def start(self):
+        # Scrapy 2.13+ entry point. Logs in off the reactor thread, see sign_in_again.
+        cookies = await self.in_thread(self.auth_cookies)
+        for request in self.seed_requests(cookies):
+            yield request
+
+    def start_requests(self):
+        # Entry point for scrapy versions before 2.13.
+        yield from self.seed_requests(self.auth_cookies())
+
+    def seed_requests(self, cookies):
+        """Seeds the frontier. Link-following starts from the base url. Sitemap discovery
+        starts from robots.txt and the conventional /sitemap.xml location.
+        """
+        # Behind a login, the first requests carry its cookies. Scrapy's cookie middleware
+        # keeps them for the rest of the crawl.
+        if self.site.follows_links:
+            yield Request(self.base_url, callback=self.parse, dont_filter=True, cookies=cookies,
+                          meta=self.auth_meta())
+
+        if self.site.reads_sitemaps:
+            yield Request(urljoin(self.base_url, '/robots.txt'), callback=self.parse_robots,
+                          cookies=cookies, meta=self.auth_meta())
+            yield Request(urljoin(self.base_url, '/sitemap.xml'), callback=self.parse_sitemap,
+                          cookies=cookies, meta=self.auth_meta())
+
     def parse(self, response):
         """Parses each page for link href and recursively parses each of those pages.
         Syntax based on this article:
         https://kalamuna.atlassian.net/wiki/spaces/KALA/pages/50069580
         """
+        if self.is_login_redirect(response):
+            return self.sign_in_again(response)
+        return self.parse_links(response)
+
+    def parse_links(self, response):
+        yield from self.detect_duplicate(response)
+        self.check_page(response)
+
+        # Internal pages linked from this one, each once, in page order.
+        page_url = self.site.normalize_url(response.url)
+        linked_urls = {}
         for extracted_link in response.xpath('//a/@href').extract():
             url = self.site.normalize_url(extracted_link)
-            if self.site.is_valid_internal_url(url) and url not in self.unique_links:
-                self.write_to_sitemap(url)
-                yield Request(url, callback=self.parse)
+            if url != page_url and url not in linked_urls and \
+                    self.site.is_valid_internal_url(url):
+                linked_urls[url] = True
+
+        self.link_graph.add_links(page_url, linked_urls)
+        for url in linked_urls:
+            yield from self.visit_url(url)
+
+        return True
+
+    def parse_page(self, response):
+        """Checks a page found in an XML sitemap for duplicates and static issues, without
+        following its links. Sitemap discovery only downloads pages when --static-only needs
+        their HTML.
+        """
+        if self.is_login_redirect(response):
+            return self.sign_in_again(response)
+        return self.check_sitemap_page(response)
+
+    def check_sitemap_page(self, response):
+        yield from self.detect_duplicate(response)
+        self.check_page(response)
+
+    def is_login_redirect(self, response):
+        return bool(self.site.auth_session and
+                    self.site.auth_session.is_login_page(response.url))
+
+    async def sign_in_again(self, response):
+        """The page redirected to the login page, so the login expired on the server. Logs
+        in again, unless another page already has, and retries the page once with the new
+        cookies.
+        """
+        page_url = response.meta.get('redirect_urls', [response.url])[0]
+        if response.meta.get('signed_in_again'):
+            self.logger.warning('Skipping %s: redirected to the login page after logging in '
+                                'again', page_url)
+            return
+
+        # Logging in drives Chrome and waits for up to auth.timeout seconds. It runs in a
+        # thread so that the reactor keeps handling every other response meanwhile.
+        await self.in_thread(self.site.auth_session.refresh,
+                             response.meta.get('auth_generation'))
+        cookies = await self.in_thread(self.auth_cookies)
+        meta = dict(self.auth_meta(), signed_in_again=True)
+        callback = response.request.callback if response.request else None
+        yield Request(page_url, callback=callback or self.parse, dont_filter=True,
+                      cookies=cookies, meta=meta)
+
+    def in_thread(self, func, *args):
+        """Runs func in the reactor's thread pool. Returns an awaitable of its result."""
+        return maybe_deferred_to_future(deferToThread(func, *args))
+
+    def auth_cookies(self):
+        """Cookies of the current login, logging in first if needed, or None if the site
+        has no login.
+        """
+        auth_session = self.site.auth_session
+        if not auth_session:
+            return None
+        cookies = auth_session.scrapy_cookies()
+        self.auth_generation = auth_session.generation
+        return cookies
+
+    def auth_meta(self):
+        # The login each request was sent under, so a page that finds it expired refreshes
+        # that login only, not one made since.
+        return {'auth_generation': self.auth_generation}
+
+    def check_page(self, response):
+        """Runs the static checks on the parsed page, under its url as written to the
+        sitemap.
+        """
+        sitemap_url = self.site.normalize_url(
+            response.meta.get('redirect_urls', [response.url])[0])
+        return self.site.static_checks.append(
+            self.static_checker.check(sitemap_url, response.selector.root))
+
+    def detect_duplicate(self, response):
+        """Records the page as an alias when it names another url as canonical or serves
+        the same content as a page already crawled. Aliases are dropped from the sitemap
+        and reported with their canonical page's violations.
+        """
+        # Url as written to the sitemap, before any redirects.
+        page_url = self.site.normalize_url(response.meta.get('redirect_urls', [response.url])[0])
+        canonical_link = response.xpath('//link[@rel="canonical"]/@href').get()
+
+        if canonical_link:
+            canonical_url = self.site.normalize_url(response.urljoin(canonical_link.strip()))
+            if canonical_url != page_url and self.site.is_valid_internal_url(canonical_url):
+                self.write_to_aliases(page_url, canonical_url)
+                yield from self.visit(canonical_url)
+                return
+
+        content_hash = hashlib.sha1(response.body).hexdigest()
+        first_url = self.content_hashes.get(content_hash)
+        if first_url is None:
+            self.write_to_content_hashes(content_hash, page_url)
+        elif first_url != page_url:
+            self.write_to_aliases(page_url, first_url)
+
+    def parse_robots(self, response):
+        for sitemap_url in sitemap_urls_from_robots(response.body, base_url=response.url):
+            yield Request(sitemap_url, callback=self.parse_sitemap)
+
+    def parse_sitemap(self, response):
+        """Parses a sitemap or sitemap index, gzipped or not. Sitemap indexes queue their
+        child sitemaps; sitemap urls seed the frontier directly.
+        https://www.sitemaps.org/protocol.html
+        """
+        body = gunzip(response.body) if gzip_magic_number(response) else response.body
+
+        try:
+            sitemap = Sitemap(body)
+        except (XMLSyntaxError, StopIteration):
+            self.logger.warning('Unable to parse sitemap: %s', response.url)
+            return
+
+        for entry in sitemap:
+            if sitemap.type == 'sitemapindex':
+                yield Request(entry['loc'], callback=self.parse_sitemap)
+            elif sitemap.type == 'urlset':
+                yield from self.visit(entry['loc'])
+
+    def visit(self, link):
+        """Adds link to sitemap if it is a new internal url and, when following links,
+        queues it to be parsed.
+        """
+        yield from self.visit_url(self.site.normalize_url(link))
+
+    def visit_url(self, url):
+        if self.site.auth_session and self.site.auth_session.skips(url):
+            # The login page, and log out links that would end the session.
+            return
+        if self.site.is_valid_internal_url(url) and url not in self.unique_links:
+            self.write_to_sitemap(url)
+            if self.site.progress:
+                self.site.progress.discovered += 1
+            if self.site.follows_links:
+                yield Request(url, callback=self.parse, meta=self.auth_meta())
+            elif self.site.static_only:
+                yield Request(url, callback=self.parse_page, meta=self.auth_meta())
+
+    def response_received(self, response, request, spider):
+        """Signal handler: feeds crawl metrics for every response, including errors. Pages
+        unchanged since the last crawl arrive from the HTTP cache, flagged 'cached'.
+        """
+        self.site.profiler.record_response(request.meta.get('download_latency'),
+                                           len(response.body), 'cached' in response.flags)
+
+    def closed(self, reason):
+        """Called by scrapy when the spider closes. Reason is 'finished' unless the crawl
+        was cut short (e.g. 'shutdown' on Ctrl-C).
+        """
+        self.site.crawl_finished = reason in self.COMPLETE_REASONS
+        # Only the time budget sets a crawl timeout. The audit goes ahead with the pages found.
+        self.site.crawl_truncated = reason == 'closespider_timeout'
+        self.link_graph.close()
+
+    def read_sitemap_links(self):
+        """Links already written to the sitemap by an interrupted crawl."""
+        links = set()
+
+        if not os.path.exists(self.site.sitemap_path):
+            return links
+
+        with open(self.site.sitemap_path, 'r') as sitemap_file:
+            for line in sitemap_file:
+                link = line.strip()
+                if link and not link.startswith('#'):
+                    links.add(link)
+
+        return links
+
+    def read_content_hashes(self):
+        """Content hashes of the pages crawled by an interrupted crawl."""
+        content_hashes = {}
+
+        if not os.path.exists(self.site.content_hashes_path):
+            return content_hashes
+
+        with open(self.site.content_hashes_path, 'r') as hashes_file:
+            for line in hashes_file:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) == 2:
+                    content_hashes.setdefault(fields[0], fields[1])
+
+        return content_hashes
+
+    def write_to_content_hashes(self, content_hash, url):
+        self.content_hashes[content_hash] = url
+        with open(self.site.content_hashes_path, 'a') as hashes_file:
+            hashes_file.write("{}\t{}\n".format(content_hash, url))
+        return True
 
+    def write_to_aliases(self, alias, canonical_url):
+        with open(self.site.aliases_path, 'a') as aliases_file:
+            aliases_file.write("{}\t{}\n".format(alias, canonical_url))
         return True
 
     def write_to_sitemap(self, url):
-        self.unique_links.append(url)
+        self.unique_links.add(url)
         with open(self.site.sitemap_path, 'a') as sitemap_file:
             sitemap_file.write("{}\n".format(url))
         return True
@@ -1,9 +1,12 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import os
 import shutil
+import threading
 from unittest import TestCase
-from pytest_socket import disable_socket
+from pytest_socket import disable_socket, enable_socket, socket_allow_hosts
 
 from config.app import PROJECT_ROOT
+from spiders.crawler_service import CrawlerService
 
 #
 # Module Constants and Vars
@@ -12,6 +15,9 @@ TEST_PATH = os.path.join(PROJECT_ROOT, 'tests')
 TEST_FIXTURES_PATH = os.path.join(TEST_PATH, 'fixtures')
 TEST_FIXTURE_FILES_PATH = os.path.join(TEST_FIXTURES_PATH, 'files')
 
+# Twisted reactors cannot be restarted, so crawls share one for the whole test run.
+CRAWLER_SERVICE = None
+
 
 #
 # Module Functions
@@ -26,6 +32,73 @@ def delete_directory(dir_path):
     return dir_path
 
 
+def allow_local_sockets():
+    # Crawl tests talk to a FixtureServer on this machine, and nothing else.
+    enable_socket()
+    socket_allow_hosts(['127.0.0.1', '::1', 'localhost'], allow_unix_socket=True)
+
+
+def crawler_service():
+    global CRAWLER_SERVICE
+    if CRAWLER_SERVICE is None:
+        allow_local_sockets()
+        CRAWLER_SERVICE = CrawlerService().start()
+    return CRAWLER_SERVICE
+
+
+#
+# Fixture Site Server
+#
+class FixtureServer(object):
+    """Serves pages, a dict of path -> html, or path -> function(request handler) returning
+    (status, headers, html), from a daemon thread on a free localhost port.
+    """
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+        allow_local_sockets()
+        self.server = ThreadingHTTPServer(('localhost', 0), FixtureRequestHandler)
+        self.server.fixture_server = self
+
+    @property
+    def base_url(self):
+        return 'http://localhost:{}'.format(self.server.server_address[1])
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FixtureRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        fixture_server = self.server.fixture_server
+        fixture_server.requests.append(self.path)
+        page = fixture_server.pages.get(self.path)
+
+        if page is None:
+            status, headers, html = 404, {}, 'Not found'
+        elif callable(page):
+            status, headers, html = page(self)
+        else:
+            status, headers, html = 200, {}, page
+
+        body = html.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
 #
 # Project Test Class with Custom Asserts
 #
@@ -0,0 +1,158 @@
+from datetime import timedelta
+import os
+from os.path import join as pathjoin
+from unittest.mock import MagicMock, patch
+
+from config.app import AUDITS_DIR
+from models.audit_plan import AuditPlan
+from models.page import Page
+from models.site import Site
+from spiders.sitemap_spider import SitemapSpider
+from tests import helper
+
+
+class AuditPlanTest(helper.AppTestCase):
+    #
+    # Fixtures
+    #
+    def setUp(self):
+        super(AuditPlanTest, self).setUp()
+        self.test_dir = pathjoin(AUDITS_DIR, "sub-domain-com")
+        helper.delete_directory(self.test_dir)
+        self.site = Site.from_domain_or_url('http://sub.domain.com')
+        self.link_stats = {
+            'http://sub.domain.com': [0, 0],
+            'http://sub.domain.com/blog/a/1': [2, 1],
+            'http://sub.domain.com/blog/a/2': [1, 40],
+            'http://sub.domain.com/blog/b/1': [2, 3],
+            'http://sub.domain.com/docs/api/1': [1, 90],
+            'http://sub.domain.com/docs/api/2': [3, 2]}
+        self.site.read_link_stats = MagicMock(return_value=self.link_stats)
+        self.urls = ['http://sub.domain.com',
+                     'http://sub.domain.com/blog/a/1',
+                     'http://sub.domain.com/blog/a/2',
+                     'http://sub.domain.com/blog/b/1',
+                     'http://sub.domain.com/docs/api/1',
+                     'http://sub.domain.com/docs/api/2']
+
+    def tearDown(self):
+        self.site.close()
+        helper.delete_directory(self.test_dir)
+
+    #
+    # Tests
+    #
+    def test_expects_most_important_page_of_each_template_first(self):
+        # Arrange
+        plan = AuditPlan(self.site, iter(self.urls), prioritize=True)
+
+        # Act
+        ranked_urls = list(plan)
+
+        # Assert
+        self.assertEqual(['http://sub.domain.com/docs/api/1',
+                          'http://sub.domain.com/blog/a/2',
+                          'http://sub.domain.com/blog/b/1',
+                          'http://sub.domain.com',
+                          'http://sub.domain.com/docs/api/2',
+                          'http://sub.domain.com/blog/a/1'], ranked_urls)
+        self.assertEqual(6, plan.pages_total)
+        self.assertEqual(4, plan.templates_total)
+
+    def test_expects_static_check_issues_to_raise_priority(self):
+        # Arrange
+        self.site.static_checks.scores = MagicMock(return_value={
+            'http://sub.domain.com/blog/a/1': 100})
+        plan = AuditPlan(self.site, iter(self.urls), prioritize=True)
+
+        # Act
+        ranked_urls = list(plan)
+
+        # Assert
+        self.assertEqual(['http://sub.domain.com/blog/a/1',
+                          'http://sub.domain.com/docs/api/1',
+                          'http://sub.domain.com/blog/b/1',
+                          'http://sub.domain.com',
+                          'http://sub.domain.com/blog/a/2',
+                          'http://sub.domain.com/docs/api/2'], ranked_urls)
+
+    def test_expects_sitemap_order_when_not_prioritized(self):
+        # Arrange
+        plan = AuditPlan(self.site, iter(self.urls))
+
+        # Act
+        urls = list(plan)
+
+        # Assert
+        self.assertEqual(self.urls, urls)
+        self.assertIsNone(plan.pages_total)
+        self.assertFalse(plan.budget_exhausted)
+
+    def test_expects_coverage_when_time_budget_runs_out(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com', prioritize=True, time_budget=30)
+        site.started_at -= timedelta(minutes=29)
+        urls = list(self.urls)
+        audited = []
+
+        def axe_audit(page, audit_type):
+            # The budget runs out while the second page is being audited.
+            audited.append(page.url)
+            if len(audited) == 2:
+                site.started_at -= timedelta(minutes=1)
+            page.audit = MagicMock(violations=[])
+            return page
+
+        # Act
+        with patch.object(Site, 'extract_site_page_urls_from_sitemap', return_value=urls), \
+                patch.object(Site, 'read_link_stats', return_value=self.link_stats), \
+                patch.object(Page, 'axe_audit', autospec=True, side_effect=axe_audit):
+            site_audit = site.audit()
+        summary = site_audit.summary
+
+        # Assert
+        self.assertEqual(['http://sub.domain.com/docs/api/1', 'http://sub.domain.com/blog/a/2'],
+                         audited)
+        self.assertTrue(site.audit_plan.budget_exhausted)
+        self.assertEqual({'budget_exhausted': True, 'crawl_finished': True, 'pages_audited': 2,
+                          'pages_total': 6, 'templates_audited': 2, 'templates_total': 4},
+                         site.audit_plan.coverage())
+        self.assertIn('Audited 2 of 6 pages (33%), covering 2 of 4 templates (50%)', summary)
+
+    def test_expects_crawl_to_stop_within_time_budget(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com', time_budget=2.5)
+
+        # Act
+        settings = site.crawl_settings
+
+        # Assert
+        self.assertEqual(150, settings['CLOSESPIDER_TIMEOUT'])
+        site.close()
+
+    def test_expects_crawl_cut_short_by_time_budget_to_be_partial(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com', time_budget=1)
+        spider = SitemapSpider(site)
+
+        def crawl():
+            # The budget runs out during the crawl, after two pages are found.
+            spider.write_to_sitemap('http://sub.domain.com/blog/a/1')
+            spider.write_to_sitemap('http://sub.domain.com/docs/api/1')
+            site.started_at -= timedelta(minutes=1)
+            spider.closed('closespider_timeout')
+            return site
+
+        # Act
+        with patch.object(Site, 'map_pages_to_sitemap_file_with_spiders', side_effect=crawl):
+            site_audit = site.audit()
+        summary = site_audit.summary
+
+        # Assert
+        self.assertFalse(site.crawl_finished)
+        self.assertFalse(os.path.exists(site.crawl_finished_path))
+        self.assertEqual({'budget_exhausted': True, 'crawl_finished': False, 'pages_audited': 0,
+                          'pages_total': 2, 'templates_audited': 0, 'templates_total': 2},
+                         site.audit_plan.coverage())
+        self.assertIn('ran out before the crawl finished. Audited 0 of the 2 pages found so far',
+                      summary)
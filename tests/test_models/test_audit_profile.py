@@ -0,0 +1,148 @@
+import os
+import tempfile
+from os.path import join as pathjoin
+from unittest.mock import MagicMock, patch
+
+from config.app import AUDITS_DIR
+from models.audit_profile import AuditProfile, InvalidAuditProfile
+from models.browser_pool import BrowserPool
+from models.page import Page
+from models.site import Site
+from spiders.sitemap_spider import SitemapSpider
+from tests import helper
+
+PROFILE_YAML = """
+workers: 3
+browser:
+  page_load_timeout: 20
+  block_resources: ["*.png"]
+axe:
+  tags: [wcag2a]
+  disable_rules: [region]
+crawl:
+  user_agent: Profile Spider
+  max_pages: 50
+output:
+  format: parquet
+  dedupe: true
+"""
+
+
+class AuditProfileTest(helper.AppTestCase):
+    #
+    # Fixtures
+    #
+    def setUp(self):
+        super(AuditProfileTest, self).setUp()
+        self.test_dir = pathjoin(AUDITS_DIR, "sub-domain-com")
+        helper.delete_directory(self.test_dir)
+        self.profile_dir = tempfile.mkdtemp()
+        self.profile_path = os.path.join(self.profile_dir, 'tuned.yml')
+        with open(self.profile_path, 'w') as f:
+            f.write(PROFILE_YAML)
+
+    def tearDown(self):
+        helper.delete_directory(self.test_dir)
+        helper.delete_directory(self.profile_dir)
+
+    #
+    # Tests
+    #
+    def test_expects_profile_merged_over_defaults(self):
+        # Act
+        profile = AuditProfile.from_file(self.profile_path)
+
+        # Assert
+        self.assertEqual('tuned', profile.name)
+        self.assertEqual(3, profile.workers)
+        self.assertEqual(3, profile.pool_size)
+        self.assertEqual(['--headless'], profile.browser['chrome_options'])
+        self.assertEqual({'runOnly': {'type': 'tag', 'values': ['wcag2a']},
+                          'rules': {'region': {'enabled': False}}}, profile.axe_options)
+        self.assertEqual({'CLOSESPIDER_PAGECOUNT': 50}, profile.crawl_settings)
+
+    def test_expects_default_profile_to_run_all_rules(self):
+        # Act
+        profile = AuditProfile()
+
+        # Assert
+        self.assertEqual(1, profile.workers)
+        self.assertIsNone(profile.axe_options)
+        self.assertEqual('Ann Arbor Spider', profile.user_agent)
+
+    def test_expects_error_if_invalid_setting(self):
+        # Assert/Act
+        with self.assertRaises(InvalidAuditProfile):
+            AuditProfile({'crawl': {'max_pagez': 10}})
+        with self.assertRaises(InvalidAuditProfile):
+            AuditProfile({'workers': 0})
+        with self.assertRaises(InvalidAuditProfile):
+            AuditProfile({'browser': ['--headless']})
+        with self.assertRaises(InvalidAuditProfile):
+            AuditProfile({'browser': {'driver': 'firefox'}})
+        with self.assertRaises(InvalidAuditProfile):
+            AuditProfile({'browser': {'driver': 'replay'}})
+        with self.assertRaises(InvalidAuditProfile):
+            AuditProfile({'auth': {'login_url': 'http://sub.domain.com/login'}})
+
+    def test_expects_site_to_use_profile(self):
+        # Arrange
+        profile = AuditProfile.from_file(self.profile_path)
+
+        # Act
+        site = Site.from_domain_or_url('http://sub.domain.com', profile=profile)
+        overridden = Site.from_domain_or_url('http://sub.domain.com', profile=profile,
+                                             violations_format='csv')
+
+        # Assert
+        self.assertEqual('Profile Spider', site.crawl_settings['USER_AGENT'])
+        self.assertEqual(50, site.crawl_settings['CLOSESPIDER_PAGECOUNT'])
+        self.assertEqual('parquet', site.violations_format)
+        self.assertTrue(site.dedupe)
+        self.assertEqual(3, site.browser_pool.size)
+        self.assertEqual('csv', overridden.violations_format)
+
+    def test_expects_browser_pool_to_configure_chrome(self):
+        # Arrange
+        pool = BrowserPool.from_profile(AuditProfile.from_file(self.profile_path))
+
+        # Act
+        with patch('models.browser_pool.webdriver.Chrome') as chrome:
+            driver = pool.new_driver()
+
+        # Assert
+        self.assertEqual(['--headless'], chrome.call_args[1]['options'].arguments)
+        driver.set_page_load_timeout.assert_called_once_with(20)
+        driver.set_script_timeout.assert_not_called()
+        driver.execute_cdp_cmd.assert_called_with('Network.setBlockedURLs', {'urls': ['*.png']})
+
+    def test_expects_workers_to_audit_pages_in_sitemap_order(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com', profile=AuditProfile({
+            'workers': 3}))
+        urls = ['http://sub.domain.com/{}'.format(n) for n in range(10)]
+
+        def axe_audit(page, audit_type):
+            page.audit = MagicMock(violations=[])
+            return page
+
+        # Act
+        with patch.object(Site, 'extract_site_page_urls_from_sitemap', return_value=urls), \
+                patch.object(Page, 'axe_audit', autospec=True, side_effect=axe_audit):
+            site.audit()
+
+        # Assert
+        self.assertEqual(urls, [page.url for page in site.pages])
+
+    def test_expects_crawl_limit_to_finish_crawl(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com')
+        spider = SitemapSpider(site)
+
+        # Act
+        spider.closed('closespider_pagecount')
+
+        # Assert
+        self.assertTrue(site.crawl_finished)
+        spider.closed('closespider_errorcount')
+        self.assertFalse(site.crawl_finished)
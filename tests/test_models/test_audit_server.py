@@ -0,0 +1,162 @@
+import json
+from os.path import join as pathjoin
+import threading
+from unittest.mock import patch
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+
+from config.app import AUDITS_DIR
+from models.audit_server import AuditServer, InvalidJob
+from models.axe_audit import AxePageAudit, InvalidAuditType
+from models.site import Site
+from tests import helper
+
+
+class AuditServerTest(helper.AppTestCase):
+    #
+    # Fixtures
+    #
+    def setUp(self):
+        super(AuditServerTest, self).setUp()
+        test_dir = pathjoin(AUDITS_DIR, "sub-domain-com")
+        helper.delete_directory(test_dir)
+
+    def tearDown(self):
+        test_dir = pathjoin(AUDITS_DIR, "sub-domain-com")
+        helper.delete_directory(test_dir)
+        helper.delete_directory(pathjoin(AUDITS_DIR, "localhost"))
+
+    #
+    # Tests
+    #
+    def test_expects_page_audit_job_to_return_json_data(self):
+        # Arrange
+        server = AuditServer()
+        test_axe_report_path = helper.fixture_file_path('httpbin-org-page-all-violations.json')
+        job = {'url': 'http://sub.domain.com/path'}
+
+        # Act
+        with patch.object(AxePageAudit, 'generate_report') as mocked_method:
+            mocked_method.return_value = test_axe_report_path
+            result = server.run_job(job)
+
+        # Assert
+        self.assertEqual('http://sub.domain.com/path', result['url'])
+        self.assertEqual(5, result['errors'])
+        self.assertEqual(5, len(result['violations']))
+        self.assertEqual('http://sub.domain.com/path', result['violations'][0]['page_url'])
+
+    def test_expects_shared_browser_pool_to_stay_open(self):
+        # Arrange
+        server = AuditServer()
+        test_axe_report_path = helper.fixture_file_path('httpbin-org-page-all-violations.json')
+
+        # Act
+        with patch.object(AxePageAudit, 'generate_report') as mocked_method, \
+                patch.object(server.browser_pool, 'close') as mocked_close:
+            mocked_method.return_value = test_axe_report_path
+            server.run_job({'url': 'http://sub.domain.com'})
+
+        # Assert
+        mocked_close.assert_not_called()
+
+    def test_expects_crawl_jobs_for_same_site_to_run_one_at_a_time(self):
+        # Arrange
+        fixture_server = helper.FixtureServer({
+            '/': '<a href="/a">A</a><a href="/b">B</a>',
+            '/a': '<p>A</p><a href="/">Home</a>',
+            '/b': '<p>B</p><a href="/a">A</a>'
+        }).start()
+        self.addCleanup(fixture_server.stop)
+        server = AuditServer()
+        server.crawler_service = helper.crawler_service()
+        test_axe_report_path = helper.fixture_file_path('httpbin-org-page-all-violations.json')
+        job = {'url': fixture_server.base_url, 'crawl': True}
+        results = []
+        running = []
+        overlaps = []
+        site_audit = Site.audit
+
+        def audit(site):
+            running.append(site)
+            overlaps.append(len(running) > 1)
+            try:
+                return site_audit(site)
+            finally:
+                running.remove(site)
+
+        def run_job():
+            results.append(server.run_job(job))
+
+        # Act
+        with patch.object(AxePageAudit, 'generate_report') as mocked_method, \
+                patch.object(Site, 'audit', autospec=True, side_effect=audit):
+            mocked_method.return_value = test_axe_report_path
+            threads = [threading.Thread(target=run_job) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(60)
+
+        # Assert
+        self.assertEqual([False, False], overlaps)
+        self.assertEqual(2, len(results))
+        for result in results:
+            self.assertEqual(['{}/a'.format(fixture_server.base_url),
+                              '{}/b'.format(fixture_server.base_url)],
+                             [page['url'] for page in result['pages']])
+            self.assertEqual(10, result['violations'])
+
+    def test_expects_crawl_job_over_http(self):
+        # Arrange
+        fixture_server = helper.FixtureServer({'/': '<a href="/a">A</a>', '/a': '<p>A</p>'})
+        fixture_server.start()
+        self.addCleanup(fixture_server.stop)
+        server = AuditServer(port=0)
+        server.crawler_service = helper.crawler_service()
+        test_axe_report_path = helper.fixture_file_path('httpbin-org-page-all-violations.json')
+
+        def post(path, job):
+            request = Request(server.address + path, data=json.dumps(job).encode('utf-8'))
+            try:
+                with urlopen(request, timeout=60) as response:
+                    return response.status, json.load(response)
+            except HTTPError as e:
+                return e.code, json.load(e)
+
+        # Act
+        with patch.object(server.crawler_service, 'start'), \
+                patch.object(server.crawler_service, 'stop'), \
+                patch.object(server.browser_pool, 'warm_up'), \
+                patch.object(AxePageAudit, 'generate_report') as mocked_method:
+            mocked_method.return_value = test_axe_report_path
+            server.start()
+            serve_thread = threading.Thread(target=server.serve_forever, daemon=True)
+            serve_thread.start()
+            with urlopen(server.address + '/health', timeout=10) as response:
+                health = json.load(response)
+            crawl_status, crawl_result = post('/audit', {'url': fixture_server.base_url,
+                                                         'crawl': True})
+            invalid_status, invalid_result = post('/audit', {'url': fixture_server.base_url,
+                                                             'discover': 'robots'})
+            server.http_server.shutdown()
+            serve_thread.join(10)
+
+        # Assert
+        self.assertEqual('ok', health['status'])
+        self.assertEqual(200, crawl_status)
+        self.assertEqual(['{}/a'.format(fixture_server.base_url)],
+                         [page['url'] for page in crawl_result['pages']])
+        self.assertEqual(400, invalid_status)
+        self.assertIn('Invalid discovery mode', invalid_result['error'])
+
+    def test_expects_error_if_invalid_job(self):
+        # Arrange
+        server = AuditServer()
+
+        # Assert/Act
+        with self.assertRaises(InvalidJob):
+            server.run_job({})
+
+        with self.assertRaises(InvalidAuditType):
+            server.run_job({'url': 'http://sub.domain.com', 'audit_type': 'foo'})
@@ -0,0 +1,153 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from os.path import join as pathjoin
+from unittest.mock import patch
+
+from config.app import AUDITS_DIR
+from models.audit_profile import AuditProfile
+from models.audit_worker import AuditCoordinator, AuditWorker
+from models.auth_session import AuthSession
+from models.axe_audit import AxePageAudit, AxeSiteAudit
+from models.browser_pool import BrowserPool
+from models.site import CrawlInterrupted, Site
+from models.work_queue import SQLiteWorkQueue
+from tests import helper
+
+
+class AuditWorkerTest(helper.AppTestCase):
+    #
+    # Fixtures
+    #
+    def setUp(self):
+        super(AuditWorkerTest, self).setUp()
+        self.test_dir = tempfile.mkdtemp()
+        self.queue = SQLiteWorkQueue(os.path.join(self.test_dir, 'queue.db'))
+        helper.delete_directory(pathjoin(AUDITS_DIR, "sub-domain-com"))
+
+    def tearDown(self):
+        helper.delete_directory(self.test_dir)
+        helper.delete_directory(pathjoin(AUDITS_DIR, "sub-domain-com"))
+
+    #
+    # Tests
+    #
+    def test_expects_worker_to_push_results_for_coordinator(self):
+        # Arrange
+        test_axe_report_path = helper.fixture_file_path('httpbin-org-page-all-violations.json')
+        urls = ['http://sub.domain.com/a', 'http://sub.domain.com/b']
+        site = Site.from_domain_or_url('http://sub.domain.com', audit_type='code')
+        coordinator = AuditCoordinator(site, self.queue)
+        worker = AuditWorker(self.queue, worker_id='worker-1', poll_seconds=0)
+
+        # Act
+        with patch.object(Site, 'extract_site_page_urls_from_sitemap', return_value=urls):
+            enqueued = coordinator.enqueue()
+        with patch.object(AxePageAudit, 'generate_report') as mocked_method:
+            mocked_method.return_value = test_axe_report_path
+            audited = worker.run()
+        audit = coordinator.collect()
+
+        # Assert
+        self.assertEqual(2, enqueued)
+        self.assertEqual(2, audited)
+        self.assertIsInstance(audit, AxeSiteAudit)
+        self.assertEqual(urls, [page.url for page in site.pages])
+        self.assertEqual(6, len(audit.violations))
+        self.assertTrue(all(v.type == 'code' for v in audit.violations))
+        self.assertEqual('http://sub.domain.com/a', audit.violations[0].page.url)
+
+    def test_expects_rerun_to_collect_only_its_own_results(self):
+        # Arrange
+        test_axe_report_path = helper.fixture_file_path('httpbin-org-page-all-violations.json')
+        first_site = Site.from_domain_or_url('http://sub.domain.com')
+        second_site = Site.from_domain_or_url('http://sub.domain.com')
+        second_site.started_at += timedelta(seconds=1)
+        worker = AuditWorker(self.queue, worker_id='worker-1', poll_seconds=0)
+
+        # Act
+        with patch.object(AxePageAudit, 'generate_report', return_value=test_axe_report_path):
+            with patch.object(Site, 'extract_site_page_urls_from_sitemap',
+                              return_value=['http://sub.domain.com/a']):
+                AuditCoordinator(first_site, self.queue).enqueue()
+            worker.run()
+            with patch.object(Site, 'extract_site_page_urls_from_sitemap',
+                              return_value=['http://sub.domain.com/b']):
+                enqueued = AuditCoordinator(second_site, self.queue).enqueue()
+            pending = self.queue.counts()['pending']
+            worker.run()
+        AuditCoordinator(second_site, self.queue).collect()
+
+        # Assert
+        self.assertEqual(1, enqueued)
+        self.assertEqual(1, pending)
+        self.assertEqual(['http://sub.domain.com/b'], [page.url for page in second_site.pages])
+
+    def test_expects_interrupted_crawl_not_to_be_queued(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com')
+        coordinator = AuditCoordinator(site, self.queue)
+
+        def interrupted_crawl():
+            site.crawl_finished = False
+            return iter(['http://sub.domain.com/a'])
+
+        # Act
+        with patch.object(Site, 'extract_site_page_urls_from_sitemap',
+                          side_effect=interrupted_crawl):
+            with self.assertRaises(CrawlInterrupted):
+                coordinator.enqueue()
+
+        # Assert
+        self.assertEqual(0, sum(self.queue.counts().values()))
+        self.assertIsNone(self.queue.get_meta('run_id'))
+
+    def test_expects_worker_to_report_failures(self):
+        # Arrange
+        self.queue.enqueue(['http://sub.domain.com/a'])
+        worker = AuditWorker(self.queue, worker_id='worker-1')
+
+        # Act
+        with patch.object(AxePageAudit, 'generate_report', side_effect=RuntimeError('boom')):
+            task = worker.run_once()
+
+        # Assert
+        self.assertEqual('http://sub.domain.com/a', task.url)
+        self.assertEqual(1, self.queue.counts()['pending'])
+        self.assertIn('boom', self.queue.db.execute('SELECT error FROM tasks').fetchone()[0])
+
+    def test_expects_worker_to_log_in_once_for_every_page(self):
+        # Arrange
+        test_axe_report_path = helper.fixture_file_path('httpbin-org-page-all-violations.json')
+        urls = ['http://sub.domain.com/{}'.format(n) for n in range(3)]
+        self.queue.enqueue(urls)
+        profile = AuditProfile({'auth': {'login_url': 'http://sub.domain.com/login',
+                                         'username': 'auditor'}})
+        pool = BrowserPool(driver='replay', recordings={})
+        worker = AuditWorker(self.queue, worker_id='worker-1', poll_seconds=0, profile=profile,
+                             browser_pool=pool)
+
+        def log_in():
+            worker.auth_session.cookies = []
+            worker.auth_session.generation += 1
+
+        # Act
+        with patch.object(AuthSession, 'log_in', side_effect=log_in) as mocked_log_in, \
+                patch.object(AxePageAudit, 'read_axe_source', return_value=''), \
+                patch.object(AxePageAudit, 'run_trimmed_axe') as mocked_run:
+            with open(test_axe_report_path, 'r') as f:
+                mocked_run.return_value = json.load(f)
+            sites = []
+            with patch.object(Site, 'close', autospec=True,
+                              side_effect=lambda site: sites.append(site)) as mocked_close:
+                audited = worker.run()
+
+        # Assert
+        self.assertEqual(3, audited)
+        self.assertEqual(3, self.queue.counts()['done'])
+        self.assertEqual(1, mocked_log_in.call_count)
+        self.assertEqual(1, len(sites))
+        self.assertIs(worker.auth_session, sites[0].auth_session)
+        mocked_close.assert_called_once()
+        self.assertEqual({}, worker.sites)
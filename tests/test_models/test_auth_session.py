@@ -0,0 +1,124 @@
+from contextlib import contextmanager
+import os
+import time
+from unittest.mock import MagicMock, patch
+
+from models.audit_profile import AuditProfile
+from models.auth_session import AuthSession, LoginFailed
+from tests import helper
+
+
+class AuthSessionTest(helper.AppTestCase):
+    #
+    # Fixtures
+    #
+    def setUp(self):
+        super(AuthSessionTest, self).setUp()
+        self.login_url = 'http://sub.domain.com/login'
+        self.home = 'http://sub.domain.com/account'
+        self.settings = AuditProfile({'auth': {'login_url': self.login_url,
+                                               'username': 'auditor'}}).settings['auth']
+        self.cookie_expiry = None
+        self.login_driver = self.fake_login_driver()
+        self.login_pool = MagicMock()
+        self.login_pool.checkout = self.checkout
+
+        password_patcher = patch.dict(os.environ, {'ANN_ARBOR_PASSWORD': 'secret'})
+        password_patcher.start()
+        self.addCleanup(password_patcher.stop)
+
+    @contextmanager
+    def checkout(self):
+        yield self.login_driver
+
+    def fake_login_driver(self):
+        driver = MagicMock(current_url=self.login_url)
+
+        def submit():
+            driver.current_url = self.home
+
+        def get_cookies():
+            return [{'name': 'session', 'value': 'abc{}'.format(driver.get.call_count),
+                     'domain': 'sub.domain.com', 'path': '/', 'httpOnly': True,
+                     'expiry': self.cookie_expiry}]
+
+        driver.find_element.return_value.click.side_effect = submit
+        driver.get_cookies.side_effect = get_cookies
+        driver.execute_script.return_value = {'token': 'xyz'}
+        return driver
+
+    def fake_page_driver(self, landing_urls):
+        """Driver landing on each of landing_urls in turn, e.g. the login page first."""
+        driver = MagicMock(current_url=None)
+        driver.execute_cdp_cmd.return_value = {'identifier': '1'}
+        landing_urls = iter(landing_urls)
+
+        def get(url):
+            driver.current_url = next(landing_urls)
+
+        driver.get.side_effect = get
+        return driver
+
+    #
+    # Tests
+    #
+    def test_expects_one_login_shared_by_every_driver(self):
+        # Arrange
+        auth_session = AuthSession(self.settings, self.login_pool)
+        drivers = [self.fake_page_driver([self.home] * 2) for _ in range(2)]
+
+        # Act
+        for driver in drivers * 2:
+            auth_session.load(driver, self.home)
+
+        # Assert
+        self.assertEqual(1, auth_session.generation)
+        self.login_driver.get.assert_called_once_with(self.login_url)
+        self.login_driver.find_element.return_value.send_keys.assert_any_call('secret')
+        for driver in drivers:
+            cdp_commands = [c[0][0] for c in driver.execute_cdp_cmd.call_args_list]
+            self.assertEqual(['Network.setCookies', 'Page.addScriptToEvaluateOnNewDocument'],
+                             cdp_commands)
+            cookies = driver.execute_cdp_cmd.call_args_list[0][0][1]['cookies']
+            self.assertEqual([{'name': 'session', 'value': 'abc1', 'domain': 'sub.domain.com',
+                               'path': '/', 'httpOnly': True}], cookies)
+            source = driver.execute_cdp_cmd.call_args_list[1][0][1]['source']
+            self.assertIn('"http://sub.domain.com", {"token": "xyz"}', source)
+        self.assertEqual([{'name': 'session', 'value': 'abc1', 'domain': 'sub.domain.com',
+                           'path': '/'}], auth_session.scrapy_cookies())
+
+    def test_expects_login_again_when_page_redirects_to_login(self):
+        # Arrange
+        auth_session = AuthSession(self.settings, self.login_pool)
+        driver = self.fake_page_driver([self.login_url, self.home])
+
+        # Act
+        auth_session.load(driver, self.home)
+
+        # Assert
+        self.assertEqual(2, auth_session.generation)
+        self.assertEqual(self.home, driver.current_url)
+        self.assertEqual('abc2', auth_session.cookies[0]['value'])
+        cdp_commands = [c[0][0] for c in driver.execute_cdp_cmd.call_args_list]
+        self.assertIn('Page.removeScriptToEvaluateOnNewDocument', cdp_commands)
+
+        # Stale logins are not refreshed twice.
+        self.assertEqual(2, auth_session.refresh(1))
+        with self.assertRaises(LoginFailed):
+            auth_session.load(self.fake_page_driver([self.login_url] * 2), self.home)
+
+    def test_expects_login_again_when_cookies_expire(self):
+        # Arrange
+        auth_session = AuthSession(self.settings, self.login_pool)
+        self.cookie_expiry = int(time.time()) + 30
+
+        # Act
+        generations = [auth_session.current(), auth_session.current()]
+        self.cookie_expiry = int(time.time()) + 3600
+        generations += [auth_session.current(), auth_session.current()]
+
+        # Assert
+        self.assertEqual([1, 2, 3, 3], generations)
+        self.assertTrue(auth_session.skips('http://sub.domain.com/users/sign-out'))
+        self.assertTrue(auth_session.skips(self.login_url + '/'))
+        self.assertFalse(auth_session.skips(self.home))
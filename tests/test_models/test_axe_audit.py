@@ -1,11 +1,16 @@
 import requests_mock
 import csv
+import json
 from os.path import join as pathjoin
+from unittest.mock import MagicMock, patch
 
 from config.app import AUDITS_DIR
-from models.axe_audit import InvalidAuditType, AxeAudit, AxePageAudit, AxeSiteAudit
+from models.axe_audit import (InvalidAuditType, AxeRunFailed, AxeAudit, AxePageAudit,
+                              AxeSiteAudit)
+from models.browser_pool import BrowserPool
 from models.page import Page
-from models.site import Site
+from models.replay_driver import ReplayDriver
+from models.site import InvalidViewport, Site
 from models.violation import Violation
 from tests import helper
 
@@ -147,3 +152,120 @@ class AxeAuditTest(helper.AppTestCase):
             self.assertEqual(row_count, 2)
             self.assertEqual(csv_rows[0][0], "page_url")
             self.assertEqual(csv_rows[1][8], violation.failure)
+
+    @requests_mock.mock()
+    def test_expects_violations_in_csv_for_each_page_alias(self, webmock):
+        # Arrange
+        test_dir = pathjoin(AUDITS_DIR, "sub-domain-com")
+        violations_csv_path = pathjoin(test_dir, "sub-domain-com.csv")
+        webmock.get(requests_mock.ANY, text='ok')
+        site = Site('sub.domain.com')
+        page = Page(site, 'https://sub.domain.com/foo')
+        page.aliases = ['https://sub.domain.com/foo?page=1']
+        audit = AxeSiteAudit(site)
+        violation = Violation(page=page, source='test', identifier='test-error',
+                              severity='low')
+        violation.help = "Error must be fixed"
+        violation.help_url = "https://help.com"
+        violation.html = "<p>Test</p>"
+        violation.failure = "This is incorrect"
+
+        # Act
+        audit.write_to_violation_csv(violations_csv_path, [violation])
+        with open(violations_csv_path, 'r') as file:
+            csv_rows = list(csv.reader(file))
+
+        # Assert
+        self.assertEqual(3, len(csv_rows))
+        self.assertEqual(page.url, csv_rows[1][0])
+        self.assertEqual(page.aliases[0], csv_rows[2][0])
+        self.assertEqual(csv_rows[1][1:], csv_rows[2][1:])
+
+    def test_expects_trimmed_axe_run_to_request_violations_and_incomplete_only(self):
+        # Arrange
+        site = Site('https://sub.domain.com')
+        audit = AxePageAudit(Page(site))
+        driver = MagicMock()
+        driver.execute_async_script.return_value = {'violations': [], 'incomplete': []}
+
+        # Act
+        results = audit.run_trimmed_axe(driver, {'runOnly': {'type': 'tag', 'values': ['wcag2a']}})
+
+        # Assert
+        script, options = driver.execute_async_script.call_args[0]
+        self.assertIn("options.resultTypes = ['violations', 'incomplete']", script)
+        self.assertEqual({'type': 'tag', 'values': ['wcag2a']}, options['runOnly'])
+        self.assertEqual({'violations': [], 'incomplete': []}, results)
+        self.assertFalse(site.full_results)
+
+    def test_expects_error_if_trimmed_axe_run_fails(self):
+        # Arrange
+        audit = AxePageAudit(Page(Site('https://sub.domain.com')))
+        driver = MagicMock()
+        driver.execute_async_script.return_value = {'error': 'axe is not defined'}
+
+        # Assert/Act
+        with self.assertRaises(AxeRunFailed):
+            audit.run_trimmed_axe(driver, None)
+
+    def test_expects_same_violations_from_trimmed_results(self):
+        # Arrange
+        audit = AxePageAudit(Page(Site('https://sub.domain.com')))
+        with open(helper.fixture_file_path('httpbin-org-page-all-violations.json'), 'r') as f:
+            full = json.load(f)
+        rule_fields = ['id', 'impact', 'tags', 'description', 'help', 'helpUrl']
+        node_fields = ['html', 'impact', 'target', 'failureSummary']
+
+        def trim(result):
+            trimmed = dict((field, result[field]) for field in rule_fields)
+            trimmed['nodes'] = [dict((field, node[field]) for field in node_fields)
+                                for node in result['nodes']]
+            return trimmed
+
+        trimmed = {'violations': [trim(r) for r in full['violations']],
+                   'incomplete': [trim(r) for r in full['incomplete']]}
+
+        # Act
+        audit.read_report = lambda _: full
+        full_violations = audit.parse_report(None)
+        audit.read_report = lambda _: trimmed
+        trimmed_violations = audit.parse_report(None)
+
+        # Assert
+        self.assertLess(len(json.dumps(trimmed)), len(json.dumps(full)) / 5)
+        self.assertEqual([v.to_dict() for v in full_violations],
+                         [v.to_dict() for v in trimmed_violations])
+
+    def test_expects_violations_for_each_viewport_from_one_page_load(self):
+        # Arrange
+        report_path = helper.fixture_file_path('httpbin-org-page-all-violations.json')
+        pool = BrowserPool(driver='replay', replay_from=report_path)
+        site = Site('https://sub.domain.com', viewports='desktop,mobile,375x667',
+                    browser_pool=pool)
+
+        # Act
+        with patch.object(ReplayDriver, 'get', autospec=True) as get, \
+                patch.object(ReplayDriver, 'execute_cdp_cmd', autospec=True) as cdp:
+            audit = AxeAudit.from_page(Page(site), None)
+        with open(audit.write_violations_to_csv(), 'r') as file:
+            csv_rows = list(csv.reader(file))
+
+        # Assert
+        get.assert_called_once()
+        self.assertEqual(['Emulation.setDeviceMetricsOverride'] * 3 +
+                         ['Emulation.clearDeviceMetricsOverride'],
+                         [call[0][1] for call in cdp.call_args_list])
+        self.assertEqual([(1280, False), (375, True), (375, False)],
+                         [(call[0][2]['width'], call[0][2]['mobile'])
+                          for call in cdp.call_args_list[:3]])
+        self.assertEqual(['desktop'] * 5 + ['mobile'] * 5 + ['375x667'] * 5,
+                         [violation.viewport for violation in audit.violations])
+        self.assertEqual('viewport', csv_rows[0][9])
+        self.assertEqual('375x667', csv_rows[-1][9])
+
+    def test_expects_error_if_invalid_viewport(self):
+        # Assert/Act
+        self.assertEqual([('mobile', 375, 667, True), ('1024x768', 1024, 768, False)],
+                         Site.parse_viewports(['mobile', '1024x768']))
+        with self.assertRaises(InvalidViewport):
+            Site.parse_viewports('desktop,phablet')
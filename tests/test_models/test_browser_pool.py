@@ -0,0 +1,101 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+from selenium.common.exceptions import WebDriverException
+
+from models.browser_pool import BrowserPool
+from tests import helper
+
+
+class BrowserPoolTest(helper.AppTestCase):
+    def test_expects_driver_to_be_reused(self):
+        # Arrange
+        pool = BrowserPool(size=2)
+
+        # Act
+        with patch.object(BrowserPool, 'new_driver', side_effect=lambda: MagicMock()) as launch:
+            with pool.checkout() as first_driver:
+                pass
+            with pool.checkout() as second_driver:
+                pass
+
+        # Assert
+        self.assertIs(first_driver, second_driver)
+        self.assertEqual(1, launch.call_count)
+        self.assertEqual(1, pool.launched)
+
+    def test_expects_concurrent_checkouts_up_to_size(self):
+        # Arrange
+        pool = BrowserPool(size=2)
+
+        # Act
+        with patch.object(BrowserPool, 'new_driver', side_effect=lambda: MagicMock()) as launch:
+            with pool.checkout() as first_driver:
+                with pool.checkout() as second_driver:
+                    pass
+
+        # Assert
+        self.assertIsNot(first_driver, second_driver)
+        self.assertEqual(2, launch.call_count)
+        self.assertEqual(2, pool.idle.qsize())
+
+    def test_expects_broken_driver_to_be_discarded(self):
+        # Arrange
+        pool = BrowserPool(size=1)
+        driver = MagicMock()
+
+        # Act
+        with patch.object(BrowserPool, 'new_driver', return_value=driver):
+            with self.assertRaises(WebDriverException):
+                with pool.checkout():
+                    raise WebDriverException('chrome not reachable')
+
+        # Assert
+        driver.quit.assert_called_once()
+        self.assertEqual(0, pool.launched)
+        self.assertEqual(0, pool.idle.qsize())
+
+    def test_expects_close_to_quit_idle_drivers(self):
+        # Arrange
+        pool = BrowserPool(size=2)
+
+        with patch.object(BrowserPool, 'new_driver', side_effect=lambda: MagicMock()):
+            pool.warm_up()
+        drivers = list(pool.idle.queue)
+
+        # Act
+        pool.close()
+
+        # Assert
+        self.assertEqual(2, len(drivers))
+        for driver in drivers:
+            driver.quit.assert_called_once()
+        self.assertEqual(0, pool.launched)
+
+    def test_expects_waiting_checkout_to_launch_after_discard(self):
+        # Arrange
+        pool = BrowserPool(size=1)
+        broken_driver = MagicMock()
+        waiting = threading.Event()
+        checked_out = []
+
+        def wait_for_driver():
+            waiting.set()
+            with pool.checkout() as driver:
+                checked_out.append(driver)
+
+        # Act
+        with patch.object(BrowserPool, 'new_driver', side_effect=[broken_driver, MagicMock()]):
+            with self.assertRaises(WebDriverException):
+                with pool.checkout():
+                    waiter = threading.Thread(target=wait_for_driver, daemon=True)
+                    waiter.start()
+                    waiting.wait()
+                    raise WebDriverException('chrome not reachable')
+            waiter.join(timeout=5)
+
+        # Assert
+        self.assertFalse(waiter.is_alive())
+        self.assertEqual(1, len(checked_out))
+        self.assertIsNot(broken_driver, checked_out[0])
+        self.assertEqual(1, pool.launched)
@@ -0,0 +1,116 @@
+import os
+from os.path import join as pathjoin
+
+from config.app import AUDITS_DIR
+from models.axe_audit import AxeAudit, AxePageAudit
+from models.html_report import HtmlReport
+from models.page import Page
+from models.site import Site
+from models.violation import Violation
+from tests import helper
+
+
+def add_page(site, url, identifiers):
+    page = Page(site, url)
+    page.audit = AxePageAudit(page)
+    for identifier in identifiers:
+        violation = Violation(page=page, source='axe', identifier=identifier,
+                              severity='serious')
+        violation.help = 'Images must have alternate text'
+        violation.help_url = 'https://dequeuniversity.com/rules/axe/3.1/image-alt'
+        violation.html = '<img src="logo.png">'
+        page.audit.violations.append(violation)
+    site.pages.append(page)
+    return page
+
+
+class HtmlReportTest(helper.AppTestCase):
+    #
+    # Fixtures
+    #
+    def setUp(self):
+        super(HtmlReportTest, self).setUp()
+        self.test_dir = pathjoin(AUDITS_DIR, "sub-domain-com")
+        helper.delete_directory(self.test_dir)
+        self.site = Site.from_domain_or_url('http://sub.domain.com')
+
+    def tearDown(self):
+        helper.delete_directory(self.test_dir)
+
+    #
+    # Tests
+    #
+    def test_expects_index_with_rules_and_templates(self):
+        # Arrange
+        add_page(self.site, 'http://sub.domain.com/blog/a', ['image-alt', 'image-alt', 'label'])
+        add_page(self.site, 'http://sub.domain.com/news/b', ['image-alt'])
+        audit = AxeAudit.from_site(self.site)
+
+        # Act
+        path = audit.write_html_report()
+        with open(path, 'r') as f:
+            index = f.read()
+
+        # Assert
+        expected_path = pathjoin(self.test_dir, 'sub-domain-com-site-all-report.html')
+        self.assertEqual(expected_path, path)
+        self.assertIn('sub-domain-com-site-all-report-files/rule-1-1.html">image-alt</a>', index)
+        self.assertIn('sub-domain-com-site-all-report-files/template-1-1.html">blog</a>', index)
+        self.assertLess(index.index('>image-alt<'), index.index('>label<'))
+        self.assertIn('100% <code>&lt;img src=&#34;logo.png&#34;&gt;</code>', index)
+
+    def test_expects_sections_paginated(self):
+        # Arrange
+        add_page(self.site, 'http://sub.domain.com/blog/a', ['image-alt'] * 5)
+        report = HtmlReport(AxeAudit.from_site(self.site), page_size=2)
+
+        # Act
+        report.write()
+
+        # Assert
+        rule_files = sorted(f for f in os.listdir(report.files_dir) if f.startswith('rule-'))
+        self.assertEqual(['rule-1-1.html', 'rule-1-2.html', 'rule-1-3.html'], rule_files)
+        with open(pathjoin(report.files_dir, 'rule-1-2.html'), 'r') as f:
+            middle_page = f.read()
+        self.assertIn('Page 2 of 3', middle_page)
+        self.assertIn('href="rule-1-1.html">Previous', middle_page)
+        self.assertIn('href="rule-1-3.html">Next', middle_page)
+        self.assertEqual(2, middle_page.count('&lt;img src=&#34;logo.png&#34;&gt;'))
+
+    def test_expects_sections_written_as_their_pages_fill(self):
+        # Arrange
+        add_page(self.site, 'http://sub.domain.com/blog/a', ['image-alt'] * 5 + ['label'])
+        add_page(self.site, 'http://sub.domain.com/news/b', ['image-alt'] * 3)
+        report = HtmlReport(AxeAudit.from_site(self.site), page_size=2)
+        rules, templates, totals = report.count_sections()
+
+        # Act
+        report.write_sections(rules, templates)
+        with open(pathjoin(report.files_dir, 'rule-1-3.html'), 'r') as f:
+            third_page = f.read()
+
+        # Assert
+        image_alt = rules['image-alt']
+        self.assertEqual((8, 2, 8), (image_alt.count, image_alt.pages, image_alt.written))
+        self.assertEqual({'violations': 9, 'errors': 9, 'warnings': 0, 'pages': 2}, totals)
+        self.assertEqual([], [section for section in list(rules.values()) +
+                              list(templates.values()) if section.pending])
+        self.assertIn('8 violations on 2 pages', third_page)
+        self.assertIn('Page 3 of 4', third_page)
+        self.assertIn('<td class="number">5</td>', third_page)
+        self.assertIn('http://sub.domain.com/blog/a', third_page)
+        self.assertIn('http://sub.domain.com/news/b', third_page)
+        self.assertPathExists(pathjoin(report.files_dir, 'template-2-2.html'))
+
+    def test_expects_page_audit_report(self):
+        # Arrange
+        page = add_page(self.site, 'http://sub.domain.com', ['color-contrast'])
+
+        # Act
+        path = page.audit.write_html_report()
+        with open(path, 'r') as f:
+            index = f.read()
+
+        # Assert
+        self.assertTrue(path.endswith('sub-domain-com-page-all-report.html'))
+        self.assertIn('(home page)', index)
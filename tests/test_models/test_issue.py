@@ -0,0 +1,100 @@
+import csv
+from os.path import join as pathjoin
+
+from config.app import AUDITS_DIR
+from models.axe_audit import AxeAudit, AxePageAudit
+from models.issue import Issue, Occurrence
+from models.page import Page
+from models.site import Site
+from models.violation import Violation
+from tests import helper
+
+NAV_HTML = '<nav class="main">\n  <a href="/">Home</a>\n</nav>'
+
+
+def audited_page(site, url, htmls):
+    page = Page(site, url)
+    page.audit = AxePageAudit(page)
+    for html in htmls:
+        violation = Violation(page=page, source='axe', identifier='color-contrast',
+                              severity='serious')
+        violation.html = html
+        violation.type = 'design'
+        page.audit.violations.append(violation)
+    return page
+
+
+class IssueTest(helper.AppTestCase):
+    #
+    # Fixtures
+    #
+    def setUp(self):
+        super(IssueTest, self).setUp()
+        self.test_dir = pathjoin(AUDITS_DIR, "sub-domain-com")
+        helper.delete_directory(self.test_dir)
+        self.site = Site.from_domain_or_url('http://sub.domain.com', dedupe=True)
+
+    def tearDown(self):
+        helper.delete_directory(self.test_dir)
+
+    #
+    # Tests
+    #
+    def test_expects_shared_component_stored_once(self):
+        # Arrange
+        pages = [audited_page(self.site, 'http://sub.domain.com/{}'.format(n),
+                              [NAV_HTML, '<p>{}</p>'.format(n)]) for n in range(3)]
+        # Same component, templated with different whitespace.
+        pages.append(audited_page(self.site, 'http://sub.domain.com/3',
+                                  ['<nav class="main"> <a href="/">Home</a> </nav>']))
+
+        # Act
+        for page in pages:
+            self.site.add_page(page)
+
+        # Assert
+        self.assertEqual(4, len(self.site.issue_index))
+        nav_issue = self.site.issue_index.issues_sorted_by_pages()[0]
+        self.assertEqual(4, len(nav_issue.pages))
+        self.assertEqual(Issue.key_for(pages[0].violations[0]), nav_issue.key)
+        self.assertIsInstance(pages[3].violations[0], Occurrence)
+        self.assertIs(nav_issue, pages[3].violations[0].issue)
+
+    def test_expects_exact_per_page_counts(self):
+        # Arrange
+        page = audited_page(self.site, 'http://sub.domain.com/a', [NAV_HTML, NAV_HTML])
+
+        # Act
+        self.site.add_page(page)
+        occurrence = page.violations[1]
+
+        # Assert
+        self.assertEqual(2, len(page.violations))
+        self.assertEqual(2, len(AxeAudit.from_site(self.site).errors))
+        self.assertEqual(page, occurrence.page)
+        self.assertEqual('color-contrast', occurrence.identifier)
+        self.assertTrue(occurrence.is_error())
+        self.assertEqual('http://sub.domain.com/a', occurrence.to_dict()['page_url'])
+        self.assertEqual(2, self.site.rule_rollup.rule_counts['color-contrast'])
+
+    def test_expects_unique_issues_csv(self):
+        # Arrange
+        first_page = audited_page(self.site, 'http://sub.domain.com/a', [NAV_HTML])
+        first_page.aliases = ['http://sub.domain.com/a?page=1']
+        self.site.add_page(first_page)
+        self.site.add_page(audited_page(self.site, 'http://sub.domain.com/b', [NAV_HTML]))
+        audit = AxeAudit.from_site(self.site)
+
+        # Act
+        path = audit.write_violations()
+        with open(path, 'r') as f:
+            rows = list(csv.DictReader(f))
+
+        # Assert
+        self.assertEqual(audit.issues_path, path)
+        self.assertEqual(path, audit.violations_path)
+        self.assertEqual(1, len(rows))
+        self.assertEqual('2', rows[0]['violations'])
+        self.assertEqual('3', rows[0]['pages'])
+        self.assertEqual('http://sub.domain.com/a http://sub.domain.com/a?page=1 '
+                         'http://sub.domain.com/b', rows[0]['page_urls'])
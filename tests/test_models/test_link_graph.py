@@ -0,0 +1,96 @@
+import os
+from os.path import join as pathjoin
+
+from config.app import AUDITS_DIR
+from models.link_graph import LinkGraph, LinkGraphBuilder
+from tests import helper
+
+
+class LinkGraphTest(helper.AppTestCase):
+    #
+    # Fixtures
+    #
+    def setUp(self):
+        super(LinkGraphTest, self).setUp()
+        self.test_dir = pathjoin(AUDITS_DIR, "sub-domain-com")
+        helper.delete_directory(self.test_dir)
+        self.graph_dir = pathjoin(self.test_dir, 'link-graph')
+        self.home = 'http://sub.domain.com'
+        self.foo = 'http://sub.domain.com/foo'
+        self.bar = 'http://sub.domain.com/bar'
+        self.baz = 'http://sub.domain.com/baz'
+
+    def tearDown(self):
+        helper.delete_directory(self.test_dir)
+
+    #
+    # Tests
+    #
+    def test_expects_links_in_both_directions(self):
+        # Arrange
+        builder = LinkGraphBuilder(self.graph_dir, buffer_size=2)
+
+        # Act
+        builder.add_links(self.home, [self.foo, self.bar])
+        builder.add_links(self.foo, [self.bar, self.home])
+        builder.add_links(self.bar, [self.baz])
+        graph = LinkGraph(builder.close().graph_dir)
+
+        # Assert
+        self.assertEqual(4, graph.node_count)
+        self.assertEqual(5, graph.edge_count)
+        self.assertEqual([self.bar, self.home], graph.links_from(self.foo))
+        self.assertEqual([self.home, self.foo], graph.linked_from(self.bar))
+        self.assertEqual(2, graph.in_degree(self.bar))
+        self.assertEqual(0, graph.in_degree('http://sub.domain.com/unknown'))
+        self.assertEqual([], graph.links_from(self.baz))
+        graph.close()
+
+    def test_expects_depths_from_root(self):
+        # Arrange
+        builder = LinkGraphBuilder(self.graph_dir)
+        builder.add_links(self.home, [self.foo])
+        builder.add_links(self.foo, [self.bar, self.home])
+        builder.add_links(self.baz, [self.home])
+        graph = LinkGraph(builder.close().graph_dir)
+
+        # Act
+        depths = graph.depths(self.home)
+
+        # Assert
+        self.assertEqual([0, 1, 2, -1], [depths[graph.ids[url]]
+                                         for url in [self.home, self.foo, self.bar, self.baz]])
+        self.assertEqual([self.baz, 'http://sub.domain.com/sitemap-only'],
+                         list(graph.orphans([self.home, self.foo, self.baz,
+                                             'http://sub.domain.com/sitemap-only'],
+                                            root_url=self.home)))
+        graph.close()
+
+    def test_expects_resumed_crawl_to_keep_ids(self):
+        # Arrange
+        builder = LinkGraphBuilder(self.graph_dir)
+        builder.add_links(self.home, [self.foo]).flush()
+
+        # Act
+        resumed = LinkGraphBuilder(self.graph_dir, resume=True)
+        resumed.add_links(self.foo, [self.bar])
+        graph = LinkGraph(resumed.close().graph_dir)
+
+        # Assert
+        self.assertEqual([self.home, self.foo, self.bar], graph.urls)
+        self.assertEqual([self.foo], graph.linked_from(self.bar))
+        graph.close()
+
+    def test_expects_new_crawl_to_clear_graph(self):
+        # Arrange
+        LinkGraphBuilder(self.graph_dir).add_links(self.home, [self.foo]).close()
+
+        # Act
+        builder = LinkGraphBuilder(self.graph_dir)
+
+        # Assert
+        self.assertFalse(LinkGraph.exists(self.graph_dir))
+        self.assertEqual([], os.listdir(self.graph_dir))
+        graph = LinkGraph(builder.close().graph_dir)
+        self.assertEqual(0, graph.edge_count)
+        graph.close()
@@ -1,3 +1,4 @@
+import shutil
 from os.path import join as pathjoin
 from unittest.mock import patch
 
@@ -145,3 +146,21 @@ class PageTest(helper.AppTestCase):
 
             # Assert
             self.assertEqual(expected_subtemplate, page.subtemplate, url)
+
+    def test_expects_resumed_audit_to_skip_audited_page(self):
+        # Arrange
+        url = 'http://sub.domain.com/path'
+        test_axe_report_path = helper.fixture_file_path('httpbin-org-page-all-violations.json')
+        site = Site.from_domain_or_url(url, resume=True)
+        site.start_run()
+        page = Page(site)
+        audit = AxePageAudit(page)
+        shutil.copy(test_axe_report_path, audit.report_path)
+
+        # Act
+        with patch.object(AxePageAudit, 'generate_report') as mocked_method:
+            audit.now()
+
+        # Assert
+        mocked_method.assert_not_called()
+        self.assertEqual(5, len(audit.violations))
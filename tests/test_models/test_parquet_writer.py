@@ -0,0 +1,118 @@
+import os
+from os.path import join as pathjoin
+from unittest.mock import patch
+
+import pyarrow
+import pyarrow.parquet
+
+from config.app import AUDITS_DIR
+from models.axe_audit import AxeAudit, AxePageAudit
+from models.page import Page
+from models.parquet_writer import ParquetViolationWriter
+from models.site import Site, InvalidViolationsFormat
+from models.violation import Violation
+from tests import helper
+
+
+def page_with_violations(site, url, count):
+    page = Page(site, url)
+    page.audit = AxePageAudit(page)
+    for n in range(count):
+        violation = Violation(page=page, source='axe', identifier='image-alt',
+                              severity='critical')
+        violation.type = 'code'
+        violation.html = '<img src="{}.png">'.format(n)
+        page.audit.violations.append(violation)
+    return page
+
+
+class ParquetViolationWriterTest(helper.AppTestCase):
+    #
+    # Fixtures
+    #
+    def setUp(self):
+        super(ParquetViolationWriterTest, self).setUp()
+        self.test_dir = pathjoin(AUDITS_DIR, "sub-domain-com")
+        helper.delete_directory(self.test_dir)
+        self.site = Site.from_domain_or_url('http://sub.domain.com')
+        self.path = pathjoin(self.test_dir, 'violations.parquet')
+
+    def tearDown(self):
+        helper.delete_directory(self.test_dir)
+
+    #
+    # Tests
+    #
+    def test_expects_dictionary_encoded_columns(self):
+        # Arrange
+        writer = ParquetViolationWriter(self.path)
+        writer.write_page(page_with_violations(self.site, 'http://sub.domain.com/blog/a', 2))
+
+        # Act
+        writer.close()
+        table = pyarrow.parquet.read_table(self.path)
+
+        # Assert
+        self.assertEqual(ParquetViolationWriter.COLUMNS, table.column_names)
+        self.assertTrue(pyarrow.types.is_dictionary(table.schema.field('identifier').type))
+        self.assertTrue(pyarrow.types.is_string(table.schema.field('html').type))
+        self.assertEqual(['blog/a', 'blog/a'], table.column('subtemplate').to_pylist())
+        self.assertEqual(['blog', 'blog'], table.column('template').to_pylist())
+        self.assertEqual(['<img src="0.png">', '<img src="1.png">'],
+                         table.column('html').to_pylist())
+
+    def test_expects_row_groups_written_as_pages_complete(self):
+        # Arrange
+        writer = ParquetViolationWriter(self.path, row_group_size=3)
+
+        # Act
+        for n in range(4):
+            url = 'http://sub.domain.com/{}'.format(n)
+            writer.write_page(page_with_violations(self.site, url, 2))
+        row_groups_before_close = writer.row_groups
+        writer.close()
+
+        # Assert
+        metadata = pyarrow.parquet.ParquetFile(self.path).metadata
+        self.assertEqual(2, row_groups_before_close)
+        self.assertEqual(3, metadata.num_row_groups)
+        self.assertEqual(8, metadata.num_rows)
+        self.assertFalse(os.path.exists('{}.part'.format(self.path)))
+
+    def test_expects_row_for_each_alias(self):
+        # Arrange
+        page = page_with_violations(self.site, 'http://sub.domain.com/foo', 1)
+        page.aliases = ['http://sub.domain.com/foo?page=1']
+
+        # Act
+        ParquetViolationWriter.write_violations(self.path, page.violations)
+        table = pyarrow.parquet.read_table(self.path)
+
+        # Assert
+        self.assertEqual(page.urls, table.column('page_url').to_pylist())
+
+    def test_expects_site_audit_to_stream_violations(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com', violations_format='parquet')
+        urls = ['http://sub.domain.com/a', 'http://sub.domain.com/b']
+
+        def from_page(page, audit_type):
+            return page_with_violations(site, page.url, 3).audit
+
+        # Act
+        with patch.object(Site, 'extract_site_page_urls_from_sitemap', return_value=urls), \
+                patch.object(AxeAudit, 'from_page', side_effect=from_page):
+            audit = site.audit()
+        path = audit.write_violations()
+
+        # Assert
+        self.assertEqual(audit.parquet_path, path)
+        self.assertEqual(path, audit.violations_path)
+        self.assertEqual(path, site.streamed_violations_path)
+        self.assertEqual(6, pyarrow.parquet.ParquetFile(path).metadata.num_rows)
+        self.assertIn('Violations Parquet: {}'.format(path), audit.summary)
+
+    def test_expects_error_if_invalid_violations_format(self):
+        # Assert/Act
+        with self.assertRaises(InvalidViolationsFormat):
+            Site.from_domain_or_url('http://sub.domain.com', violations_format='xlsx')
@@ -0,0 +1,101 @@
+import json
+from os.path import join as pathjoin
+
+from config.app import AUDITS_DIR
+from models.axe_audit import AxePageAudit
+from models.page import Page
+from models.profiler import Profiler
+from models.site import Site
+from tests import helper
+
+
+class ProfilerTest(helper.AppTestCase):
+    #
+    # Fixtures
+    #
+    def setUp(self):
+        test_dir = pathjoin(AUDITS_DIR, "sub-domain-com")
+        helper.delete_directory(test_dir)
+
+    def tearDown(self):
+        test_dir = pathjoin(AUDITS_DIR, "sub-domain-com")
+        helper.delete_directory(test_dir)
+
+    #
+    # Tests
+    #
+    def test_expects_percentiles_per_phase(self):
+        # Arrange
+        profiler = Profiler()
+
+        # Act
+        for n in range(1, 101):
+            profiler.record('navigation', n / 100.0, 'http://sub.domain.com/{}'.format(n))
+        stats = profiler.phase_stats()
+
+        # Assert
+        self.assertEqual(100, stats['navigation']['count'])
+        self.assertEqual(0.5, stats['navigation']['p50'])
+        self.assertEqual(0.95, stats['navigation']['p95'])
+        self.assertEqual(0.99, stats['navigation']['p99'])
+        self.assertEqual({'navigation': 0.01}, profiler.page_spans['http://sub.domain.com/1'])
+
+    def test_expects_span_to_record_duration(self):
+        # Arrange
+        profiler = Profiler()
+
+        # Act
+        with profiler.span('axe_run', 'http://sub.domain.com'):
+            pass
+
+        # Assert
+        self.assertEqual(1, len(profiler.spans['axe_run']))
+        self.assertIn('axe_run', profiler.page_spans['http://sub.domain.com'])
+
+    def test_expects_crawl_latency_histogram(self):
+        # Arrange
+        profiler = Profiler()
+
+        # Act
+        profiler.record_response(0.005, 100)
+        profiler.record_response(0.2, 300)
+        profiler.record_response(20, 0)
+        crawl_stats = profiler.crawl_stats()
+
+        # Assert
+        self.assertEqual(3, crawl_stats['requests'])
+        self.assertEqual(400, crawl_stats['bytes'])
+        self.assertEqual(1, crawl_stats['latency_histogram']['<=10ms'])
+        self.assertEqual(1, crawl_stats['latency_histogram']['<=250ms'])
+        self.assertEqual(1, crawl_stats['latency_histogram']['>10000ms'])
+
+    def test_expects_cached_responses_not_to_count_as_downloaded_bytes(self):
+        # Arrange
+        profiler = Profiler()
+
+        # Act
+        profiler.record_response(0.05, 1000)
+        profiler.record_response(0.01, 1000, cached=True)
+        crawl_stats = profiler.crawl_stats()
+
+        # Assert
+        self.assertEqual(2, crawl_stats['requests'])
+        self.assertEqual(1, crawl_stats['cached'])
+        self.assertEqual(1000, crawl_stats['bytes'])
+
+    def test_expects_profile_json_next_to_csv(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com')
+        audit = AxePageAudit(Page(site))
+        site.profiler.record('parse', 0.25, site.url)
+
+        # Act
+        profile_path = audit.write_profile()
+        with open(profile_path, 'r') as f:
+            profile = json.load(f)
+
+        # Assert
+        self.assertEqual(audit.violations_path.replace('-violations.csv', '-profile.json'),
+                         profile_path)
+        self.assertEqual(0.25, profile['phases']['parse']['p50'])
+        self.assertIn('parse', audit.profile_summary)
@@ -0,0 +1,136 @@
+import io
+import json
+import logging
+from datetime import timedelta
+from os.path import join as pathjoin
+
+from config.app import AUDITS_DIR
+from models.axe_audit import AxePageAudit
+from models.page import Page
+from models.progress import LOGGER, ProgressReporter
+from models.site import Site
+from models.violation import Violation
+from spiders.sitemap_spider import SitemapSpider
+from tests import helper
+
+
+def audited_page(site, url, kinds, runtime_seconds):
+    page = Page(site, url)
+    page.audit = AxePageAudit(page)
+    page.audit.ended_at = page.audit.started_at + timedelta(seconds=runtime_seconds)
+    for kind in kinds:
+        violation = Violation(page=page, source='axe', identifier='label', severity='serious')
+        violation.kind = kind
+        page.audit.violations.append(violation)
+    return page
+
+
+class ProgressReporterTest(helper.AppTestCase):
+    #
+    # Fixtures
+    #
+    def setUp(self):
+        super(ProgressReporterTest, self).setUp()
+        self.test_dir = pathjoin(AUDITS_DIR, "sub-domain-com")
+        helper.delete_directory(self.test_dir)
+        self.stream = io.StringIO()
+        self.site = Site.from_domain_or_url('http://sub.domain.com', progress='json')
+        self.site.progress = ProgressReporter(self.site, mode='json', interval=60,
+                                              stream=self.stream)
+
+    def tearDown(self):
+        helper.delete_directory(self.test_dir)
+
+    #
+    # Tests
+    #
+    def test_expects_counters_from_audited_pages(self):
+        # Arrange
+        progress = self.site.progress
+        progress.start()
+        progress.start_audit(10)
+
+        # Act
+        self.site.add_page(audited_page(self.site, 'http://sub.domain.com/a',
+                                        ['error', 'error', 'warning'], 2.0))
+        self.site.add_page(audited_page(self.site, 'http://sub.domain.com/b', ['error'], 4.0))
+        snapshot = progress.snapshot()
+        progress.stop()
+
+        # Assert
+        self.assertEqual('audit', snapshot['phase'])
+        self.assertEqual(2, snapshot['pages_audited'])
+        self.assertEqual(3, snapshot['errors'])
+        self.assertEqual(1, snapshot['warnings'])
+        self.assertEqual(2.4, snapshot['page_latency'])
+        self.assertIsNotNone(snapshot['eta_seconds'])
+
+    def test_expects_json_lines_at_interval_and_on_stop(self):
+        # Arrange
+        progress = self.site.progress
+        progress.interval = 0.01
+        progress.discovered = 5
+
+        # Act
+        progress.start()
+        progress.stopped.wait(0.05)
+        progress.stop()
+        lines = self.stream.getvalue().strip().split('\n')
+
+        # Assert
+        self.assertGreater(len(lines), 1)
+        last_update = json.loads(lines[-1])
+        self.assertEqual('crawl', last_update['phase'])
+        self.assertEqual(5, last_update['frontier'])
+        self.assertIsNone(last_update['eta_seconds'])
+
+    def test_expects_text_update(self):
+        # Arrange
+        progress = ProgressReporter(self.site, mode='text', stream=self.stream)
+        progress.start()
+        progress.start_audit(4)
+        progress.page_audited(audited_page(self.site, 'http://sub.domain.com/a', ['error'], 1))
+
+        # Act
+        progress.stop()
+
+        # Assert
+        self.assertIn('audit: 1/4 pages', self.stream.getvalue())
+        self.assertIn('1 errors, 0 warnings', self.stream.getvalue())
+
+    def test_expects_reporters_to_share_one_logger_and_leave_no_handler(self):
+        # Arrange
+        loggers = len(logging.Logger.manager.loggerDict)
+        handlers = list(LOGGER.handlers)
+        other_stream = io.StringIO()
+        other = ProgressReporter(self.site, mode='text', interval=60, stream=other_stream)
+        progress = self.site.progress
+
+        # Act
+        progress.start()
+        other.start()
+        running_handlers = [h for h in LOGGER.handlers if h not in handlers]
+        reporter_handlers = [progress.handler, other.handler]
+        progress.stop()
+        other.stop()
+
+        # Assert
+        self.assertEqual(reporter_handlers, running_handlers)
+        self.assertEqual(handlers, LOGGER.handlers)
+        self.assertEqual(loggers, len(logging.Logger.manager.loggerDict))
+        self.assertEqual(1, len(self.stream.getvalue().strip().split('\n')))
+        self.assertEqual('crawl', json.loads(self.stream.getvalue())['phase'])
+        self.assertIn('0 in frontier', other_stream.getvalue())
+        self.assertEqual(1, len(other_stream.getvalue().strip().split('\n')))
+
+    def test_expects_spider_to_count_discovered_pages(self):
+        # Arrange
+        spider = SitemapSpider(self.site)
+
+        # Act
+        list(spider.visit('/foo'))
+        list(spider.visit('/foo'))
+        list(spider.visit('/bar'))
+
+        # Assert
+        self.assertEqual(2, self.site.progress.discovered)
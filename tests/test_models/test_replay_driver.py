@@ -0,0 +1,129 @@
+import csv
+import os
+from os.path import join as pathjoin
+import shutil
+import time
+from unittest.mock import patch
+
+from config.app import AUDITS_DIR
+from models.audit_profile import AuditProfile
+from models.axe_audit import AxePageAudit
+from models.browser_pool import BrowserPool
+from models.replay_driver import RecordingNotFound, ReplayDriver, ReplayRecordings
+from models.result_store import ResultStore
+from models.site import Site
+from tests import helper
+
+
+class ReplayDriverTest(helper.AppTestCase):
+    #
+    # Fixtures
+    #
+    def setUp(self):
+        super(ReplayDriverTest, self).setUp()
+        self.test_dir = pathjoin(AUDITS_DIR, "sub-domain-com")
+        helper.delete_directory(self.test_dir)
+        os.makedirs(self.test_dir)
+        self.report_path = helper.fixture_file_path('httpbin-org-page-all-violations.json')
+
+    def tearDown(self):
+        helper.delete_directory(self.test_dir)
+
+    #
+    # Tests
+    #
+    def test_expects_recordings_from_run_directory(self):
+        # Arrange
+        run_dir = pathjoin(self.test_dir, 'recorded-run')
+        os.makedirs(run_dir)
+        file_name = '{}-page-all-violations.json'.format(
+            AxePageAudit.url_file_name('http://sub.domain.com/foo'))
+        shutil.copy(self.report_path, pathjoin(run_dir, file_name))
+        driver = ReplayDriver(ReplayRecordings(run_dir))
+
+        # Act
+        driver.get('http://sub.domain.com/foo')
+        results = driver.execute_async_script(AxePageAudit.TRIMMED_RUN_SCRIPT, {})
+
+        # Assert
+        self.assertEqual(5, sum(len(result['nodes']) for result in results['violations']))
+        driver.get('http://sub.domain.com/bar')
+        with self.assertRaises(RecordingNotFound):
+            driver.execute_async_script(AxePageAudit.TRIMMED_RUN_SCRIPT, {})
+
+    def test_expects_recordings_from_result_store(self):
+        # Arrange
+        store_path = pathjoin(self.test_dir, 'results.aar')
+        store = ResultStore(store_path)
+        store.append('http://sub.domain.com/foo', ReplayRecordings(self.report_path).get(None))
+        store.close()
+
+        # Act
+        recordings = ReplayRecordings(store_path)
+
+        # Assert
+        self.assertEqual('color-contrast', recordings.get('http://sub.domain.com/foo')
+                         ['violations'][0]['id'])
+        self.assertIsNone(recordings.get('http://sub.domain.com/bar'))
+
+    def test_expects_site_audit_without_browser(self):
+        # Arrange
+        url_list_path = pathjoin(self.test_dir, 'urls.txt')
+        with open(url_list_path, 'w') as f:
+            f.write('http://sub.domain.com/foo\nhttp://sub.domain.com/bar\n')
+        profile = AuditProfile({'browser': {'driver': 'replay', 'replay_from': self.report_path}})
+        site = Site.from_domain_or_url('http://sub.domain.com', sitemap_file=url_list_path,
+                                       profile=profile)
+
+        # Act
+        site_audit = site.audit()
+        with open(site_audit.write_violations_to_csv(), 'r') as csv_file:
+            rows = list(csv.DictReader(csv_file))
+
+        # Assert
+        self.assertEqual('replay', site.browser_pool.driver)
+        self.assertEqual(10, len(site_audit.violations))
+        self.assertEqual(['http://sub.domain.com/foo'] * 5 + ['http://sub.domain.com/bar'] * 5,
+                         [row['page_url'] for row in rows])
+
+    def test_expects_pool_to_share_recordings(self):
+        # Arrange
+        pool = BrowserPool(size=2, driver='replay', recordings={'http://sub.domain.com': {}})
+
+        # Act
+        with pool.checkout() as first_driver:
+            with pool.checkout() as second_driver:
+                pass
+
+        # Assert
+        self.assertIsInstance(first_driver, ReplayDriver)
+        self.assertIsNot(first_driver, second_driver)
+        self.assertIs(first_driver.recordings, second_driver.recordings)
+
+    def test_expects_workers_to_share_one_result_store(self):
+        # Arrange
+        urls = ['http://sub.domain.com/{}'.format(n) for n in range(40)]
+        url_list_path = pathjoin(self.test_dir, 'urls.txt')
+        with open(url_list_path, 'w') as f:
+            f.writelines('{}\n'.format(url) for url in urls)
+        profile = AuditProfile({'workers': 8, 'output': {'results': 'binary'},
+                                'browser': {'driver': 'replay', 'replay_from': self.report_path}})
+        site = Site.from_domain_or_url('http://sub.domain.com', sitemap_file=url_list_path,
+                                       profile=profile)
+        stores = []
+        store_init = ResultStore.__init__
+
+        def slow_store_init(store, *args, **kwargs):
+            # Widens the window in which workers could each create a store.
+            stores.append(store)
+            time.sleep(0.05)
+            store_init(store, *args, **kwargs)
+
+        # Act
+        with patch.object(ResultStore, '__init__', autospec=True, side_effect=slow_store_init):
+            site_audit = site.audit()
+
+        # Assert
+        self.assertEqual(1, len(stores))
+        self.assertEqual(200, len(site_audit.violations))
+        self.assertEqual(sorted(urls), sorted(ResultStore(stores[0].path).urls))
@@ -0,0 +1,177 @@
+import json
+import os
+import tempfile
+from os.path import join as pathjoin
+
+from config.app import AUDITS_DIR
+from models.axe_audit import AxePageAudit
+from models.page import Page
+from models.result_store import CorruptResultStore, ResultStore
+from models.site import Site
+from tests import helper
+
+
+def fixture_results():
+    with open(helper.fixture_file_path('httpbin-org-page-all-violations.json'), 'r') as f:
+        return json.load(f)
+
+
+class ResultStoreTest(helper.AppTestCase):
+    #
+    # Fixtures
+    #
+    def setUp(self):
+        super(ResultStoreTest, self).setUp()
+        self.test_dir = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.test_dir, 'results.aar')
+        helper.delete_directory(pathjoin(AUDITS_DIR, "sub-domain-com"))
+
+    def tearDown(self):
+        helper.delete_directory(self.test_dir)
+        helper.delete_directory(pathjoin(AUDITS_DIR, "sub-domain-com"))
+
+    #
+    # Tests
+    #
+    def test_expects_results_to_round_trip(self):
+        # Arrange
+        results = fixture_results()
+        store = ResultStore(self.store_path)
+
+        # Act
+        store.append('http://sub.domain.com/a', results)
+        store.close()
+        stored = ResultStore.open(self.store_path).get('http://sub.domain.com/a')
+
+        # Assert
+        self.assertEqual(results['violations'], stored['violations'])
+        self.assertEqual(results['incomplete'], stored['incomplete'])
+        self.assertEqual([r['id'] for r in results['passes']],
+                         [r['id'] for r in stored['passes']])
+
+    def test_expects_rules_stored_once(self):
+        # Arrange
+        results = fixture_results()
+        store = ResultStore(self.store_path)
+        json_size = len(json.dumps(results, indent=4))
+
+        # Act
+        for n in range(20):
+            store.append('http://sub.domain.com/{}'.format(n), results)
+        store.close()
+
+        # Assert
+        keys = ['violations', 'incomplete', 'passes', 'inapplicable']
+        rule_count = len(set(r['id'] for key in keys for r in results[key]))
+        self.assertEqual(rule_count, len(store.rules))
+        self.assertLess(os.path.getsize(self.store_path), json_size * 20 / 10)
+
+    def test_expects_pages_streamed_with_latest_results(self):
+        # Arrange
+        results = fixture_results()
+        store = ResultStore(self.store_path)
+        store.append('http://sub.domain.com/a', {'violations': [], 'incomplete': []})
+        store.append('http://sub.domain.com/b', results)
+        store.append('http://sub.domain.com/a', results)
+        store.close()
+
+        # Act
+        pages = list(ResultStore.open(self.store_path).iter_pages())
+
+        # Assert
+        self.assertEqual(['http://sub.domain.com/b', 'http://sub.domain.com/a'],
+                         [url for url, _ in pages])
+        self.assertEqual(len(results['violations']), len(pages[1][1]['violations']))
+
+    def test_expects_store_readable_without_index(self):
+        # Arrange
+        store = ResultStore(self.store_path)
+        store.append('http://sub.domain.com/a', fixture_results())
+        store.close()
+        os.remove(store.index_path)
+
+        # Act
+        reopened = ResultStore.open(self.store_path)
+
+        # Assert
+        self.assertIn('http://sub.domain.com/a', reopened)
+        self.assertIsNotNone(reopened.get('http://sub.domain.com/a'))
+
+    def test_expects_truncated_record_to_be_dropped(self):
+        # Arrange
+        store = ResultStore(self.store_path)
+        store.append('http://sub.domain.com/a', fixture_results())
+        store.close()
+        with open(self.store_path, 'ab') as f:
+            f.write(b'P\x00\x00\x10\x00partial')
+
+        # Act
+        store = ResultStore(self.store_path)
+        store.append('http://sub.domain.com/b', fixture_results())
+        store.close()
+        reopened = ResultStore.open(self.store_path)
+
+        # Assert
+        self.assertEqual(2, len(reopened))
+        self.assertEqual(2, len(list(reopened.iter_pages())))
+
+    def test_expects_error_if_not_a_result_store(self):
+        # Arrange
+        with open(self.store_path, 'w') as f:
+            f.write('{"violations": []}')
+
+        # Assert/Act
+        with self.assertRaises(CorruptResultStore):
+            ResultStore.open(self.store_path)
+
+    def test_expects_page_audit_to_use_site_result_store(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com', results_format='binary')
+        audit = AxePageAudit(Page(site))
+
+        # Act
+        report_path = audit.write_report(fixture_results())
+        violations = audit.parse_report(report_path)
+        site.close()
+
+        # Assert
+        self.assertEqual(site.result_store.path, report_path)
+        self.assertTrue(audit.report_exists())
+        self.assertEqual(5, len(violations))
+        self.assertEqual([], [f for f in os.listdir(site.audit_dir) if f.endswith('.json')])
+
+    def test_expects_binary_results_to_read_back_like_json(self):
+        # Arrange
+        first_results = fixture_results()
+        second_results = fixture_results()
+        # Same rule, another impact on another page, found by the static checks.
+        second_results['violations'][0]['impact'] = 'minor'
+        second_results['source'] = 'static'
+        pages = [('http://sub.domain.com/a', first_results),
+                 ('http://sub.domain.com/b', second_results)]
+
+        def read_back(results_format):
+            site = Site.from_domain_or_url('http://sub.domain.com',
+                                           results_format=results_format)
+            reports, violations = [], []
+            for url, results in pages:
+                audit = AxePageAudit(Page(site, url))
+                report_path = audit.write_report(results)
+                reports.append(audit.read_report(report_path))
+                violations += [violation.to_dict()
+                               for violation in audit.parse_report(report_path)]
+            site.close()
+            return reports, violations
+
+        # Act
+        json_reports, json_violations = read_back('json')
+        binary_reports, binary_violations = read_back('binary')
+
+        # Assert
+        self.assertEqual(json_violations, binary_violations)
+        self.assertEqual(['static'] * 5, [v['source'] for v in binary_violations[5:]])
+        for json_report, binary_report in zip(json_reports, binary_reports):
+            for key in ['source', 'violations', 'incomplete']:
+                self.assertEqual(json_report.get(key), binary_report.get(key))
+        self.assertEqual('minor', binary_reports[1]['violations'][0]['impact'])
+        self.assertNotEqual('minor', binary_reports[0]['violations'][0]['impact'])
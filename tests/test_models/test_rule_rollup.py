@@ -0,0 +1,103 @@
+import csv
+from os.path import join as pathjoin
+
+from config.app import AUDITS_DIR
+from models.axe_audit import AxeAudit, AxePageAudit
+from models.page import Page
+from models.rule_rollup import RuleRollup, SpaceSaving
+from models.site import Site
+from models.violation import Violation
+from tests import helper
+
+
+def audited_page(site, url, violations):
+    page = Page(site, url)
+    page.audit = AxePageAudit(page)
+    for identifier, severity, html in violations:
+        violation = Violation(page=page, source='axe', identifier=identifier, severity=severity)
+        violation.html = html
+        page.audit.violations.append(violation)
+    return page
+
+
+class RuleRollupTest(helper.AppTestCase):
+    #
+    # Fixtures
+    #
+    def setUp(self):
+        super(RuleRollupTest, self).setUp()
+        self.test_dir = pathjoin(AUDITS_DIR, "sub-domain-com")
+        helper.delete_directory(self.test_dir)
+        self.site = Site.from_domain_or_url('http://sub.domain.com')
+
+    def tearDown(self):
+        helper.delete_directory(self.test_dir)
+
+    #
+    # Tests
+    #
+    def test_expects_heavy_hitters_to_survive_eviction(self):
+        # Arrange
+        sketch = SpaceSaving(capacity=3)
+        stream = ['header'] * 40 + ['item-{}'.format(n) for n in range(50)] + ['footer'] * 10
+
+        # Act
+        for item in stream:
+            sketch.add(item)
+        top_item, top_count, top_error = sketch.top(1)[0]
+
+        # Assert
+        self.assertEqual(3, len(sketch.counts))
+        self.assertEqual(100, sketch.total)
+        self.assertEqual('header', top_item)
+        self.assertLessEqual(top_count - top_error, 40)
+        self.assertGreaterEqual(top_count, 40)
+
+    def test_expects_counts_by_rule_and_severity(self):
+        # Arrange
+        rollup = RuleRollup()
+        header = '<div class="header">'
+        pages = [
+            audited_page(self.site, 'http://sub.domain.com/a', [
+                ('color-contrast', 'serious', header),
+                ('color-contrast', 'serious', '<p>a</p>'),
+                ('image-alt', 'critical', '<img>')]),
+            audited_page(self.site, 'http://sub.domain.com/b', [
+                ('color-contrast', 'serious', header),
+                ('color-contrast', 'moderate', header)])
+        ]
+
+        # Act
+        for page in pages:
+            rollup.add_page(page)
+
+        # Assert
+        self.assertEqual(2, rollup.pages)
+        self.assertEqual([('color-contrast', 4), ('image-alt', 1)],
+                         rollup.rules_sorted_by_violations())
+        self.assertEqual([('serious', 3), ('moderate', 1)], rollup.severities('color-contrast'))
+        self.assertEqual(header, rollup.top_html('color-contrast')[0][0])
+        self.assertEqual(0.75, rollup.top_html_share('color-contrast'))
+        self.assertIn('75% <div class="header">', rollup.summarize())
+
+    def test_expects_site_audit_rollup_in_summary_and_rules_csv(self):
+        # Arrange
+        self.site.add_page(audited_page(self.site, 'http://sub.domain.com/a', [
+            ('color-contrast', 'serious', '<nav>')]))
+        # Pages appended directly are counted when the rollup is read.
+        self.site.pages.append(audited_page(self.site, 'http://sub.domain.com/b', [
+            ('color-contrast', 'serious', '<nav>'), ('label', 'critical', '<input>')]))
+        audit = AxeAudit.from_site(self.site)
+
+        # Act
+        rules_path = audit.write_rules_to_csv()
+        with open(rules_path, 'r') as f:
+            rows = list(csv.DictReader(f))
+
+        # Assert
+        self.assertTrue(rules_path.endswith('sub-domain-com-site-all-rules.csv'))
+        self.assertEqual(['color-contrast', 'label'], [row['identifier'] for row in rows])
+        self.assertEqual('2', rows[0]['violations'])
+        self.assertEqual('<nav>', rows[0]['top_html'])
+        self.assertIn('color-contrast: 2 (serious: 2)', audit.summary)
+        self.assertEqual(3, audit.to_dict()['rules']['violations'])
@@ -1,6 +1,14 @@
+import gzip
+import os
+import tempfile
+from unittest.mock import MagicMock, patch
+
 import requests_mock
 
-from models.site import Site
+from config.app import AUDITS_DIR
+from models.axe_audit import AxeAudit
+from models.page import Page
+from models.site import InvalidDiscoveryMode, Site
 from tests import helper
 
 
@@ -109,3 +117,206 @@ class SiteTest(helper.AppTestCase):
         self.assertEqual('localhost', site.fqdn)
         self.assertEqual('http://localhost:3000/', site.url)
         self.assertEqual('http://localhost:3000', site.base_url)
+
+    def test_expects_resumed_run_to_reuse_run_id(self):
+        # Arrange
+        url = 'http://sub.domain.com'
+        first_site = Site.from_domain_or_url(url)
+        first_run_id = first_site.start_run()
+        resumed_site = Site.from_domain_or_url(url, resume=True)
+
+        # Act
+        resumed_run_id = resumed_site.start_run()
+
+        # Assert
+        self.assertEqual(first_run_id, resumed_run_id)
+        self.assertEqual(first_site.run_dir, resumed_site.run_dir)
+        self.assertIn(first_run_id, resumed_site.run_dir)
+        helper.delete_directory(first_site.audit_dir)
+
+    def test_expects_resumed_sitemap_to_skip_finished_crawl(self):
+        # Arrange
+        url = 'http://sub.domain.com'
+        site = Site.from_domain_or_url(url, resume=True)
+        os.makedirs(site.job_dir, exist_ok=True)
+        open(site.crawl_finished_path, 'w').close()
+
+        # Act
+        with patch.object(Site, 'map_pages_to_sitemap_file_with_spiders') as mocked_method:
+            sitemap_path = site.generate_sitemap()
+
+        # Assert
+        mocked_method.assert_not_called()
+        self.assertTrue(site.crawl_finished)
+        self.assertEqual(site.sitemap_path, sitemap_path)
+        helper.delete_directory(site.audit_dir)
+
+    def test_expects_error_if_invalid_discovery_mode(self):
+        # Arrange
+        url = 'http://sub.domain.com'
+
+        # Assert/Act
+        with self.assertRaises(InvalidDiscoveryMode):
+            Site.from_domain_or_url(url, discovery='robots')
+
+    def test_expects_aliases_to_be_removed_from_sitemap(self):
+        # Arrange
+        url = 'http://sub.domain.com'
+        site = Site.from_domain_or_url(url)
+        with open(site.sitemap_path, 'w') as sitemap_file:
+            sitemap_file.write("http://sub.domain.com/foo\n"
+                               "http://sub.domain.com/foo?page=1\n"
+                               "http://sub.domain.com/foo/index.html\n")
+        with open(site.aliases_path, 'w') as aliases_file:
+            aliases_file.write("http://sub.domain.com/foo?page=1\thttp://sub.domain.com/foo/\n"
+                               "http://sub.domain.com/foo/\thttp://sub.domain.com/foo\n"
+                               "http://sub.domain.com/foo/index.html\thttp://sub.domain.com/foo\n")
+
+        # Act
+        site.clean_up_sitemap_file()
+
+        # Assert
+        with open(site.sitemap_path, 'r') as f:
+            sitemap_urls = [line for line in f.read().splitlines() if not line.startswith('#')]
+        self.assertEqual(['http://sub.domain.com/foo'], sitemap_urls)
+        self.assertEqual(['http://sub.domain.com/foo?page=1',
+                          'http://sub.domain.com/foo/',
+                          'http://sub.domain.com/foo/index.html'],
+                         site.aliases['http://sub.domain.com/foo'])
+        helper.delete_directory(site.audit_dir)
+
+    def test_expects_one_page_of_canonical_cycle_to_be_audited(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com')
+        with open(site.sitemap_path, 'w') as sitemap_file:
+            sitemap_file.write("http://sub.domain.com/a\nhttp://sub.domain.com/b\n")
+        with open(site.aliases_path, 'w') as aliases_file:
+            aliases_file.write("http://sub.domain.com/a\thttp://sub.domain.com/b\n"
+                               "http://sub.domain.com/b\thttp://sub.domain.com/a\n")
+
+        # Act
+        site.clean_up_sitemap_file()
+
+        # Assert
+        self.assertEqual(['http://sub.domain.com/a'], list(site.read_sitemap_urls(
+            site.sitemap_path)))
+        self.assertEqual({'http://sub.domain.com/a': ['http://sub.domain.com/b']}, site.aliases)
+        helper.delete_directory(site.audit_dir)
+
+    def test_expects_duplicate_of_page_missing_from_sitemap_to_be_audited(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com')
+        with open(site.sitemap_path, 'w') as sitemap_file:
+            sitemap_file.write("http://sub.domain.com/index.html\nhttp://sub.domain.com/foo\n"
+                               "http://sub.domain.com/foo/index.html\n")
+        with open(site.aliases_path, 'w') as aliases_file:
+            aliases_file.write("http://sub.domain.com/index.html\thttp://sub.domain.com\n"
+                               "http://sub.domain.com/foo/index.html\thttp://sub.domain.com/foo\n")
+
+        # Act
+        site.clean_up_sitemap_file()
+
+        # Assert
+        self.assertEqual(['http://sub.domain.com/foo', 'http://sub.domain.com/index.html'],
+                         list(site.read_sitemap_urls(site.sitemap_path)))
+        self.assertEqual({'http://sub.domain.com/foo': ['http://sub.domain.com/foo/index.html']},
+                         site.aliases)
+        helper.delete_directory(site.audit_dir)
+
+    def test_expects_audit_output_under_given_audits_dir(self):
+        # Arrange
+        audits_dir = tempfile.mkdtemp()
+        helper.delete_directory(os.path.join(AUDITS_DIR, 'sub-domain-com'))
+
+        # Act
+        site = Site.from_domain_or_url('http://sub.domain.com', audits_dir=audits_dir)
+        audit = AxeAudit.from_site(site)
+
+        # Assert
+        self.assertEqual(os.path.join(audits_dir, 'sub-domain-com'), site.audit_dir)
+        self.assertTrue(os.path.isdir(site.audit_dir))
+        self.assertTrue(audit.csv_path().startswith(site.audit_dir))
+        self.assertFalse(os.path.exists(os.path.join(AUDITS_DIR, 'sub-domain-com')))
+        helper.delete_directory(audits_dir)
+
+    def test_expects_url_list_to_be_read_lazily_from_gzip(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com')
+        url_list_path = os.path.join(site.audit_dir, 'urls.txt.gz')
+        with gzip.open(url_list_path, 'wt') as f:
+            f.write("# exported urls\nhttp://sub.domain.com/foo/\n\nhttps://google.com/\n"
+                    "http://sub.domain.com/bar\n")
+
+        # Act
+        urls = site.read_url_list(url_list_path)
+        first_url = next(urls)
+
+        # Assert
+        self.assertEqual('http://sub.domain.com/foo/', first_url)
+        self.assertEqual(['http://sub.domain.com/bar'], list(urls))
+        helper.delete_directory(site.audit_dir)
+
+    def test_expects_urls_from_xml_sitemap(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com')
+        sitemap_path = os.path.join(site.audit_dir, 'sitemap.xml')
+        with open(sitemap_path, 'w') as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                    '<url><loc>http://sub.domain.com/foo</loc><priority>1</priority></url>'
+                    '<url><loc> http://sub.domain.com/bar </loc></url>'
+                    '</urlset>')
+
+        # Act
+        urls = list(site.read_url_list(sitemap_path))
+
+        # Assert
+        self.assertEqual(['http://sub.domain.com/foo', 'http://sub.domain.com/bar'], urls)
+        helper.delete_directory(site.audit_dir)
+
+    def test_expects_audit_from_sitemap_file_without_crawling(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com')
+        url_list_path = os.path.join(site.audit_dir, 'urls.txt')
+        with open(url_list_path, 'w') as f:
+            f.write("http://sub.domain.com/foo\nhttp://sub.domain.com/bar\n")
+        site.sitemap_file = url_list_path
+
+        def axe_audit(page, audit_type):
+            page.audit = MagicMock(violations=[])
+            return page
+
+        # Act
+        with patch.object(Site, 'generate_sitemap') as generate_sitemap, \
+                patch.object(Page, 'axe_audit', autospec=True, side_effect=axe_audit):
+            site.audit()
+
+        # Assert
+        generate_sitemap.assert_not_called()
+        self.assertEqual(['http://sub.domain.com/foo', 'http://sub.domain.com/bar'],
+                         [page.url for page in site.pages])
+        helper.delete_directory(site.audit_dir)
+
+    def test_expects_dispatch_to_read_urls_as_workers_free_up(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com')
+        site.profile.settings['workers'] = 2
+        read = []
+
+        def urls():
+            for n in range(100):
+                read.append(n)
+                yield 'http://sub.domain.com/{}'.format(n)
+
+        executor = MagicMock()
+        executor.submit.side_effect = lambda fn, url: MagicMock(result=lambda: url)
+
+        # Act
+        pages = site.dispatch(executor, urls())
+        first_page = next(pages)
+
+        # Assert
+        self.assertEqual('http://sub.domain.com/0', first_page)
+        self.assertEqual(4, len(read))
+        self.assertEqual(100, len(list(pages)) + 1)
+        site.close()
@@ -0,0 +1,95 @@
+import os
+from os.path import join as pathjoin
+
+from lxml import html
+
+from config.app import AUDITS_DIR
+from models.site import Site
+from models.static_checker import StaticChecker, StaticChecks
+from tests import helper
+
+PAGE_HTML = """
+<html>
+<body>
+  <img src="/a.png">
+  <img src="/b.png" alt="">
+  <img src="/c.png" aria-label="Chart">
+  <a href="/empty"></a>
+  <a href="/image"><img src="/d.png" alt="Home"></a>
+  <a href="/text">Text</a>
+  <label for="name">Name</label><input id="name" type="text">
+  <label>Query <input name="q"></label>
+  <input type="email">
+  <input type="search" placeholder="Search">
+  <input type="hidden" name="token">
+  <textarea></textarea>
+</body>
+</html>
+"""
+
+
+class StaticCheckerTest(helper.AppTestCase):
+    #
+    # Fixtures
+    #
+    def setUp(self):
+        super(StaticCheckerTest, self).setUp()
+        self.test_dir = pathjoin(AUDITS_DIR, "sub-domain-com")
+        helper.delete_directory(self.test_dir)
+        self.url = 'http://sub.domain.com/page'
+
+    def tearDown(self):
+        helper.delete_directory(self.test_dir)
+
+    #
+    # Tests
+    #
+    def test_expects_axe_shaped_results(self):
+        # Arrange
+        checker = StaticChecker()
+
+        # Act
+        results = checker.check(self.url, html.fromstring(PAGE_HTML))
+        nodes = dict((result['id'], [node['html'] for node in result['nodes']])
+                     for result in results['violations'])
+
+        # Assert
+        self.assertEqual('static', results['source'])
+        self.assertEqual({'html-has-lang': ['<html>'],
+                          'image-alt': ['<img src="/a.png">'],
+                          'link-name': ['<a href="/empty">'],
+                          'label': ['<input type="email">', '<textarea>']}, nodes)
+        self.assertEqual('critical', results['violations'][1]['impact'])
+
+    def test_expects_checks_served_by_url(self):
+        # Arrange
+        os.makedirs(self.test_dir)
+        checks = StaticChecks(pathjoin(self.test_dir, 'static-checks.jsonl'))
+        checker = StaticChecker()
+
+        # Act
+        checks.append(checker.check(self.url, html.fromstring(PAGE_HTML)))
+        checks.append(checker.check(self.url + '/ok', html.fromstring('<html lang="en"></html>')))
+
+        # Assert
+        self.assertEqual(5, StaticChecks.issue_count(checks.get(self.url)))
+        self.assertEqual({self.url: 5, self.url + '/ok': 0}, checks.scores())
+        self.assertEqual([], checks.get('http://sub.domain.com/unchecked')['violations'])
+        self.assertIn(self.url, checks)
+
+    def test_expects_static_only_audit_without_browser(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com', static_only=True)
+        url_list_path = pathjoin(self.test_dir, 'urls.txt')
+        with open(url_list_path, 'w') as f:
+            f.write(self.url + '\n')
+        site.sitemap_file = url_list_path
+        site.static_checks.append(StaticChecker().check(self.url, html.fromstring(PAGE_HTML)))
+
+        # Act
+        site_audit = site.audit()
+
+        # Assert
+        self.assertEqual('replay', site.browser_pool.driver)
+        self.assertEqual(5, len(site_audit.violations))
+        self.assertEqual({'static'}, set(v.source for v in site_audit.violations))
@@ -0,0 +1,119 @@
+import csv
+from os.path import join as pathjoin
+
+from config.app import AUDITS_DIR
+from models.axe_audit import AxeAudit, AxePageAudit
+from models.page import Page
+from models.site import Site
+from models.template_index import TemplateIndex
+from models.violation import Violation
+from tests import helper
+
+
+def audited_page(site, url, errors=0, warnings=0):
+    page = Page(site, url)
+    page.audit = AxePageAudit(page)
+    for n in range(errors + warnings):
+        violation = Violation(page=page, source='axe', identifier='image-alt',
+                              severity='critical')
+        violation.kind = 'error' if n < errors else 'warning'
+        page.audit.violations.append(violation)
+    return page
+
+
+class TemplateIndexTest(helper.AppTestCase):
+    #
+    # Fixtures
+    #
+    def setUp(self):
+        super(TemplateIndexTest, self).setUp()
+        self.test_dir = pathjoin(AUDITS_DIR, "sub-domain-com")
+        helper.delete_directory(self.test_dir)
+        self.site = Site.from_domain_or_url('http://sub.domain.com')
+        self.pages = [
+            audited_page(self.site, 'http://sub.domain.com', errors=1),
+            audited_page(self.site, 'http://sub.domain.com/docs', errors=1),
+            audited_page(self.site, 'http://sub.domain.com/docs/api/users', errors=2, warnings=1),
+            audited_page(self.site, 'http://sub.domain.com/docs/api/teams/', errors=1),
+            audited_page(self.site, 'http://sub.domain.com/docs/guides/start', warnings=2),
+            audited_page(self.site, 'http://sub.domain.com/blog/2020/hello', errors=5)
+        ]
+
+    def tearDown(self):
+        helper.delete_directory(self.test_dir)
+
+    #
+    # Tests
+    #
+    def test_expects_counts_under_each_prefix(self):
+        # Arrange
+        index = TemplateIndex()
+
+        # Act
+        for page in self.pages:
+            index.add_page(page)
+
+        # Assert
+        self.assertEqual(6, index.pages)
+        self.assertEqual(13, index.root.violations)
+        self.assertEqual(7, index.violations_under('docs'))
+        self.assertEqual(4, index.violations_under('/docs/api/'))
+        self.assertEqual(0, index.violations_under('docs/missing'))
+        self.assertEqual(2, index.node('docs/api/users').errors)
+        self.assertEqual(1, index.node('docs/api/users').warnings)
+        self.assertEqual(4, index.node('docs').pages)
+        self.assertEqual(3, index.depth)
+
+    def test_expects_top_prefixes_at_any_depth(self):
+        # Arrange
+        index = TemplateIndex()
+        for page in self.pages:
+            index.add_page(page)
+
+        # Act
+        top_templates = [(node.path, node.violations) for node in index.top(10, depth=1)]
+        top_subtemplate = index.top(1, depth=2)[0]
+        drill_down = [node.path for node in index.children('docs')]
+
+        # Assert
+        self.assertEqual([('docs', 7), ('blog', 5)], top_templates)
+        self.assertEqual('blog/2020', top_subtemplate.path)
+        self.assertEqual(['docs/api', 'docs/guides'], drill_down)
+        self.assertEqual([], index.top(10, depth=5))
+
+    def test_expects_site_audit_summaries_to_match_page_templates(self):
+        # Arrange
+        self.site.pages = list(self.pages)
+        audit = AxeAudit.from_site(self.site)
+
+        # Act
+        templates = audit.templates_sorted_by_violations()
+        subtemplates = audit.subtemplates_sorted_by_violations()
+
+        # Assert
+        for groups, template_for in [(templates, lambda p: p.template),
+                                     (subtemplates, lambda p: p.subtemplate)]:
+            expected = {}
+            for page in self.pages:
+                if template_for(page):
+                    key = template_for(page)
+                    expected[key] = expected.get(key, 0) + len(page.violations)
+            self.assertEqual(expected, dict(groups))
+        self.assertEqual(6, self.site.template_index.pages)
+
+    def test_expects_templates_csv_in_drill_down_order(self):
+        # Arrange
+        for page in self.pages:
+            self.site.add_page(page)
+        audit = AxeAudit.from_site(self.site)
+
+        # Act
+        with open(audit.write_templates_to_csv(), 'r') as f:
+            rows = list(csv.DictReader(f))
+
+        # Assert
+        self.assertEqual(['docs', 'docs/api', 'docs/api/users', 'docs/api/teams', 'docs/guides',
+                          'docs/guides/start', 'blog', 'blog/2020', 'blog/2020/hello'],
+                         [row['path'] for row in rows])
+        self.assertEqual('7', rows[0]['violations'])
+        self.assertEqual('2', rows[1]['depth'])
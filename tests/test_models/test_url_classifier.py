@@ -0,0 +1,77 @@
+from models.url_classifier import InvalidUrlRule, UrlClassifier
+from tests import helper
+
+
+class UrlClassifierTest(helper.AppTestCase):
+    def test_expects_fragments_to_be_stripped(self):
+        # Arrange
+        classifier = UrlClassifier('http://sub.domain.com')
+        test_cases = [
+            # link,                             expected_url
+            ['/foo#header',                     'http://sub.domain.com/foo'],
+            ['http://sub.domain.com/#main',     'http://sub.domain.com'],
+            ['#header',                         '#header'],
+        ]
+
+        # Act / Assert
+        for link, expected_url in test_cases:
+            self.assertEqual(expected_url, classifier.normalize(link), link)
+
+    def test_expects_tracking_params_to_be_dropped(self):
+        # Arrange
+        classifier = UrlClassifier('http://sub.domain.com', strip_tracking_params=True)
+        test_cases = [
+            # link,                                     expected_url
+            ['/foo?utm_source=mail&utm_medium=x',       'http://sub.domain.com/foo'],
+            ['/foo?page=2&gclid=abc',                   'http://sub.domain.com/foo?page=2'],
+            ['/foo?q=bar',                              'http://sub.domain.com/foo?q=bar'],
+            ['https://google.com/?utm_source=mail',     'https://google.com/?utm_source=mail'],
+        ]
+
+        # Act / Assert
+        for link, expected_url in test_cases:
+            self.assertEqual(expected_url, classifier.normalize(link), link)
+
+    def test_expects_case_and_trailing_slash_policies(self):
+        # Arrange
+        test_cases = [
+            # options,                      link,           expected_url
+            [{'case': 'lower'},             '/Foo/Bar',     'http://sub.domain.com/foo/bar'],
+            [{'case': 'host'},              '/Foo',         'http://sub.domain.com/Foo'],
+            [{'trailing_slash': 'strip'},   '/foo/',        'http://sub.domain.com/foo'],
+            [{'trailing_slash': 'add'},     '/foo',         'http://sub.domain.com/foo/'],
+            [{'trailing_slash': 'add'},     '/foo.html',    'http://sub.domain.com/foo.html'],
+            [{'trailing_slash': 'add'},     '/',            'http://sub.domain.com'],
+            [{},                            '/foo/',        'http://sub.domain.com/foo/'],
+        ]
+
+        # Act / Assert
+        for options, link, expected_url in test_cases:
+            classifier = UrlClassifier('http://sub.domain.com', **options)
+            self.assertEqual(expected_url, classifier.normalize(link), options)
+
+    def test_expects_extension_lookup_on_path(self):
+        # Arrange
+        classifier = UrlClassifier('http://sub.domain.com')
+        test_cases = [
+            # url,                                          is_valid
+            ['http://sub.domain.com/report.PDF',            False],
+            ['http://sub.domain.com/report.pdf?v=2',        False],
+            ['http://sub.domain.com/backup.tar.gz',         False],
+            ['http://sub.domain.com/docs/pdf',              True],
+            ['http://sub.domain.com/search?q=file.pdf',     True],
+            ['http://sub.domain.com/v1.2/',                 True],
+            ['http://sub.domain.com.evil.com/',             False],
+        ]
+
+        # Act / Assert
+        for url, expected in test_cases:
+            self.assertEqual(expected, classifier.is_valid_internal(url), url)
+
+    def test_expects_error_if_invalid_policy(self):
+        # Assert/Act
+        with self.assertRaises(InvalidUrlRule):
+            UrlClassifier('http://sub.domain.com', case='upper')
+
+        with self.assertRaises(InvalidUrlRule):
+            UrlClassifier('http://sub.domain.com', trailing_slash='always')
@@ -0,0 +1,154 @@
+import os
+import tempfile
+import time
+
+from models.work_queue import InvalidQueueBackend, SQLiteWorkQueue, WorkQueue
+from tests import helper
+
+
+class WorkQueueTest(helper.AppTestCase):
+    #
+    # Fixtures
+    #
+    def setUp(self):
+        super(WorkQueueTest, self).setUp()
+        self.test_dir = tempfile.mkdtemp()
+        self.queue_path = os.path.join(self.test_dir, 'queue.db')
+
+    def tearDown(self):
+        helper.delete_directory(self.test_dir)
+
+    #
+    # Tests
+    #
+    def test_expects_queue_from_uri(self):
+        # Act
+        queue = WorkQueue.from_uri('sqlite://{}'.format(self.queue_path))
+
+        # Assert
+        self.assertIsInstance(queue, SQLiteWorkQueue)
+        self.assertEqual(self.queue_path, queue.path)
+
+        # Assert/Act
+        with self.assertRaises(InvalidQueueBackend):
+            WorkQueue.from_uri('redis://localhost/0')
+
+    def test_expects_each_url_leased_once(self):
+        # Arrange
+        queue = SQLiteWorkQueue(self.queue_path)
+        added = queue.enqueue(['http://sub.domain.com/a', 'http://sub.domain.com/b'])
+        added_again = queue.enqueue(['http://sub.domain.com/a'])
+
+        # Act
+        first_task = queue.lease('worker-1')
+        second_task = queue.lease('worker-2')
+        third_task = queue.lease('worker-3')
+
+        # Assert
+        self.assertEqual(2, added)
+        self.assertEqual(0, added_again)
+        self.assertNotEqual(first_task.url, second_task.url)
+        self.assertIsNone(third_task)
+        self.assertEqual(2, queue.counts()['leased'])
+
+    def test_expects_expired_lease_to_be_released(self):
+        # Arrange
+        queue = SQLiteWorkQueue(self.queue_path)
+        queue.enqueue(['http://sub.domain.com/a'])
+        queue.lease('worker-1', lease_seconds=0.01)
+        time.sleep(0.02)
+
+        # Act
+        task = queue.lease('worker-2')
+
+        # Assert
+        self.assertEqual('http://sub.domain.com/a', task.url)
+        self.assertEqual('worker-2', task.leased_by)
+        self.assertEqual(2, task.attempts)
+
+    def test_expects_failed_url_retried_until_max_attempts(self):
+        # Arrange
+        queue = SQLiteWorkQueue(self.queue_path, max_attempts=2)
+        queue.enqueue(['http://sub.domain.com/a'])
+
+        # Act
+        queue.fail(queue.lease('worker-1').url, 'timeout', 'worker-1')
+        retry_counts = queue.counts()
+        queue.fail(queue.lease('worker-1').url, 'timeout', 'worker-1')
+
+        # Assert
+        self.assertEqual(1, retry_counts['pending'])
+        self.assertEqual(1, queue.counts()['failed'])
+        self.assertIsNone(queue.lease('worker-1'))
+        self.assertTrue(queue.is_done())
+        self.assertEqual([('http://sub.domain.com/a', 'timeout')], queue.failures())
+
+    def test_expects_first_result_to_win(self):
+        # Arrange
+        queue = SQLiteWorkQueue(self.queue_path)
+        queue.enqueue(['http://sub.domain.com/a'])
+        queue.lease('worker-2')
+
+        # Act
+        first_write = queue.complete('http://sub.domain.com/a', {'worker': 2}, 'worker-2')
+        second_write = queue.complete('http://sub.domain.com/a', {'worker': 2}, 'worker-2')
+
+        # Assert
+        self.assertTrue(first_write)
+        self.assertFalse(second_write)
+        self.assertEqual([('http://sub.domain.com/a', {'worker': 2})], list(queue.results()))
+        self.assertTrue(queue.is_done())
+
+    def test_expects_expired_lease_holder_to_be_ignored(self):
+        # Arrange
+        queue = SQLiteWorkQueue(self.queue_path)
+        queue.enqueue(['http://sub.domain.com/a'])
+        queue.lease('worker-1', lease_seconds=0.01)
+        time.sleep(0.02)
+        queue.lease('worker-2')
+
+        # Act
+        stale_fail = queue.fail('http://sub.domain.com/a', 'timeout', 'worker-1')
+        stale_write = queue.complete('http://sub.domain.com/a', {'worker': 1}, 'worker-1')
+        counts = queue.counts()
+        write = queue.complete('http://sub.domain.com/a', {'worker': 2}, 'worker-2')
+
+        # Assert
+        self.assertFalse(stale_fail)
+        self.assertFalse(stale_write)
+        self.assertEqual(1, counts['leased'])
+        self.assertTrue(write)
+        self.assertEqual([('http://sub.domain.com/a', {'worker': 2})], list(queue.results()))
+        self.assertEqual([], queue.failures())
+
+    def test_expects_new_run_to_drop_previous_run_tasks(self):
+        # Arrange
+        queue = SQLiteWorkQueue(self.queue_path)
+        queue.start_run('20240101000000')
+        queue.enqueue(['http://sub.domain.com/a'])
+        queue.complete(queue.lease('worker-1').url, {'run': 1}, 'worker-1')
+
+        # Act
+        resumed_run = queue.start_run('20240101000000')
+        new_run = queue.start_run('20240102000000')
+        added = queue.enqueue(['http://sub.domain.com/a'])
+
+        # Assert
+        self.assertFalse(resumed_run)
+        self.assertTrue(new_run)
+        self.assertEqual(1, added)
+        self.assertEqual([], list(queue.results()))
+        self.assertEqual(1, queue.counts()['pending'])
+        self.assertEqual('20240102000000', queue.get_meta('run_id'))
+
+    def test_expects_meta_to_be_shared(self):
+        # Arrange
+        queue = SQLiteWorkQueue(self.queue_path)
+        queue.set_meta('audit_type', 'design')
+
+        # Act
+        other_queue = SQLiteWorkQueue(self.queue_path)
+
+        # Assert
+        self.assertEqual('design', other_queue.get_meta('audit_type'))
+        self.assertIsNone(other_queue.get_meta('missing'))
@@ -1,12 +1,27 @@
+import gzip
 import requests_mock
+import tempfile
+import threading
 from os.path import join as pathjoin
+from unittest.mock import MagicMock
+
+from scrapy.downloadermiddlewares.defaultheaders import DefaultHeadersMiddleware
+from scrapy.downloadermiddlewares.httpcache import HttpCacheMiddleware
+from scrapy.http import HtmlResponse, Request, Response, TextResponse
+from scrapy.utils.test import get_crawler
 
 from config.app import AUDITS_DIR
+from models.audit_profile import AuditProfile
+from models.auth_session import AuthSession
 from models.site import Site
 from spiders.sitemap_spider import SitemapSpider
 from tests import helper
 
 
+def html_response(url, body):
+    return HtmlResponse(url, request=Request(url), body=body)
+
+
 class SitemapSpiderTest(helper.AppTestCase):
     #
     # Fixtures
@@ -36,3 +51,344 @@ class SitemapSpiderTest(helper.AppTestCase):
         self.assertIsInstance(spider, SitemapSpider)
         self.assertEqual(site, spider.site)
         self.assertIn(site.base_url, spider.base_url)
+
+    def test_expects_resumed_spider_to_skip_links_in_sitemap(self):
+        # Arrange
+        url = 'http://sub.domain.com'
+        site = Site.from_domain_or_url(url, resume=True)
+        with open(site.sitemap_path, 'w') as sitemap_file:
+            sitemap_file.write("### Sitemap Draft ###\nhttp://sub.domain.com/foo\n")
+
+        # Act
+        spider = SitemapSpider(site)
+
+        # Assert
+        self.assertIn('http://sub.domain.com/foo', spider.unique_links)
+        self.assertIn(site.base_url, spider.unique_links)
+        self.assertEqual(2, len(spider.unique_links))
+
+    def test_expects_resumed_spider_to_append_to_cleaned_up_sitemap(self):
+        # Arrange
+        url = 'http://sub.domain.com'
+        site = Site.from_domain_or_url(url, resume=True)
+        with open(site.sitemap_path, 'w') as sitemap_file:
+            sitemap_file.write("### Sitemap Draft ###\nhttp://sub.domain.com/a\n"
+                               "http://sub.domain.com/b\n")
+        site.clean_up_sitemap_file()
+
+        # Act
+        spider = SitemapSpider(site)
+        list(spider.visit_url('http://sub.domain.com/c'))
+        list(spider.visit_url('http://sub.domain.com/d'))
+
+        # Assert
+        self.assertEqual(['http://sub.domain.com/a', 'http://sub.domain.com/b',
+                          'http://sub.domain.com/c', 'http://sub.domain.com/d'],
+                         list(site.read_sitemap_urls(site.sitemap_path)))
+
+    def test_expects_sitemap_urls_to_seed_sitemap(self):
+        # Arrange
+        url = 'http://sub.domain.com'
+        site = Site.from_domain_or_url(url, discovery='sitemaps')
+        spider = SitemapSpider(site)
+        body = (b'<?xml version="1.0" encoding="UTF-8"?>'
+                b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                b'<url><loc>http://sub.domain.com/foo</loc></url>'
+                b'<url><loc>http://sub.domain.com/bar</loc></url>'
+                b'<url><loc>https://google.com/baz</loc></url>'
+                b'</urlset>')
+        response = Response('http://sub.domain.com/sitemap.xml', body=body)
+
+        # Act
+        requests = list(spider.parse_sitemap(response))
+
+        # Assert
+        self.assertEqual([], requests)
+        self.assertIn('http://sub.domain.com/foo', spider.unique_links)
+        self.assertIn('http://sub.domain.com/bar', spider.unique_links)
+        self.assertNotIn('https://google.com/baz', spider.unique_links)
+
+    def test_expects_sitemap_urls_to_be_followed_when_following_links(self):
+        # Arrange
+        url = 'http://sub.domain.com'
+        site = Site.from_domain_or_url(url, discovery='both')
+        spider = SitemapSpider(site)
+        body = gzip.compress(b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                             b'<url><loc>http://sub.domain.com/foo</loc></url></urlset>')
+        response = Response('http://sub.domain.com/sitemap.xml.gz', body=body)
+
+        # Act
+        requests = list(spider.parse_sitemap(response))
+
+        # Assert
+        self.assertEqual(['http://sub.domain.com/foo'], [r.url for r in requests])
+        self.assertEqual(spider.parse, requests[0].callback)
+
+    def test_expects_sitemap_index_to_queue_child_sitemaps(self):
+        # Arrange
+        url = 'http://sub.domain.com'
+        site = Site.from_domain_or_url(url, discovery='sitemaps')
+        spider = SitemapSpider(site)
+        body = (b'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                b'<sitemap><loc>http://sub.domain.com/sitemap-1.xml.gz</loc></sitemap>'
+                b'</sitemapindex>')
+        response = Response('http://sub.domain.com/sitemap.xml', body=body)
+
+        # Act
+        requests = list(spider.parse_sitemap(response))
+
+        # Assert
+        self.assertEqual(1, len(requests))
+        self.assertEqual('http://sub.domain.com/sitemap-1.xml.gz', requests[0].url)
+        self.assertEqual(spider.parse_sitemap, requests[0].callback)
+
+    def test_expects_robots_sitemaps_to_be_queued(self):
+        # Arrange
+        url = 'http://sub.domain.com'
+        site = Site.from_domain_or_url(url, discovery='sitemaps')
+        spider = SitemapSpider(site)
+        body = b'User-agent: *\nDisallow: /admin\nSitemap: /sitemap-pages.xml\n'
+        response = TextResponse('http://sub.domain.com/robots.txt', body=body)
+
+        # Act
+        requests = list(spider.parse_robots(response))
+
+        # Assert
+        self.assertEqual(['http://sub.domain.com/sitemap-pages.xml'], [r.url for r in requests])
+
+    def test_expects_start_requests_by_discovery_mode(self):
+        # Arrange
+        url = 'http://sub.domain.com'
+        test_cases = [
+            # discovery, expected_urls
+            ('links',    ['http://sub.domain.com']),
+            ('sitemaps', ['http://sub.domain.com/robots.txt',
+                          'http://sub.domain.com/sitemap.xml']),
+            ('both',     ['http://sub.domain.com',
+                          'http://sub.domain.com/robots.txt',
+                          'http://sub.domain.com/sitemap.xml'])
+        ]
+
+        for discovery, expected_urls in test_cases:
+            site = Site.from_domain_or_url(url, discovery=discovery)
+            spider = SitemapSpider(site)
+
+            # Act
+            requests = list(spider.start_requests())
+
+            # Assert
+            self.assertTrue(all(isinstance(r, Request) for r in requests))
+            self.assertEqual(expected_urls, [r.url for r in requests], discovery)
+
+    def test_expects_canonical_link_to_record_alias(self):
+        # Arrange
+        url = 'http://sub.domain.com'
+        site = Site.from_domain_or_url(url)
+        spider = SitemapSpider(site)
+        body = b'<html><head><link rel="canonical" href="/foo"></head><body></body></html>'
+        response = html_response('http://sub.domain.com/foo?page=1', body)
+
+        # Act
+        requests = list(spider.parse(response))
+
+        # Assert
+        self.assertEqual(['http://sub.domain.com/foo'], [r.url for r in requests])
+        self.assertEqual({'http://sub.domain.com/foo?page=1': 'http://sub.domain.com/foo'},
+                         site.read_alias_file())
+
+    def test_expects_identical_content_to_record_alias(self):
+        # Arrange
+        url = 'http://sub.domain.com'
+        site = Site.from_domain_or_url(url)
+        spider = SitemapSpider(site)
+        body = b'<html><body><p>Same document</p></body></html>'
+        first_response = html_response('http://sub.domain.com/foo', body)
+        second_response = html_response('http://sub.domain.com/foo/index.html', body)
+        other_response = html_response('http://sub.domain.com/bar', b'<p>Other</p>')
+
+        # Act
+        for response in [first_response, second_response, other_response]:
+            list(spider.parse(response))
+
+        # Assert
+        self.assertEqual({'http://sub.domain.com/foo/index.html': 'http://sub.domain.com/foo'},
+                         site.read_alias_file())
+
+    def test_expects_resumed_crawl_to_detect_duplicates_of_earlier_pages(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com')
+        body = b'<html><body><p>Same document</p></body></html>'
+        list(SitemapSpider(site).parse(html_response('http://sub.domain.com/foo', body)))
+        resumed_site = Site.from_domain_or_url('http://sub.domain.com', resume=True)
+
+        # Act
+        resumed_spider = SitemapSpider(resumed_site)
+        list(resumed_spider.parse(html_response('http://sub.domain.com/foo/index.html', body)))
+
+        # Assert
+        self.assertEqual({'http://sub.domain.com/foo/index.html': 'http://sub.domain.com/foo'},
+                         resumed_site.read_alias_file())
+
+    def test_expects_unchanged_page_to_be_revalidated_and_parsed_from_cache(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com')
+        crawler = get_crawler(SitemapSpider, site.crawl_settings)
+        crawler.spider = spider = SitemapSpider.from_crawler(crawler, site)
+        default_headers = DefaultHeadersMiddleware.from_crawler(crawler)
+        http_cache = HttpCacheMiddleware.from_crawler(crawler)
+        http_cache.spider_opened(spider)
+        body = b'<html><body><a href="/bar">Bar</a></body></html>'
+
+        def fetch(status, body=b''):
+            # As scrapy's downloader would, with the server answering status.
+            request = Request('http://sub.domain.com/foo')
+            default_headers.process_request(request)
+            self.assertIsNone(http_cache.process_request(request))
+            downloaded = HtmlResponse(request.url, request=request, status=status, body=body,
+                                      headers={'ETag': '"v1"'})
+            response = http_cache.process_response(request, downloaded)
+            response.request = request
+            return request, response
+
+        # Act
+        first_request, first_response = fetch(200, body)
+        second_request, second_response = fetch(304)
+        http_cache.spider_closed(spider)
+        requests = list(spider.parse(second_response))
+
+        # Assert
+        self.assertPathExists(site.http_cache_dir)
+        self.assertNotIn(b'If-None-Match', first_request.headers)
+        self.assertEqual(b'"v1"', second_request.headers[b'If-None-Match'])
+        self.assertIn('cached', second_response.flags)
+        self.assertEqual(body, second_response.body)
+        self.assertEqual(['http://sub.domain.com/bar'], [r.url for r in requests])
+
+    def test_expects_no_http_cache_when_disabled(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com', http_cache=False)
+
+        # Act
+        settings = site.crawl_settings
+
+        # Assert
+        self.assertNotIn('HTTPCACHE_ENABLED', settings)
+        self.assertTrue(Site.from_domain_or_url('http://sub.domain.com').http_cache)
+
+    def test_expects_link_graph_for_prioritized_audits(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com')
+        spider = SitemapSpider(site)
+        home_body = b'<a href="/foo">Foo</a><a href="/foo#top">Foo</a><a href="/">Home</a>'
+        home = html_response('http://sub.domain.com', home_body)
+        foo_request = Request('http://sub.domain.com/foo', meta={'depth': 1})
+        foo = HtmlResponse('http://sub.domain.com/foo', request=foo_request,
+                           body=b'<a href="/bar">Bar</a><a href="/">Home</a>')
+        bar_request = Request('http://sub.domain.com/bar', meta={'depth': 2})
+        bar = HtmlResponse('http://sub.domain.com/bar', request=bar_request,
+                           body=b'<a href="/foo">Foo</a>')
+
+        # Act
+        for response in [home, foo, bar]:
+            list(spider.parse(response))
+        spider.closed('finished')
+
+        # Assert
+        self.assertEqual({'http://sub.domain.com': [0, 1],
+                          'http://sub.domain.com/foo': [1, 2],
+                          'http://sub.domain.com/bar': [2, 1]}, site.read_link_stats())
+        self.assertEqual(['http://sub.domain.com', 'http://sub.domain.com/bar'],
+                         site.pages_linking_to('/foo'))
+        site.close()
+
+    def test_expects_static_checks_for_each_parsed_page(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com')
+        spider = SitemapSpider(site)
+        body = b'<html lang="en"><img src="/logo.png"><a href="/foo"></a><a href="/bar">Bar</a>'
+        redirect_request = Request('http://sub.domain.com/home',
+                                   meta={'redirect_urls': ['http://sub.domain.com/old-home']})
+        response = HtmlResponse('http://sub.domain.com/home', request=redirect_request,
+                                body=body)
+
+        # Act
+        list(spider.parse(response))
+        results = site.static_checks.get('http://sub.domain.com/old-home')
+
+        # Assert
+        self.assertEqual('static', results['source'])
+        self.assertEqual(['image-alt', 'link-name'],
+                         [result['id'] for result in results['violations']])
+        self.assertEqual({'http://sub.domain.com/old-home': 2}, site.static_checks.scores())
+
+    def test_expects_static_checks_for_sitemap_pages_when_static_only(self):
+        # Arrange
+        site = Site.from_domain_or_url('http://sub.domain.com', discovery='sitemaps',
+                                       static_only=True)
+        spider = SitemapSpider(site)
+        body = (b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                b'<url><loc>http://sub.domain.com/foo</loc></url></urlset>')
+        sitemap = Response('http://sub.domain.com/sitemap.xml', body=body)
+
+        # Act
+        requests = list(spider.parse_sitemap(sitemap))
+        page = html_response(requests[0].url, b'<html><img src="/logo.png"><a href="/bar"></a>')
+        follow_ups = list(requests[0].callback(page))
+
+        # Assert
+        self.assertEqual(['http://sub.domain.com/foo'], [r.url for r in requests])
+        self.assertEqual(spider.parse_page, requests[0].callback)
+        self.assertEqual([], follow_ups)
+        self.assertEqual({'http://sub.domain.com/foo': 3}, site.static_checks.scores())
+        list(spider.parse_page(html_response('http://sub.domain.com/foo/index.html',
+                                             page.body)))
+        self.assertEqual({'http://sub.domain.com/foo/index.html': 'http://sub.domain.com/foo'},
+                         site.read_alias_file())
+
+    def test_expects_crawl_to_log_in_again_off_the_reactor_thread(self):
+        # Arrange
+        crawler_service = helper.crawler_service()
+
+        def orders(request):
+            # The first login has expired on the server.
+            if 'session=2' not in (request.headers.get('Cookie') or ''):
+                return 302, {'Location': '/login'}, ''
+            return 200, {}, '<a href="/orders/1">Order 1</a>'
+
+        server = helper.FixtureServer({
+            '/': '<a href="/orders">Orders</a><a href="/logout">Log out</a>',
+            '/login': '<form><input type="password"></form>',
+            '/orders': orders
+        }).start()
+        self.addCleanup(server.stop)
+
+        profile = AuditProfile({'auth': {'login_url': server.base_url + '/login',
+                                         'username': 'auditor'}})
+        auth_session = AuthSession(profile.settings['auth'], MagicMock())
+        login_threads = []
+
+        def log_in():
+            login_threads.append(threading.current_thread())
+            auth_session.generation += 1
+            auth_session.cookies = [{'name': 'session', 'value': str(auth_session.generation),
+                                     'path': '/'}]
+
+        auth_session.log_in = MagicMock(side_effect=log_in)
+        audits_dir = tempfile.mkdtemp()
+        self.addCleanup(helper.delete_directory, audits_dir)
+        site = Site.from_domain_or_url(server.base_url, auth_session=auth_session,
+                                       crawler_service=crawler_service, audits_dir=audits_dir,
+                                       http_cache=False)
+
+        # Act
+        site.generate_sitemap()
+
+        # Assert
+        self.assertTrue(site.crawl_finished)
+        self.assertEqual([server.base_url + '/orders', server.base_url + '/orders/1'],
+                         list(site.read_sitemap_urls(site.sitemap_path)))
+        self.assertEqual(2, auth_session.log_in.call_count)
+        self.assertNotIn(crawler_service.thread, login_threads)
+        self.assertNotIn('/logout', server.requests)
+        self.assertEqual(2, server.requests.count('/orders'))
+        site.close()